@@ -0,0 +1,99 @@
+"""
+Admission control for report generation
+Tracks how many generations are in flight in this process and how long
+recent ones took, and turns new requests away once their estimated wait
+would exceed the budget, instead of letting them queue until the worker
+timeout kills them.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; retry_after is in whole seconds"""
+
+    def __init__(self, retry_after, in_flight, estimated_wait):
+        super().__init__(f"Over capacity: {in_flight} generations in flight, estimated wait {estimated_wait:.1f}s")
+        self.retry_after = retry_after
+        self.in_flight = in_flight
+        self.estimated_wait = estimated_wait
+
+
+class AdmissionController:
+    """Bounded admission for slow, LLM-backed requests
+
+    Up to `concurrency` generations are assumed to make progress at once;
+    beyond that they complete in waves of one recent mean duration each.
+    A request is admitted only while fewer than max_queue are in flight and
+    its estimated completion time stays within max_wait, and never once
+    drain() was called (the worker is about to be recycled).
+    """
+
+    def __init__(self, concurrency=None, max_queue=None, max_wait=None, window=20, default_duration=None):
+        self.concurrency = concurrency if concurrency is not None \
+            else int(os.getenv('ADMISSION_CONCURRENCY', '8'))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('ADMISSION_MAX_QUEUE', '32'))
+        self.max_wait = max_wait if max_wait is not None \
+            else float(os.getenv('ADMISSION_MAX_WAIT_SECONDS', '90'))
+        self.default_duration = default_duration if default_duration is not None \
+            else float(os.getenv('ADMISSION_DEFAULT_DURATION', '30'))
+        self.in_flight = 0
+        self.rejected = 0
+        self.draining = False
+        self._durations = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def mean_duration(self):
+        if not self._durations:
+            return self.default_duration
+        return sum(self._durations) / len(self._durations)
+
+    def estimated_wait(self, in_flight=None):
+        """Seconds until a request admitted now would complete"""
+        if in_flight is None:
+            in_flight = self.in_flight
+        waves_ahead = in_flight // max(1, self.concurrency)
+        return (waves_ahead + 1) * self.mean_duration()
+
+    @contextmanager
+    def admit(self):
+        """Hold a slot for the duration of the block, or raise Overloaded"""
+        with self._lock:
+            estimated_wait = self.estimated_wait()
+            if self.draining or self.in_flight >= self.max_queue or estimated_wait > self.max_wait:
+                self.rejected += 1
+                # A slot frees up roughly once per mean generation time
+                retry_after = max(1, math.ceil(self.mean_duration()))
+                raise Overloaded(retry_after, self.in_flight, estimated_wait)
+            self.in_flight += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self._durations.append(time.monotonic() - started)
+
+    def drain(self):
+        """Stop admitting new generations; those in flight run to completion"""
+        with self._lock:
+            self.draining = True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'rejected': self.rejected,
+                'draining': self.draining,
+                'mean_duration': self.mean_duration(),
+                'estimated_wait': self.estimated_wait(),
+            }
@@ -6,15 +6,24 @@ Uses PaddleNLP, OpenAI, and other AI tools for enhanced assessment
 import os
 import json
 import numpy as np
-import pandas as pd
 import random
 import logging
 import re
+import time
 from collections import Counter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer
 from huggingface_hub import InferenceClient
+from llm_client import HedgedGenerator, get_model_chain, get_model_id, get_model_display_name
+from resilience import CircuitBreaker, Deadline, AdaptiveLimit
+from llm_scheduler import LLMScheduler, INTERACTIVE, REGENERATION, BATCH
+from local_inference import get_local_generator
+from catalogs import Catalog, CatalogCache
+from json_stream import JSONCompletionDetector, extract_document
+from tier_router import TierRouter, TIERS, LLM, ENHANCED, BASIC
+from student_profile import ProfileSchema
 
 # Load environment variables
 load_dotenv()
@@ -22,14 +31,147 @@ load_dotenv()
 # Initialize Hugging Face API key from environment variables
 hf_api_key = os.getenv('HF_API_TOKEN')
 
+# Seconds to wait for the Hugging Face Inference API before giving up, so a
+# stalled upstream cannot hold a worker connection indefinitely
+hf_api_timeout = float(os.getenv('HF_API_TIMEOUT', '90'))
+
+# Fields every generated report must contain, in display order
+REPORT_SECTIONS = ["summary", "academic_analysis", "personality_insights",
+                   "career_guidance", "extracurricular_recommendations",
+                   "development_plan", "university_application_advice", "ai_era_skills"]
+
+# Per-section title, instruction and token budget for parallel generation
+SECTION_PROMPTS = {
+    "summary": ("学生概况摘要", "简明扼要地总结学生的关键特点和潜力", 300),
+    "academic_analysis": ("学术分析与学习策略", "基于学习风格和学科优势的深入分析和具体建议", 700),
+    "personality_insights": ("性格洞察与个人发展", "基于团队角色、工作偏好和压力应对的性格分析和成长建议", 600),
+    "career_guidance": ("职业指导与规划", "根据兴趣和职业目标的详细职业路径和发展策略", 700),
+    "extracurricular_recommendations": ("课外活动规划", "基于兴趣和才能的个性化活动组合建议", 600),
+    "development_plan": ("个人发展计划", "基于个人优势和改进领域的短期与长期发展目标", 600),
+    "university_application_advice": ("大学申请策略", "针对申请国家偏好的申请建议和院校推荐", 700),
+    "ai_era_skills": ("AI时代必备技能", "根据学生的AI知识水平和职业方向的技能发展建议", 500),
+}
+
+# Fixed leading text of the report prompts. The student's answers go after
+# it, so every request shares this prefix token for token.
+REPORT_PROMPT_PREFIX = """作为一名专业的教育顾问和心理学家，请基于文末的学生信息生成一份详细、个性化的评估报告。
+
+请生成一份结构化的评估报告，包含以下部分：
+1. 学生概况摘要 - 简明扼要地总结学生的关键特点和潜力
+2. 学术分析与学习策略 - 基于学习风格和学科优势的深入分析和具体建议
+3. 性格洞察与个人发展 - 基于团队角色、工作偏好等的性格分析和成长建议
+4. 职业指导与规划 - 根据兴趣和职业目标的详细职业路径和发展策略
+5. 课外活动规划 - 基于兴趣和才能的个性化活动组合建议
+6. 大学申请策略 - 针对性的申请建议和院校推荐
+7. AI时代必备技能 - 根据学生的AI知识水平和职业方向的技能发展建议
+
+请确保报告：
+- 高度个性化，避免泛泛而谈
+- 提供具体、可行的建议和策略
+- 语言专业但易于理解
+- 每个部分都有深度洞察和实用建议
+- 考虑学生的独特特点和需求
+
+请以JSON格式返回，包含以下字段：summary, academic_analysis, personality_insights, career_guidance, extracurricular_recommendations, development_plan, university_application_advice, ai_era_skills
+
+"""
+
+SECTION_PROMPT_PREFIX = """作为一名专业的教育顾问和心理学家，请基于文末的学生信息撰写评估报告中的一个部分。
+要求高度个性化，提供具体、可行的建议，语言专业但易于理解。
+直接输出该部分的正文（可使用Markdown格式），不要输出JSON或其他部分。
+
+"""
+
+# Report sections written from each assessment answer, so that editing one
+# answer re-generates only those sections. Answers no generator reads
+# (e.g. a6, ps5) invalidate nothing.
+SECTION_DEPENDENCIES = {
+    "p1": ("summary",),
+    "p2": ("summary",),
+    "a1": ("summary", "career_guidance", "extracurricular_recommendations", "development_plan",
+           "university_application_advice"),
+    "a2": ("summary", "academic_analysis"),
+    "a3": ("academic_analysis",),
+    "a4": ("academic_analysis", "career_guidance", "development_plan", "university_application_advice"),
+    "a5": ("academic_analysis", "development_plan"),
+    "c1": ("summary", "career_guidance", "development_plan", "university_application_advice", "ai_era_skills"),
+    "c2": ("career_guidance",),
+    "c3": ("career_guidance", "extracurricular_recommendations"),
+    "ps1": ("summary", "personality_insights", "career_guidance", "extracurricular_recommendations"),
+    "ps2": ("personality_insights",),
+    "ps3": ("personality_insights",),
+    "ps4": ("personality_insights",),
+    "e1": ("extracurricular_recommendations",),
+    "e2": ("extracurricular_recommendations", "university_application_advice"),
+    "e3": ("extracurricular_recommendations",),
+    "d1": ("development_plan",),
+    "d2": ("development_plan", "university_application_advice"),
+    "d3": ("development_plan",),
+    "d4": ("development_plan", "ai_era_skills"),
+    "i1": ("university_application_advice",),
+    "i4": ("university_application_advice",),
+}
+
+
+def invalidated_sections(old_responses, new_responses):
+    """Report sections affected by the answers that differ between two submissions, in display order"""
+    affected = set()
+    for question_id in set(old_responses) | set(new_responses):
+        if old_responses.get(question_id) != new_responses.get(question_id):
+            affected.update(SECTION_DEPENDENCIES.get(question_id, ()))
+    return [field for field in REPORT_SECTIONS if field in affected]
+
+# The answers each section is written from, the inverse of SECTION_DEPENDENCIES
+SECTION_INPUTS = {field: tuple(question_id for question_id, sections in SECTION_DEPENDENCIES.items()
+                               if field in sections)
+                  for field in REPORT_SECTIONS}
+
+# Labels of the answers in the student profile sent to the LLM
+PROFILE_LABELS = {
+    "p1": "年龄",
+    "p2": "年级",
+    "a1": "兴趣",
+    "a2": "学习风格",
+    "a3": "学习挑战",
+    "a4": "学科优势",
+    "a5": "学科弱点",
+    "c1": "职业目标",
+    "c2": "行业兴趣",
+    "c3": "专业方向",
+    "ps1": "团队角色",
+    "ps2": "工作偏好",
+    "ps3": "压力应对",
+    "ps4": "创造力",
+    "e1": "课外活动",
+    "e2": "最喜爱活动",
+    "e3": "特长",
+    "d1": "发展领域",
+    "d2": "个人优势",
+    "d3": "改进领域",
+    "d4": "AI知识",
+    "i1": "英语水平",
+    "i4": "申请国家偏好",
+}
+
+def encode_profile_compact(student_profile):
+    """Encode the student profile as single-line JSON, omitting unanswered fields"""
+    compact = {}
+    for label, value in student_profile.items():
+        if isinstance(value, list):
+            value = "、".join(value)
+        if value and value != "未提供":
+            compact[label] = value
+    return json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+
 # For testing purposes, consider any non-empty token as valid
 def is_valid_hf_token(token):
     return token is not None and token.strip() != ''
 
 # Enhanced mock class to simulate Taskflow with more personalized responses
 class Taskflow:
-    def __init__(self, task_type):
+    def __init__(self, task_type, segmenter=None):
         self.task_type = task_type
+        self.segmenter = segmenter
     
     def __call__(self, text):
         if self.task_type == "sentiment_analysis":
@@ -68,6 +210,12 @@ class Taskflow:
             return [{"text": text, "label": max_category, "score": score}]
             
         elif self.task_type == "keyword_extraction":
+            # Catalog words found by the dictionary segmenter rank first,
+            # then the remaining spans of the answer
+            if self.segmenter is not None:
+                return [{"word": word, "score": 0.9 if self.segmenter.is_word(word) else 0.7}
+                        for word in self.segmenter.keywords(text)]
+            
             # More intelligent keyword extraction
             # First split by common separators
             segments = [s.strip() for segment in text.split('，') for s in segment.split('、')]
@@ -89,8 +237,6 @@ class Taskflow:
                 
             return result
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class AIEngine:
@@ -98,6 +244,10 @@ class AIEngine:
     
     def __init__(self):
         """Initialize AI components"""
+        # How long the LLM, enhanced and basic generators currently take
+        self.tier_router = TierRouter()
+        # Answers are normalized against the question bank once per report
+        self.schema = ProfileSchema.load()
         try:
             # Initialize with a more lightweight approach
             # Check if we're in a memory-constrained environment (like Render free tier)
@@ -110,61 +260,94 @@ class AIEngine:
             
             # Check if Hugging Face API key is available and valid
             self.use_hf = is_valid_hf_token(hf_api_key)
-            logger.info(f"Hugging Face integration available: {self.use_hf}")
+            logger.info("Hugging Face integration available: %s", self.use_hf)
+            
+            # Hedged generation across the model chain; latency history and
+            # circuit breaker state are kept per model for the lifetime of the engine
+            self.circuit_breaker = CircuitBreaker()
+            
+            # Every LLM call waits here for a slot, so interactive students
+            # go ahead of re-generation and batch work
+            self.llm_scheduler = LLMScheduler()
+            # The scheduler's cap follows what the endpoint sustains: raised
+            # while calls succeed promptly, cut on 429s, timeouts and slowdowns
+            self.llm_limit = AdaptiveLimit(initial=self.llm_scheduler.max_concurrency,
+                                           on_change=self.llm_scheduler.set_max_concurrency)
+            self.llm_scheduler.set_max_concurrency(self.llm_limit.current())
+            self.hedged_generator = HedgedGenerator(
+                lambda timeout: InferenceClient(token=hf_api_key, timeout=timeout),
+                breaker=self.circuit_breaker,
+                call_timeout=hf_api_timeout,
+                scheduler=self.llm_scheduler,
+                limiter=self.llm_limit)
+            
+            # Fans section prompts out in parallel mode; each task blocks on
+            # the hedged generator, so it gets its own pool
+            self.section_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv('LLM_SECTION_WORKERS', '32')),
+                thread_name_prefix='section')
                 
+            # Education, career and university catalogs with their keyword
+            # indexes and segmenter dictionary, built here so that with a
+            # preloaded app they are shared by every worker. Schools with
+            # catalogs of their own get them compiled on first use.
+            self.catalog = Catalog.load('data')
+            self.segmenter = self.catalog.segmenter
+            logger.info("Segmenter dictionary built with %d catalog words", self.segmenter.size)
+            self.catalogs = CatalogCache(self.catalog)
+            
             # Initialize PaddleNLP components only if not in lightweight mode
             if not self.is_lightweight:
                 self.sentiment_analyzer = Taskflow("sentiment_analysis")
                 self.text_classifier = Taskflow("text_classification")
-                self.keyword_extractor = Taskflow("keyword_extraction")
-            
-            # Load education and career data
-            self.education_data = self._load_data('education_data.json')
-            self.career_data = self._load_data('career_data.json')
-            self.university_data = self._load_data('university_data.json')
+                self.keyword_extractor = Taskflow("keyword_extraction", segmenter=self.segmenter)
             
             logger.info("AI Engine initialized successfully")
             self.is_available = True
         except Exception as e:
-            logger.error(f"Error initializing AI Engine: {str(e)}")
+            logger.error("Error initializing AI Engine: %s", e)
             self.is_available = False
             self.is_lightweight = True
     
-    def _load_data(self, filename):
-        """Load data from JSON file, or return empty dict if file not found"""
-        try:
-            data_path = os.path.join('data', filename)
-            if os.path.exists(data_path):
-                with open(data_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                logger.warning(f"Data file {filename} not found")
-                return {}
-        except Exception as e:
-            logger.error(f"Error loading data file {filename}: {str(e)}")
-            return {}
+    def _rank_by_keywords(self, index, keywords, limit):
+        """Return (position, match_score) of the best catalog entries, in catalog order on ties"""
+        scores = Counter()
+        for keyword in keywords:
+            for position in index.get(keyword, ()):
+                scores[position] += 1
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
     
-    def _extract_keywords(self, text):
+    def profile_of(self, responses):
+        """The StudentProfile of a submission, normalizing a plain dict of answers"""
+        return self.schema.normalize(responses)
+    
+    def _catalog_for(self, profile):
+        """The catalog of the school a submission came from"""
+        return self.catalogs.get(profile.school_id)
+    
+    def _extract_keywords(self, text, catalog=None):
         """Extract keywords from text using enhanced keyword extraction"""
         try:
             if not text or text == "未提供":
                 return []
             
-            # Use our enhanced keyword extractor
-            result = self.keyword_extractor(text)
-            
-            # If we got results, use them
-            if result:
-                return [item['word'] for item in result]
+            # A school's own catalog brings its own dictionary; the keyword
+            # extractor's is the default catalog's
+            if catalog is not None and catalog is not self.catalog:
+                return list(catalog.segmenter.keywords(text))
             
-            # Fallback method if the above fails
-            segments = [s.strip() for segment in text.split('，') for s in segment.split('、')]
-            segments = [s for s in segments if len(s) > 1]  # Filter out too short segments
+            # Use our enhanced keyword extractor
+            if hasattr(self, 'keyword_extractor'):
+                result = self.keyword_extractor(text)
+                
+                # If we got results, use them
+                if result:
+                    return [item['word'] for item in result]
             
-            # Return up to 5 segments
-            return segments[:5]
+            # Lightweight mode: segment directly against the catalog dictionary
+            return list(self.segmenter.keywords(text))
         except Exception as e:
-            logger.error(f"Error extracting keywords: {str(e)}")
+            logger.error("Error extracting keywords: %s", e)
             # Even more basic fallback
             return [text[:min(len(text), 10)]] if text else []
     
@@ -174,10 +357,11 @@ class AIEngine:
             if not text or text == "未提供":
                 return {"positive": 0.5, "negative": 0.5}
             
-            result = self.sentiment_analyzer(text)
-            return result[0]
+            result = self.sentiment_analyzer(text)[0]
+            positive = result["score"] if result["label"] == "positive" else 1 - result["score"]
+            return {"positive": positive, "negative": 1 - positive}
         except Exception as e:
-            logger.error(f"Error analyzing sentiment: {str(e)}")
+            logger.error("Error analyzing sentiment: %s", e)
             return {"positive": 0.5, "negative": 0.5}
     
     def _classify_text(self, text):
@@ -189,13 +373,12 @@ class AIEngine:
             result = self.text_classifier(text)
             return result[0]
         except Exception as e:
-            logger.error(f"Error classifying text: {str(e)}")
+            logger.error("Error classifying text: %s", e)
             return []
     
-    def _match_university_programs(self, interests, strengths, career_goals, preferred_countries=None):
+    def _match_university_programs(self, interests, strengths, career_goals, preferred_countries=None, catalog=None):
         """Match student profile with suitable university programs"""
-        suitable_programs = []
-        
+        catalog = catalog or self.catalog
         try:
             # Handle preferred_countries as either a string, list, or None
             if preferred_countries is None:
@@ -204,81 +387,69 @@ class AIEngine:
                 preferred_countries = [preferred_countries]
                 
             # Extract keywords from inputs
-            interest_keywords = self._extract_keywords(interests)
-            strength_keywords = self._extract_keywords(strengths)
-            career_keywords = self._extract_keywords(career_goals)
+            interest_keywords = self._extract_keywords(interests, catalog)
+            strength_keywords = self._extract_keywords(strengths, catalog)
+            career_keywords = self._extract_keywords(career_goals, catalog)
             
             all_keywords = interest_keywords + strength_keywords + career_keywords
             
-            # Match with university programs
-            for university in self.university_data.get('universities', []):
-                for program in university.get('programs', []):
-                    match_score = 0
-                    for keyword in all_keywords:
-                        if keyword in program.get('keywords', []):
-                            match_score += 1
-                    
-                    if match_score > 0:
-                        suitable_programs.append({
-                            'university': university.get('name'),
-                            'program': program.get('name'),
-                            'country': university.get('country'),
-                            'match_score': match_score,
-                            'description': program.get('description', ''),
-                            'requirements': program.get('requirements', '')
-                        })
-            
-            # Sort by match score
-            suitable_programs.sort(key=lambda x: x['match_score'], reverse=True)
-            
-            # Return top matches
-            return suitable_programs[:5]
+            # Match with university programs and return the top matches
+            return [dict(catalog.programs[position], match_score=match_score)
+                    for position, match_score in self._rank_by_keywords(catalog.program_index, all_keywords, 5)]
         except Exception as e:
-            logger.error(f"Error matching university programs: {str(e)}")
+            logger.error("Error matching university programs: %s", e)
             return []
     
-    def _generate_career_insights(self, interests, strengths, career_goals):
+    def _generate_career_insights(self, interests, strengths, career_goals, catalog=None):
         """Generate career insights based on student profile"""
+        catalog = catalog or self.catalog
         insights = []
         
         try:
             # Extract keywords from inputs
-            interest_keywords = self._extract_keywords(interests)
-            strength_keywords = self._extract_keywords(strengths)
-            career_keywords = self._extract_keywords(career_goals)
+            interest_keywords = self._extract_keywords(interests, catalog)
+            strength_keywords = self._extract_keywords(strengths, catalog)
+            career_keywords = self._extract_keywords(career_goals, catalog)
             
             all_keywords = interest_keywords + strength_keywords + career_keywords
             
-            # Match with career data
-            for career in self.career_data.get('careers', []):
-                match_score = 0
-                for keyword in all_keywords:
-                    if keyword in career.get('keywords', []):
-                        match_score += 1
-                
-                if match_score > 0:
-                    # Enhanced career insights with detailed analysis and skill recommendations
-                    career_insight = {
-                        'career': career.get('name'),
-                        'match_score': match_score,
-                        'description': career.get('description', ''),
-                        'future_outlook': career.get('future_outlook', ''),
-                        'ai_impact': career.get('ai_impact', ''),
-                        'required_skills': career.get('required_skills', []),
-                        'detailed_analysis': self._generate_detailed_career_analysis(career.get('name'), all_keywords),
-                        'skill_recommendations': self._generate_skill_recommendations(career.get('name'))
-                    }
-                    insights.append(career_insight)
-            
-            # Sort by match score
-            insights.sort(key=lambda x: x['match_score'], reverse=True)
-            
-            # Return top matches
-            return insights[:5]
+            # Match with career data, keeping the top matches
+            for position, match_score in self._rank_by_keywords(catalog.career_index, all_keywords, 5):
+                career = catalog.careers[position]
+                # Enhanced career insights with detailed analysis and skill recommendations
+                career_insight = {
+                    'career': career.get('name'),
+                    'match_score': match_score,
+                    'description': career.get('description', ''),
+                    'future_outlook': career.get('future_outlook', ''),
+                    'ai_impact': career.get('ai_impact', ''),
+                    'required_skills': career.get('required_skills', []),
+                    'detailed_analysis': self._generate_detailed_career_analysis(career.get('name'), all_keywords),
+                    'skill_recommendations': self._generate_skill_recommendations(career.get('name'))
+                }
+                insights.append(career_insight)
+            
+            return insights
         except Exception as e:
-            logger.error(f"Error generating career insights: {str(e)}")
+            logger.error("Error generating career insights: %s", e)
             return []
             
+    def catalog_matches(self, responses, limit=3):
+        """Names of the best-matching careers and university programs for a submission, for cohort analytics"""
+        if not self.is_available:
+            return {'careers': [], 'programs': []}
+        profile = self.profile_of(responses)
+        catalog = self._catalog_for(profile)
+        keywords = []
+        for question_id in ('a1', 'a4', 'c1'):
+            keywords.extend(self._extract_keywords(profile.text(question_id, ''), catalog))
+        return {
+            'careers': [catalog.careers[position].get('name')
+                        for position, _ in self._rank_by_keywords(catalog.career_index, keywords, limit)],
+            'programs': [f"{catalog.programs[position]['university']} · {catalog.programs[position]['program']}"
+                         for position, _ in self._rank_by_keywords(catalog.program_index, keywords, limit)],
+        }
+    
     def _generate_detailed_career_analysis(self, career_name, keywords):
         """Generate detailed analysis for a specific career"""
         try:
@@ -328,7 +499,7 @@ class AIEngine:
                 
             return analysis
         except Exception as e:
-            logger.error(f"Error generating detailed career analysis: {str(e)}")
+            logger.error("Error generating detailed career analysis: %s", e)
             return ["无法生成详细职业分析。"]
             
     def _generate_skill_recommendations(self, career_name):
@@ -372,10 +543,10 @@ class AIEngine:
                 "面向未来能力": future_skills
             }
         except Exception as e:
-            logger.error(f"Error generating skill recommendations: {str(e)}")
+            logger.error("Error generating skill recommendations: %s", e)
             return {"基础能力": ["沟通能力", "问题解决能力"]}
     
-    def _analyze_learning_style(self, learning_style, challenges):
+    def _analyze_learning_style(self, learning_style, challenges, catalog=None):
         """Analyze learning style and provide recommendations"""
         recommendations = []
         
@@ -408,8 +579,8 @@ class AIEngine:
                 ]
             }
             
-            # Handle learning_style as either a string or a list (for multiselect)
-            learning_styles = learning_style if isinstance(learning_style, list) else [learning_style]
+            # Handle learning_style as either a string or a list/tuple (for multiselect)
+            learning_styles = learning_style if isinstance(learning_style, (list, tuple)) else [learning_style]
             
             # Add general recommendations based on learning styles
             for style in learning_styles:
@@ -417,7 +588,7 @@ class AIEngine:
                     recommendations.extend(style_recommendations[style])
             
             # Add recommendations based on challenges
-            challenge_keywords = self._extract_keywords(challenges)
+            challenge_keywords = self._extract_keywords(challenges, catalog)
             
             challenge_recommendations = {
                 "专注": ["尝试番茄工作法（25分钟专注工作，5分钟休息）", "创建一个无干扰的学习环境", "设定明确的短期目标"],
@@ -437,60 +608,195 @@ class AIEngine:
             # Remove duplicates and return
             return list(set(recommendations))
         except Exception as e:
-            logger.error(f"Error analyzing learning style: {str(e)}")
+            logger.error("Error analyzing learning style: %s", e)
             return []
     
-    def generate_enhanced_report(self, responses):
-        """Generate an enhanced assessment report with AI insights"""
-        if not self.is_available:
-            logger.warning("AI Engine not available, returning basic report")
-            return self._generate_basic_report(responses)
-            
-        # If Hugging Face is available, use it for dynamic report generation
-        if self.use_hf and not getattr(self, 'is_lightweight', False):
+    def generate_enhanced_report(self, responses, deadline=None, priority=INTERACTIVE, tenant=None):
+        """Generate an enhanced assessment report with AI insights
+        
+        The best report that fits in the deadline; see generate_routed_report().
+        """
+        return self.generate_routed_report(responses, deadline, priority=priority, tenant=tenant)[0]
+    
+    def generate_instant_report(self, responses):
+        """Generate a report without any model call, for when the LLM path is over capacity"""
+        return self.generate_routed_report(responses, tiers=(ENHANCED, BASIC))[0]
+    
+    def available_tiers(self):
+        """Tiers that can serve a report right now, best first"""
+        if not self.is_available or getattr(self, 'is_lightweight', False):
+            return (BASIC,)
+        if self.use_hf and is_valid_hf_token(hf_api_key) and not self.circuit_breaker.all_open(get_model_chain()):
+            return TIERS
+        return (ENHANCED, BASIC)
+    
+    def generate_routed_report(self, responses, deadline=None, priority=INTERACTIVE, tenant=None, tiers=TIERS,
+                               ready=None):
+        """Generate a report with the best tier expected to finish within the deadline
+        
+        Returns (report, tier). The router compares the time left with each
+        available tier's current latency estimate (LLM, then the enhanced
+        template, then the basic report); a tier that fails falls through to
+        the next one. deadline also bounds the LLM path itself, and priority
+        (interactive, regeneration or batch) and tenant decide the report's
+        place in the LLM scheduler.
+        ready holds sections generated with the LLM ahead of submission; the
+        chosen tier only generates the others, and the returned tier is the
+        one that did (LLM when ready already covers every section).
+        """
+        if deadline is None:
+            deadline = Deadline.from_env()
+        profile = self.profile_of(responses)
+        ready = {field: value for field, value in (ready or {}).items() if field in REPORT_SECTIONS}
+        fields = [field for field in REPORT_SECTIONS if field not in ready] if ready else None
+        if fields == []:
+            self.tier_router.served(LLM)
+            return ready, LLM
+        
+        candidates = [tier for tier in self.available_tiers() if tier in tiers] or [BASIC]
+        chosen = self.tier_router.choose(deadline.remaining(), candidates)
+        logger.info("Routing report to the %s tier with %.1fs left", chosen, deadline.remaining())
+        
+        for tier in candidates[candidates.index(chosen):]:
+            started = time.monotonic()
             try:
-                dynamic_report = self._generate_hf_report(responses)
-                if dynamic_report:
-                    return dynamic_report
+                report = self._generate_tier(tier, profile, deadline, priority, tenant, fields)
             except Exception as e:
-                logger.error(f"Error generating Hugging Face report: {str(e)}")
-                # Fall back to enhanced report if Hugging Face fails
+                logger.error("Error generating %s report: %s", tier, e)
+                report = None
+            # Only full generations are latency samples: the LLM writing just
+            # the sections that were not ready is quicker than a whole report
+            # and would make the tier look faster than it is
+            if fields is None or tier != LLM:
+                self.tier_router.record(tier, time.monotonic() - started)
+            if report:
+                self.tier_router.served(tier)
+                return dict(report, **ready), tier
         
-        # Fall back to enhanced report if Hugging Face is not available or fails
-        if getattr(self, 'is_lightweight', False):
-            logger.warning("Running in lightweight mode, returning basic report")
-            return self._generate_basic_report(responses)
-            
+        self.tier_router.served(BASIC)
+        return dict(self._generate_basic_report(profile), **ready), BASIC
+    
+    def _generate_tier(self, tier, profile, deadline, priority, tenant, fields=None):
+        if tier == LLM:
+            if fields is not None:
+                return self._generate_hf_sections(profile, get_model_chain(), deadline,
+                                                  priority=priority, tenant=tenant, fields=fields)
+            return self._generate_hf_report(profile, deadline=deadline, priority=priority, tenant=tenant)
+        if tier == ENHANCED:
+            return self._generate_template_report(profile)
+        return self._generate_basic_report(profile)
+    
+    def regenerate_sections(self, report, responses, sections, deadline=None, priority=REGENERATION, tenant=None):
+        """Re-generate only the given sections of a report after answers were edited
+        
+        The other sections are kept as they are, except that any section the
+        report lacks (e.g. a failed earlier generation) is generated too.
+        Sections come from per-section LLM prompts when Hugging Face is
+        configured, otherwise from the template report.
+        """
+        fields = [field for field in REPORT_SECTIONS if field in sections or field not in report]
+        updated = {field: value for field, value in report.items() if field != "error"}
+        if not fields:
+            return updated
+        
+        if deadline is None:
+            deadline = Deadline.from_env()
+        profile = self.profile_of(responses)
+        
+        fresh = None
+        if not self.is_available or getattr(self, 'is_lightweight', False):
+            fresh = self._generate_basic_report(profile)
+        else:
+            model_chain = get_model_chain()
+            if self.use_hf and is_valid_hf_token(hf_api_key) and not self.circuit_breaker.all_open(model_chain):
+                try:
+                    fresh = self._generate_hf_sections(profile, model_chain, deadline,
+                                                       priority=priority, tenant=tenant, fields=fields)
+                except Exception as e:
+                    logger.error("Error re-generating sections with Hugging Face: %s", e)
+            if fresh is None:
+                fresh = self._generate_template_report(profile)
+        
+        logger.info("Re-generated sections: %s", ', '.join(fields))
+        for field in fields:
+            updated[field] = fresh.get(field, "内容生成中...")
+        return updated
+    
+    def generate_section(self, responses, field, deadline=None, priority=BATCH, tenant=None):
+        """Generate the text of one report section with the LLM, or return None
+        
+        Used to generate sections ahead of submission; returns None when
+        no model is in use or the generation fails, leaving the section to
+        be generated with the rest of the report.
+        """
+        if not self.is_available or getattr(self, 'is_lightweight', False) \
+                or not self.use_hf or not is_valid_hf_token(hf_api_key):
+            return None
+        model_chain = get_model_chain()
+        if self.circuit_breaker.all_open(model_chain):
+            return None
         try:
-            # Extract key information from responses
-            age = responses.get("p1", "未提供")
-            grade = responses.get("p2", "未提供")
-            interests = responses.get("a1", "未提供")
-            learning_style = responses.get("a2", "未提供")
-            challenges = responses.get("a3", "未提供")
-            strengths = responses.get("a4", "未提供")
-            weaknesses = responses.get("a5", "未提供")
-            career = responses.get("c1", "未提供")
-            industry = responses.get("c2", "未提供")
-            major = responses.get("c3", "未提供")
-            team_role = responses.get("ps1", "未提供")
-            work_preference = responses.get("ps2", "未提供")
-            stress_response = responses.get("ps3", "未提供")
-            creativity = responses.get("ps4", "未提供")
-            activities = responses.get("e1", "未提供")
-            favorite_activity = responses.get("e2", "未提供")
-            talents = responses.get("e3", "未提供")
-            development_areas = responses.get("d1", "未提供")
-            personal_strengths = responses.get("d2", "未提供")
-            improvement_areas = responses.get("d3", "未提供")
-            ai_knowledge = responses.get("d4", "未提供")
-            english_level = responses.get("i1", "未提供")
-            preferred_country = responses.get("i4", "未提供")
+            text, _ = self.hedged_generator.generate(
+                self._section_prompt(self.profile_of(responses), field),
+                model_chain,
+                deadline=deadline,
+                priority=priority,
+                tenant=tenant,
+                max_new_tokens=SECTION_PROMPTS[field][2],
+                temperature=0.7,
+                repetition_penalty=1.1
+            )
+            return text.strip() or None
+        except Exception as e:
+            logger.warning("Section %s generation failed: %s", field, e)
+            return None
+    
+    def precompute_keywords(self, responses):
+        """Segment the free-text answers so their keywords are cached before the report is generated"""
+        if not self.is_available:
+            return
+        profile = self.profile_of(responses)
+        catalog = self._catalog_for(profile)
+        for _, value in profile.items():
+            if isinstance(value, str):
+                self._extract_keywords(value, catalog)
+    
+    def _generate_template_report(self, responses):
+        """Generate the rule-based enhanced report from templates and catalog matching"""
+        profile = self.profile_of(responses)
+        try:
+            # Extract key information from the profile
+            age = profile.text("p1")
+            grade = profile.text("p2")
+            interests = profile.text("a1")
+            learning_style = profile.text("a2")
+            challenges = profile.text("a3")
+            strengths = profile.text("a4")
+            weaknesses = profile.text("a5")
+            career = profile.text("c1")
+            industry = profile.text("c2")
+            major = profile.text("c3")
+            team_role = profile.text("ps1")
+            work_preference = profile.text("ps2")
+            stress_response = profile.text("ps3")
+            creativity = profile.text("ps4")
+            activities = profile.text("e1")
+            favorite_activity = profile.text("e2")
+            talents = profile.text("e3")
+            development_areas = profile.text("d1")
+            personal_strengths = profile.text("d2")
+            improvement_areas = profile.text("d3")
+            ai_knowledge = profile.text("d4")
+            english_level = profile.text("i1")
+            preferred_country = profile.text("i4")
             
             # Generate enhanced insights
-            learning_recommendations = self._analyze_learning_style(learning_style, challenges)
-            career_insights = self._generate_career_insights(interests, strengths, career)
-            university_matches = self._match_university_programs(interests, strengths, career, preferred_country)
+            catalog = self._catalog_for(profile)
+            # The analyzer matches each chosen style; learning_style is only the display text
+            learning_recommendations = self._analyze_learning_style(profile.get("a2", ()), challenges, catalog)
+            career_insights = self._generate_career_insights(interests, strengths, career, catalog)
+            university_matches = self._match_university_programs(interests, strengths, career, preferred_country,
+                                                                 catalog)
             
             # Analyze personality traits
             personality_insights = []
@@ -567,7 +873,7 @@ class AIEngine:
                 
                 "personality_insights": f"**深度性格洞察与个人发展**\n\n作为一名专业心理学家，我对你的性格特质进行了多维度分析。你在团队中倾向于扮演{team_role}的角色，这不仅是一种行为偏好，更是你核心人格结构和价值观的外在表现。这种角色偏好往往可以追溯到早期家庭互动模式和重要的成长经历。\n\n你通常{work_preference}，这一特点揭示了你的能量流动方式和人际互动偏好。从认知心理学角度来看，这反映了你在信息处理和决策过程中的独特模式。\n\n在压力情境下，你的应对方式是：{stress_response}。这种反应模式可能源于你的神经生理特质、早期应对经验和学习历史。了解这一模式对于发展心理韧性和情绪调节能力至关重要。你的创造力水平是{creativity}，这不仅是一种认知能力，也是你在面对复杂问题和不确定性时的心理资源。\n\n**深层人格分析**：\n" + "\n".join([f"- {insight}" for insight in personality_insights]) + f"\n\n**心理学家的个人成长建议**：\n\n1. **自我认知提升**：深入理解你作为{team_role}的内在驱动力和潜意识模式。通过正念实践和结构化反思，培养元认知能力，增强自我意识。\n\n2. **情绪调节策略**：根据你的压力应对模式（{stress_response}），开发个性化的情绪调节工具箱。这包括认知重构技术、正念冥想、深层呼吸练习和渐进式肌体放松。\n\n3. **人际边界管理**：培养健康的人际边界意识，并学习如何在保持真实自我的同时有效沟通需求和期望。这将提升你的人际关系质量和自我满足感。\n\n4. **创造力培养**：有意识地接触多元视角和跨领域思想，打破认知固化。定期参与创造性挑战，如即兴艺术、思维导图和跨学科探索。\n\n5. **价值观澄清**：探索并明确你的核心价值观，确保你的日常决策和长期目标与这些价值观一致。这将增强你的内在动力和生活满足感。\n\n6. **韧性培养计划**：建立日常实践，增强心理韧性和适应能力。这包括定期的身心练习、充足的休息和恢复时间、社交联系和个人反思。\n\n7. **成长思维培养**：采用成长思维模式，将挑战视为学习机会，将失败视为反馈而非判断。这种思维方式将显著提升你的心理韧性和成就潜力。\n\n这些建议基于当代科学心理学的原理，旨在促进全面的心理健康和个人成长。通过有意识地实践这些策略，你将能够充分发挥你的潜力，并在生活的各个领域建立更满足、更有韧性的关系。",
                 
-                "career_guidance": f"**深度职业指导与未来规划**\n\n作为一名专业职业规划顾问，我对你的职业发展路径进行了系统化分析。基于你对{industry}的浓厚兴趣和{career}的职业志向，结合你的人格特质和技能倍数，{major}是一个能够最大化你潜力和职业满足感的大学专业选择。\n\n在当代快速变化的职场中，职业规划不再是线性的，而是需要一种适应性、多元化的思维模式。以下是我为你量身定制的职业发展路径和策略：\n\n" + "\n".join([f"### **{insight['career']}**\n{insight['description']}\n\n**行业生态系统分析**：\n" + "\n".join([f"- {analysis}" for analysis in insight.get('detailed_analysis', ['无详细分析'])]) + "\n\n**未来发展趋势**：{insight['future_outlook']}\n\n**AI与数字化转型影响**：{insight['ai_impact']}\n\n**核心竞争力技能矩阵**：\n" + "\n".join([f"- **{category}**：{', '.join(skills)}" for category, skills in insight.get('skill_recommendations', {'基础技能': ['无具体建议']}).items()]) for insight in career_insights]) + f"\n\n**职业发展策略与实施路径**\n\n1. **技能组合与差异化定位**\n   - 基于你的兴趣和天赋，发展一组独特的技能组合，而非仅仅追求单一技能的精通\n   - 在{industry}领域内找到你的“蓝海”——竞争较少但有发展潜力的细分领域\n   - 将你的{team_role}特质与专业技能结合，创造独特的职业价值主张\n\n2. **阶梯式能力构建计划**\n   - **基础阶段**（大学低年级）：掌握{major}的核心知识体系和方法论，参与入门级项目\n   - **提升阶段**（大学高年级）：获取行业认可的证书或资格，完成至少一个有实质内容的行业项目\n   - **专业阶段**（大学毕业后）：发展特定领域的深度专业知识，建立行业内的专业声誉\n\n3. **策略性职业网络构建**\n   - 建立“弱联系”网络，跨越不同行业和领域，拥有更广泛的职业机会\n   - 开展“信息面试”，与行业内的专业人士建立联系，获取一手行业洞见\n   - 参与行业组织、论坛和线上社区，提高你在{industry}领域的可见度\n\n4. **适应性职业规划模型**\n   - 采用“原型测试”方法：通过实习、志愿服务或项目合作，尝试不同的职业选择\n   - 建立“职业实验室”思维：将每次职业尝试视为实验，收集数据和反馈\n   - 开发“职业韧性”：面对行业变革，保持学习思维和转型能力\n\n5. **个人品牌与职业口碑建设**\n   - 打造与你的价值观和专长一致的专业形象\n   - 开发一个展示你技能和思想的专业平台（博客、作品集或社交媒体存在）\n   - 培养“讲故事”的能力，能清晰、有说服力地表达你的职业旅程和独特价值\n\n这个全面的职业发展规划不仅关注短期的就业目标，更注重长期的职业可持续性和满足感。通过这种整合的方法，你将能够在不断变化的职场中保持竞争力和适应性，并在{career}领域内实现你的最大潜力。",
+                "career_guidance": f"**深度职业指导与未来规划**\n\n作为一名专业职业规划顾问，我对你的职业发展路径进行了系统化分析。基于你对{industry}的浓厚兴趣和{career}的职业志向，结合你的人格特质和技能倍数，{major}是一个能够最大化你潜力和职业满足感的大学专业选择。\n\n在当代快速变化的职场中，职业规划不再是线性的，而是需要一种适应性、多元化的思维模式。以下是我为你量身定制的职业发展路径和策略：\n\n" + "\n".join([f"### **{insight['career']}**\n{insight['description']}\n\n**行业生态系统分析**：\n" + "\n".join([f"- {analysis}" for analysis in insight.get('detailed_analysis', ['无详细分析'])]) + f"\n\n**未来发展趋势**：{insight['future_outlook']}\n\n**AI与数字化转型影响**：{insight['ai_impact']}\n\n**核心竞争力技能矩阵**：\n" + "\n".join([f"- **{category}**：{', '.join(skills)}" for category, skills in insight.get('skill_recommendations', {'基础技能': ['无具体建议']}).items()]) for insight in career_insights]) + f"\n\n**职业发展策略与实施路径**\n\n1. **技能组合与差异化定位**\n   - 基于你的兴趣和天赋，发展一组独特的技能组合，而非仅仅追求单一技能的精通\n   - 在{industry}领域内找到你的“蓝海”——竞争较少但有发展潜力的细分领域\n   - 将你的{team_role}特质与专业技能结合，创造独特的职业价值主张\n\n2. **阶梯式能力构建计划**\n   - **基础阶段**（大学低年级）：掌握{major}的核心知识体系和方法论，参与入门级项目\n   - **提升阶段**（大学高年级）：获取行业认可的证书或资格，完成至少一个有实质内容的行业项目\n   - **专业阶段**（大学毕业后）：发展特定领域的深度专业知识，建立行业内的专业声誉\n\n3. **策略性职业网络构建**\n   - 建立“弱联系”网络，跨越不同行业和领域，拥有更广泛的职业机会\n   - 开展“信息面试”，与行业内的专业人士建立联系，获取一手行业洞见\n   - 参与行业组织、论坛和线上社区，提高你在{industry}领域的可见度\n\n4. **适应性职业规划模型**\n   - 采用“原型测试”方法：通过实习、志愿服务或项目合作，尝试不同的职业选择\n   - 建立“职业实验室”思维：将每次职业尝试视为实验，收集数据和反馈\n   - 开发“职业韧性”：面对行业变革，保持学习思维和转型能力\n\n5. **个人品牌与职业口碑建设**\n   - 打造与你的价值观和专长一致的专业形象\n   - 开发一个展示你技能和思想的专业平台（博客、作品集或社交媒体存在）\n   - 培养“讲故事”的能力，能清晰、有说服力地表达你的职业旅程和独特价值\n\n这个全面的职业发展规划不仅关注短期的就业目标，更注重长期的职业可持续性和满足感。通过这种整合的方法，你将能够在不断变化的职场中保持竞争力和适应性，并在{career}领域内实现你的最大潜力。",
                 
                 "extracurricular_recommendations": f"**战略性课外活动规划**\n\n作为一名专业的学生发展顾问和课外活动专家，我将为你提供一个全面的课外活动组合方案，旨在最大化你的个人发展和申请竞争力。\n\n根据你目前参与的活动（{activities}）和特别喜欢的{favorite_activity}，以及你在{talents}方面的才能，我已经对你的兴趣模式和潜力领域进行了全面分析。在当代大学申请中，高质量的课外活动参与不再是简单的“清单式”累积，而是需要展示深度、影响力和个人成长的有机整体。\n\n**个性化活动组合方案**：\n\n1. **核心发展项目**（深度优先）\n   - **专业化{favorite_activity}探索**：将你对{favorite_activity}的兴趣提升到更专业的水平，可以是参与相关的区域或全国性竞赛、开展独立研究或创新项目、组织相关的社区活动或工作坊\n   - **影响力指标**：在这一领域至少达到地区或学校级别的认可，理想的目标是获得省级或国家级的成就\n   - **时间承诺**：至少一年以上的持续参与，展示你的热情和成长\n\n2. **领导力与团队合作项目**\n   - **{team_role}角色发挥**：基于你的{team_role}特质，参与或创建一个团队项目，如{team_role=='领导者' and '学生会或社团的领导职位，组织校园活动或社区服务项目' or team_role=='创新者' and '创新竞赛、创业项目或设计思维工作坊' or team_role=='策划者' and '校园活动策划、辩论队或模拟联合国' or '学术研究团队或社区服务项目'}\n   - **可量化成果**：确保你的项目有具体、可衡量的成果，如参与人数、影响范围、筹集资金或解决的具体问题\n\n3. **学术与专业发展活动**\n   - **与{interests}相关的专业探索**：参与与你兴趣领域相关的学术竞赛、研究项目、实验室实习或行业实习\n   - **跨学科融合项目**：尝试将你的{interests}与其他学科领域结合，开展创新性的跨学科探索\n   - **专业技能认证**：获取与你未来专业相关的技能证书或参加专业培训课程\n\n4. **社会责任与社区服务**\n   - **有意义的志愿服务**：参与与你价值观相关的社区服务或公益项目，并尝试找到与你的{interests}或{talents}相关的服务机会\n   - **持续性承诺**：选择一个你真正关心的社会问题，并进行长期（至少半年）的参与\n\n5. **个人创新项目**\n   - **独立创新项目**：利用你的{talents}才能，开发一个个人项目，如博客、播客、艺术作品集、科技发明或社会创新项目\n   - **文档与展示**：记录你的创作过程和成果，建立一个可展示的作品集\n\n**活动组合策略与实施建议**：\n\n1. **“尖塔”模型而非“广谷”模型**\n   - 专注于2-3个核心活动并在这些领域达到卓越水平，而不是浅尝较多活动\n   - 优先考虑你的核心兴趣{favorite_activity}和与未来专业{major}相关的活动\n\n2. **“红线”连接与个人发展史**\n   - 确保你的活动组合能够讲述一个连贯的个人成长和探索故事\n   - 展示你如何通过这些活动发现并发展了你的激情和能力\n\n3. **影响力与领导力展示**\n   - 在至少一个活动中承担领导或创始人角色\n   - 记录你的行动如何影响他人或促成积极变化\n\n4. **深度与持续性的平衡**\n   - 至少有一个活动展示长期承诺（一年以上）\n   - 其他活动可以是较短期但高强度的参与\n\n5. **文档与反思的重要性**\n   - 为每个重要活动创建一个反思日志，记录你的经验、挑战和成长\n   - 收集可量化的成果和证明材料，如照片、证书、推荐信或项目成果\n\n通过这个策略性的课外活动组合，你将能够在大学申请中脱颖而出，展示你的独特价值和潜力。这些活动不仅将增强你的申请竞争力，还将培养你在大学和职业生涯中取得成功的关键能力。",
                 
@@ -581,223 +887,180 @@ class AIEngine:
             return enhanced_report
             
         except Exception as e:
-            logger.error(f"Error generating enhanced report: {str(e)}")
-            return self._generate_basic_report(responses)
+            logger.error("Error generating enhanced report: %s", e)
+            return self._generate_basic_report(profile)
             
-    def _generate_hf_report(self, responses):
+    def _generate_hf_report(self, responses, deadline=None, priority=INTERACTIVE, tenant=None):
         """Generate a dynamic, personalized report using Hugging Face models"""
         try:
             if not is_valid_hf_token(hf_api_key):
                 logger.warning("Valid Hugging Face API token not found")
                 return None
-                
-            # Extract key information from responses
-            age = responses.get("p1", "未提供")
-            grade = responses.get("p2", "未提供")
-            interests = responses.get("a1", "未提供")
-            learning_style = responses.get("a2", "未提供")
-            challenges = responses.get("a3", "未提供")
-            strengths = responses.get("a4", "未提供")
-            weaknesses = responses.get("a5", "未提供")
-            career = responses.get("c1", "未提供")
-            industry = responses.get("c2", "未提供")
-            major = responses.get("c3", "未提供")
-            team_role = responses.get("ps1", "未提供")
-            work_preference = responses.get("ps2", "未提供")
-            stress_response = responses.get("ps3", "未提供")
-            creativity = responses.get("ps4", "未提供")
-            activities = responses.get("e1", "未提供")
-            favorite_activity = responses.get("e2", "未提供")
-            talents = responses.get("e3", "未提供")
-            development_areas = responses.get("d1", "未提供")
-            personal_strengths = responses.get("d2", "未提供")
-            improvement_areas = responses.get("d3", "未提供")
-            ai_knowledge = responses.get("d4", "未提供")
-            english_level = responses.get("i1", "未提供")
-            preferred_country = responses.get("i4", "未提供")
             
+            # Short-circuit straight to the template report while every
+            # hosted model is known to be failing
+            model_chain = get_model_chain()
+            if self.circuit_breaker.all_open(model_chain):
+                logger.warning("Circuit breakers open for all models, skipping LLM generation")
+                return None
+                
             # Prepare data for the LLM
-            student_profile = {
-                "年龄": age,
-                "年级": grade,
-                "兴趣": interests,
-                "学习风格": learning_style,
-                "学习挑战": challenges,
-                "学科优势": strengths,
-                "学科弱点": weaknesses,
-                "职业目标": career,
-                "行业兴趣": industry,
-                "专业方向": major,
-                "团队角色": team_role,
-                "工作偏好": work_preference,
-                "压力应对": stress_response,
-                "创造力": creativity,
-                "课外活动": activities,
-                "最喜爱活动": favorite_activity,
-                "特长": talents,
-                "发展领域": development_areas,
-                "个人优势": personal_strengths,
-                "改进领域": improvement_areas,
-                "AI知识": ai_knowledge,
-                "英语水平": english_level,
-                "申请国家偏好": preferred_country
-            }
-            
-            # Create prompt for the LLM
-            prompt = f"""作为一名专业的教育顾问和心理学家，请基于以下学生信息生成一份详细、个性化的评估报告。
-            
-学生信息：
-{json.dumps(student_profile, ensure_ascii=False, indent=2)}
-
-请生成一份结构化的评估报告，包含以下部分：
-1. 学生概况摘要 - 简明扼要地总结学生的关键特点和潜力
-2. 学术分析与学习策略 - 基于学习风格和学科优势的深入分析和具体建议
-3. 性格洞察与个人发展 - 基于团队角色、工作偏好等的性格分析和成长建议
-4. 职业指导与规划 - 根据兴趣和职业目标的详细职业路径和发展策略
-5. 课外活动规划 - 基于兴趣和才能的个性化活动组合建议
-6. 大学申请策略 - 针对性的申请建议和院校推荐
-7. AI时代必备技能 - 根据学生的AI知识水平和职业方向的技能发展建议
-
-请确保报告：
-- 高度个性化，避免泛泛而谈
-- 提供具体、可行的建议和策略
-- 语言专业但易于理解
-- 每个部分都有深度洞察和实用建议
-- 考虑学生的独特特点和需求
+            profile = self.profile_of(responses)
+            student_profile = self._build_student_profile(profile)
+            
+            # Several concurrent section prompts instead of one long generation
+            if os.getenv('LLM_SECTION_MODE', 'single').lower() == 'parallel':
+                return self._generate_hf_sections(profile, model_chain, deadline,
+                                                  priority=priority, tenant=tenant)
+            
+            # The fixed instructions lead and the student comes last, so the
+            # shared prefix can be served from the provider's prefix cache or
+            # the local model's KV cache
+            student_text = f"学生信息：\n{encode_profile_compact(student_profile)}\n"
+            prompt = REPORT_PROMPT_PREFIX + student_text
+            # Stop generating once the JSON report is complete instead of
+            # paying for whatever the model writes after it
+            stop_detector = partial(JSONCompletionDetector, REPORT_SECTIONS)
 
-请以JSON格式返回，包含以下字段：summary, academic_analysis, personality_insights, career_guidance, extracurricular_recommendations, development_plan, university_application_advice, ai_era_skills
-"""
-
-            # Use Hugging Face Inference API to access open-source LLM models
-            # Get model preference from environment or use default
-            model_preference = os.getenv('LLM_MODEL_PREFERENCE', 'llama3').lower()
-            
-            # Select model based on preference
-            if model_preference == 'llama3':
-                model_id = "meta-llama/Meta-Llama-3-8B"  # Meta's Llama 3 model (lightweight 8B version)
-                logger.info("Using Llama 3 (8B) model for report generation")
-            elif model_preference == 'llama2':
-                model_id = "meta-llama/Llama-2-7b-chat-hf"  # Meta's Llama 2 model
-                logger.info("Using Llama 2 model for report generation")
-            elif model_preference == 'mistral':
-                model_id = "mistralai/Mistral-7B-Instruct-v0.2"  # Mistral model
-                logger.info("Using Mistral model for report generation")
-            elif model_preference == 'falcon':
-                model_id = "tiiuae/falcon-7b-instruct"  # Falcon model
-                logger.info("Using Falcon model for report generation")
-            else:
-                # Default to Llama 3
-                model_id = "meta-llama/Meta-Llama-3-8B"
-                logger.info(f"Unknown model preference '{model_preference}', defaulting to Llama 3 (8B)")
-            
+            # Use Hugging Face Inference API to access open-source LLM models,
+            # walking the model chain with hedged requests
             try:
-                # Use Hugging Face Inference API
-                client = InferenceClient(token=hf_api_key)
-                response = client.text_generation(
+                report_text, model_key = self.hedged_generator.generate(
                     prompt,
-                    model=model_id,
+                    model_chain,
+                    deadline=deadline,
+                    priority=priority,
+                    tenant=tenant,
+                    stop_detector=stop_detector,
                     max_new_tokens=4000,
                     temperature=0.7,
                     repetition_penalty=1.1
                 )
-                
-                # Parse the response
-                report_text = response.strip()
-                
-                # Extract JSON from the response
-                if '{' in report_text and '}' in report_text:
-                    json_start = report_text.find('{')
-                    json_end = report_text.rfind('}') + 1
-                    json_str = report_text[json_start:json_end]
-                    report_data = json.loads(json_str)
-                    
-                    # Ensure all required fields are present
-                    required_fields = ["summary", "academic_analysis", "personality_insights", 
-                                      "career_guidance", "extracurricular_recommendations", 
-                                      "development_plan", "university_application_advice", "ai_era_skills"]
-                    
-                    for field in required_fields:
-                        if field not in report_data:
-                            report_data[field] = "内容生成中..."
-                    
-                    return report_data
-                else:
-                    logger.warning("Failed to extract JSON from model response")
-                    # If no JSON is found, create a structured report from the raw text
-                    return self._create_structured_report_from_text(report_text)
+                logger.info("Report generated by %s", get_model_display_name(model_key))
+                return self._parse_report_text(report_text.strip())
                     
             except Exception as e:
-                logger.error(f"Error with Hugging Face Inference API: {str(e)}")
+                logger.error("Error with Hugging Face Inference API: %s", e)
+                
+                if deadline is not None and deadline.expired():
+                    logger.warning("Report deadline exceeded, skipping local model fallback")
+                    return None
                 
                 # Fallback to local model if available
                 try:
                     logger.info("Attempting to use local model as fallback")
                     # This is a lighter approach that can run on the server
-                    # We'll use a smaller model for local inference
-                    model_preference = os.getenv('LLM_MODEL_PREFERENCE', 'llama3').lower()
-                    
-                    # Select model path based on preference
-                    if model_preference == 'llama3':
-                        model_path = "meta-llama/Meta-Llama-3-8B"  # Llama 3 model
-                    elif model_preference == 'llama2':
-                        model_path = "meta-llama/Llama-2-7b-chat-hf"  # Llama 2 model
-                    elif model_preference == 'mistral':
-                        model_path = "mistralai/Mistral-7B-Instruct-v0.2"  # Mistral model
-                    elif model_preference == 'falcon':
-                        model_path = "tiiuae/falcon-7b-instruct"  # Falcon model
-                    else:
-                        # Default to Llama 3
-                        model_path = "meta-llama/Meta-Llama-3-8B"
+                    # We'll use the primary model of the chain for local inference
+                    model_path = get_model_id(model_chain[0])
                     
                     # Check if we have enough resources for local inference
                     if torch.cuda.is_available() or torch.backends.mps.is_available():
-                        tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
-                        model = AutoModelForCausalLM.from_pretrained(
-                            model_path, 
-                            trust_remote_code=True,
-                            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                            device_map="auto"
-                        )
+                        # The model stays resident and concurrent fallbacks
+                        # share batched generate() calls
+                        generator = get_local_generator(model_path, temperature=0.7)
+                        with self.llm_scheduler.slot(priority, tenant, deadline):
+                            response = generator.generate(
+                                student_text,
+                                prefix=REPORT_PROMPT_PREFIX,
+                                stop_detector=stop_detector,
+                                max_new_tokens=2000,
+                                timeout=deadline.remaining() if deadline is not None else None
+                            )
                         
-                        # Generate response
-                        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-                        outputs = model.generate(
-                            inputs["input_ids"],
-                            max_new_tokens=2000,
-                            temperature=0.7
-                        )
-                        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-                        
-                        # Process response
-                        if '{' in response and '}' in response:
-                            json_start = response.find('{')
-                            json_end = response.rfind('}') + 1
-                            json_str = response[json_start:json_end]
-                            report_data = json.loads(json_str)
-                            
-                            # Ensure all required fields are present
-                            required_fields = ["summary", "academic_analysis", "personality_insights", 
-                                              "career_guidance", "extracurricular_recommendations", 
-                                              "development_plan", "university_application_advice", "ai_era_skills"]
-                            
-                            for field in required_fields:
-                                if field not in report_data:
-                                    report_data[field] = "内容生成中..."
-                            
-                            return report_data
-                        else:
-                            return self._create_structured_report_from_text(response)
+                        return self._parse_report_text(response)
                     else:
                         logger.warning("No GPU/MPS available for local model inference")
                         return None
                 except Exception as local_err:
-                    logger.error(f"Error with local model fallback: {str(local_err)}")
+                    logger.error("Error with local model fallback: %s", local_err)
                     return None
                 
         except Exception as e:
-            logger.error(f"Error in Hugging Face report generation: {str(e)}")
+            logger.error("Error in Hugging Face report generation: %s", e)
             return None
             
+    def _section_prompt(self, profile, field):
+        """Prompt for one report section, given only the answers the section is written from"""
+        title, instruction, _ = SECTION_PROMPTS[field]
+        profile_text = encode_profile_compact(self._build_student_profile(profile, SECTION_INPUTS[field]))
+        return f"""{SECTION_PROMPT_PREFIX}请撰写「{title}」部分：{instruction}。
+
+学生信息：
+{profile_text}
+"""
+    
+    def _generate_hf_sections(self, profile, model_chain, deadline=None,
+                              priority=INTERACTIVE, tenant=None, fields=None):
+        """Generate each report section (or only the given fields) from its own prompt, concurrently
+        
+        Sections that fail fall back to the matching section of the template
+        report, so one slow or failed prompt does not cost the whole report.
+        """
+        futures = {}
+        for field, (_, _, max_new_tokens) in SECTION_PROMPTS.items():
+            if fields is not None and field not in fields:
+                continue
+            futures[field] = self.section_executor.submit(
+                self.hedged_generator.generate,
+                self._section_prompt(profile, field),
+                model_chain,
+                deadline=deadline,
+                priority=priority,
+                tenant=tenant,
+                max_new_tokens=max_new_tokens,
+                temperature=0.7,
+                repetition_penalty=1.1
+            )
+        
+        report = {}
+        failed = []
+        for field, future in futures.items():
+            try:
+                text, _ = future.result(timeout=deadline.remaining() if deadline is not None else None)
+                if not text.strip():
+                    raise ValueError("empty section")
+                report[field] = text.strip()
+            except Exception as e:
+                logger.warning("Section %s generation failed: %s", field, e)
+                failed.append(field)
+        
+        if len(failed) == len(futures):
+            return None
+        
+        if failed:
+            logger.info("Using template text for sections: %s", ', '.join(failed))
+            template_report = self._generate_template_report(profile)
+            for field in failed:
+                report[field] = template_report.get(field, "内容生成中...")
+        
+        return report
+    
+    def _build_student_profile(self, profile, question_ids=None):
+        """Map a StudentProfile's answers (or only the given questions) to the labelled profile sent to the LLM"""
+        return {label: profile.text(question_id) for question_id, label in PROFILE_LABELS.items()
+                if question_ids is None or question_id in question_ids}
+    
+    def _parse_report_text(self, report_text):
+        """Parse the JSON report out of raw model output"""
+        # Extract JSON from the response: the first complete object, else
+        # everything between the first '{' and the last '}'
+        json_str = extract_document(report_text, REPORT_SECTIONS)
+        if json_str is None and '{' in report_text and '}' in report_text:
+            json_str = report_text[report_text.find('{'):report_text.rfind('}') + 1]
+        if json_str is not None:
+            report_data = json.loads(json_str)
+            
+            # Ensure all required fields are present
+            for field in REPORT_SECTIONS:
+                if field not in report_data:
+                    report_data[field] = "内容生成中..."
+            
+            return report_data
+        else:
+            logger.warning("Failed to extract JSON from model response")
+            # If no JSON is found, create a structured report from the raw text
+            return self._create_structured_report_from_text(report_text)
+    
     def _create_structured_report_from_text(self, text):
         """Create a structured report from unstructured text when JSON parsing fails"""
         try:
@@ -854,7 +1117,7 @@ class AIEngine:
             return report
             
         except Exception as e:
-            logger.error(f"Error creating structured report from text: {str(e)}")
+            logger.error("Error creating structured report from text: %s", e)
             # Return a basic report
             return {
                 "summary": "无法解析模型响应，请查看完整报告内容。",
@@ -868,34 +1131,35 @@ class AIEngine:
             }
                 
         except Exception as e:
-            logger.error(f"Error in Hugging Face report generation: {str(e)}")
+            logger.error("Error in Hugging Face report generation: %s", e)
             return None
     
     def _generate_basic_report(self, responses):
         """Generate a basic report when AI services are not available"""
+        profile = self.profile_of(responses)
         try:
-            # Extract key information from responses
-            age = responses.get("p1", "未提供")
-            grade = responses.get("p2", "未提供")
-            interests = responses.get("a1", "未提供")
-            learning_style = responses.get("a2", "未提供")
-            challenges = responses.get("a3", "未提供")
-            strengths = responses.get("a4", "未提供")
-            weaknesses = responses.get("a5", "未提供")
-            career = responses.get("c1", "未提供")
-            industry = responses.get("c2", "未提供")
-            major = responses.get("c3", "未提供")
-            team_role = responses.get("ps1", "未提供")
-            work_preference = responses.get("ps2", "未提供")
-            stress_response = responses.get("ps3", "未提供")
-            creativity = responses.get("ps4", "未提供")
-            activities = responses.get("e1", "未提供")
-            favorite_activity = responses.get("e2", "未提供")
-            talents = responses.get("e3", "未提供")
-            development_areas = responses.get("d1", "未提供")
-            personal_strengths = responses.get("d2", "未提供")
-            improvement_areas = responses.get("d3", "未提供")
-            ai_knowledge = responses.get("d4", "未提供")
+            # Extract key information from the profile
+            age = profile.text("p1")
+            grade = profile.text("p2")
+            interests = profile.text("a1")
+            learning_style = profile.text("a2")
+            challenges = profile.text("a3")
+            strengths = profile.text("a4")
+            weaknesses = profile.text("a5")
+            career = profile.text("c1")
+            industry = profile.text("c2")
+            major = profile.text("c3")
+            team_role = profile.text("ps1")
+            work_preference = profile.text("ps2")
+            stress_response = profile.text("ps3")
+            creativity = profile.text("ps4")
+            activities = profile.text("e1")
+            favorite_activity = profile.text("e2")
+            talents = profile.text("e3")
+            development_areas = profile.text("d1")
+            personal_strengths = profile.text("d2")
+            improvement_areas = profile.text("d3")
+            ai_knowledge = profile.text("d4")
             
             # Compile the basic report
             report = {
@@ -944,7 +1208,7 @@ class AIEngine:
             return report
             
         except Exception as e:
-            logger.error(f"Error generating basic report: {str(e)}")
+            logger.error("Error generating basic report: %s", e)
             # Return a very basic fallback report
             return {
                 "summary": "无法生成完整的个性化报告。请检查您的回答是否完整，或稍后再试。",
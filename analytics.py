@@ -0,0 +1,242 @@
+"""
+Cohort analytics for the Student Assessment System
+Each submission's categorical answers (learning style, team role,
+creativity, AI knowledge, preferred countries) and its best-matching
+careers and programs are stored as small integer codes, one column per
+field, and the per school and grade rollups are updated in the same
+transaction: value counts for every field, and co-occurrence counts for
+every pair of fields. Dashboard queries read only the rollups, so they
+take milliseconds however many reports have been stored.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from itertools import combinations
+from contextlib import closing
+from flask import request, jsonify
+
+logger = logging.getLogger(__name__)
+
+# Answer fields, then catalog matches, in the order pair rollups are keyed
+ANSWER_FIELDS = ('a2', 'ps1', 'ps4', 'd4', 'i4')
+MATCH_FIELDS = ('career', 'program')
+FIELDS = ANSWER_FIELDS + MATCH_FIELDS
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS cohort_values (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    PRIMARY KEY (field, value)
+);
+CREATE TABLE IF NOT EXISTS cohort_facts (
+    report_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    school TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    {', '.join(f'{field} TEXT NOT NULL' for field in FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS cohort_counts (
+    school TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    field TEXT NOT NULL,
+    code INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (field, school, grade, code)
+);
+CREATE TABLE IF NOT EXISTS cohort_pairs (
+    school TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    field_a TEXT NOT NULL,
+    code_a INTEGER NOT NULL,
+    field_b TEXT NOT NULL,
+    code_b INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (field_a, field_b, school, grade, code_a, code_b)
+);
+"""
+
+# Pseudo-field counting submissions per group
+_TOTAL = '_total'
+
+
+def _values(value):
+    """An answer as a list of distinct non-empty strings"""
+    values = value if isinstance(value, list) else [value]
+    return list(dict.fromkeys(str(v) for v in values if v not in (None, '', '未提供')))
+
+
+def _decode(column):
+    return [int(code) for code in column.split(',')] if column else []
+
+
+class CohortAnalytics:
+    """Columnar facts and incrementally maintained rollups in SQLite
+
+    Like ReportStore, every operation opens its own short-lived connection,
+    and writes run in one IMMEDIATE transaction so concurrent workers cannot
+    assign the same code twice or lose an increment.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(_SCHEMA)
+            conn.commit()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def _code(self, conn, field, value):
+        """Dictionary code of a field value, assigned on first sight"""
+        row = conn.execute('SELECT code FROM cohort_values WHERE field = ? AND value = ?', (field, value)).fetchone()
+        if row is not None:
+            return row[0]
+        code = conn.execute('SELECT COALESCE(MAX(code) + 1, 0) FROM cohort_values WHERE field = ?',
+                            (field,)).fetchone()[0]
+        conn.execute('INSERT INTO cohort_values (field, value, code) VALUES (?, ?, ?)', (field, value, code))
+        return code
+
+    def _apply(self, conn, school, grade, codes, delta):
+        """Add delta to every rollup cell a submission with these codes contributes to"""
+        conn.execute('INSERT INTO cohort_counts VALUES (?, ?, ?, 0, ?) '
+                     'ON CONFLICT (field, school, grade, code) DO UPDATE SET count = count + excluded.count',
+                     (school, grade, _TOTAL, delta))
+        conn.executemany('INSERT INTO cohort_counts VALUES (?, ?, ?, ?, ?) '
+                         'ON CONFLICT (field, school, grade, code) DO UPDATE SET count = count + excluded.count',
+                         [(school, grade, field, code, delta) for field in FIELDS for code in codes[field]])
+        conn.executemany('INSERT INTO cohort_pairs VALUES (?, ?, ?, ?, ?, ?, ?) '
+                         'ON CONFLICT (field_a, field_b, school, grade, code_a, code_b) '
+                         'DO UPDATE SET count = count + excluded.count',
+                         [(school, grade, field_a, code_a, field_b, code_b, delta)
+                          for field_a, field_b in combinations(FIELDS, 2)
+                          for code_a in codes[field_a] for code_b in codes[field_b]])
+
+    def record(self, report_id, responses, matches):
+        """Add a submission: its answers plus {'careers': [...], 'programs': [...]} from the catalog"""
+        school = str(responses.get('school_id') or '')
+        grade = str(responses.get('p2') or '')
+        raw = {field: _values(responses.get(field)) for field in ANSWER_FIELDS}
+        raw['career'] = _values(matches.get('careers', []))
+        raw['program'] = _values(matches.get('programs', []))
+
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                codes = {field: [self._code(conn, field, value) for value in values] for field, values in raw.items()}
+                conn.execute(f'INSERT INTO cohort_facts (report_id, created_at, school, grade, {", ".join(FIELDS)}) '
+                             f'VALUES (?, ?, ?, ?, {", ".join("?" for _ in FIELDS)})',
+                             [report_id, time.time(), school, grade]
+                             + [','.join(map(str, codes[field])) for field in FIELDS])
+                self._apply(conn, school, grade, codes, 1)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def remove(self, report_id):
+        """Take a submission back out of the rollups, e.g. when its answers were edited"""
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(f'SELECT school, grade, {", ".join(FIELDS)} FROM cohort_facts WHERE report_id = ?',
+                                   (report_id,)).fetchone()
+                if row is not None:
+                    codes = {field: _decode(column) for field, column in zip(FIELDS, row[2:])}
+                    self._apply(conn, row[0], row[1], codes, -1)
+                    conn.execute('DELETE FROM cohort_facts WHERE report_id = ?', (report_id,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    @staticmethod
+    def _group_filter(school, grade):
+        conditions, params = [], []
+        if school is not None:
+            conditions.append('school = ?')
+            params.append(school)
+        if grade is not None:
+            conditions.append('grade = ?')
+            params.append(grade)
+        return ''.join(f' AND {condition}' for condition in conditions), params
+
+    def _labels(self, conn, field):
+        return dict(conn.execute('SELECT code, value FROM cohort_values WHERE field = ?', (field,)).fetchall())
+
+    def groups(self):
+        """[{school, grade, total}] for every group with submissions"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute('SELECT school, grade, count FROM cohort_counts WHERE field = ? AND count > 0 '
+                                'ORDER BY school, grade', (_TOTAL,)).fetchall()
+        return [{'school': school, 'grade': grade, 'total': total} for school, grade, total in rows]
+
+    def distribution(self, field, school=None, grade=None):
+        """{'total': submissions, 'counts': {value: submissions choosing it}}, most frequent first"""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field '{field}'")
+        where, params = self._group_filter(school, grade)
+        with closing(self._connect()) as conn:
+            total = conn.execute(f'SELECT COALESCE(SUM(count), 0) FROM cohort_counts WHERE field = ?{where}',
+                                 [_TOTAL] + params).fetchone()[0]
+            rows = conn.execute(f'SELECT code, SUM(count) AS n FROM cohort_counts WHERE field = ?{where} '
+                                f'GROUP BY code HAVING n > 0 ORDER BY n DESC, code', [field] + params).fetchall()
+            labels = self._labels(conn, field)
+        return {'total': total, 'counts': {labels[code]: count for code, count in rows}}
+
+    def crosstab(self, row_field, column_field, school=None, grade=None):
+        """{row value: {column value: submissions with both}} for two different fields"""
+        if row_field not in FIELDS or column_field not in FIELDS or row_field == column_field:
+            raise ValueError(f"Cannot cross-tabulate '{row_field}' with '{column_field}'")
+        swapped = FIELDS.index(row_field) > FIELDS.index(column_field)
+        field_a, field_b = (column_field, row_field) if swapped else (row_field, column_field)
+        where, params = self._group_filter(school, grade)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f'SELECT code_a, code_b, SUM(count) AS n FROM cohort_pairs '
+                                f'WHERE field_a = ? AND field_b = ?{where} GROUP BY code_a, code_b HAVING n > 0',
+                                [field_a, field_b] + params).fetchall()
+            labels_a, labels_b = self._labels(conn, field_a), self._labels(conn, field_b)
+        table = {}
+        for code_a, code_b, count in rows:
+            value_a, value_b = labels_a[code_a], labels_b[code_b]
+            row_value, column_value = (value_b, value_a) if swapped else (value_a, value_b)
+            table.setdefault(row_value, {})[column_value] = count
+        return table
+
+
+def init_app(app, cohort, authorized):
+    """Register the counselor dashboard endpoints, guarded by the authorized() check
+
+    GET /analytics/dashboard?school=&grade=  groups and every field's distribution
+    GET /analytics/crosstab?row=ps1&column=career&school=&grade=
+    """
+
+    def scope():
+        return request.args.get('school'), request.args.get('grade')
+
+    @app.route('/analytics/dashboard')
+    def analytics_dashboard():
+        if not authorized():
+            return jsonify({"success": False, "error": "无权查看统计"}), 403
+        school, grade = scope()
+        distributions = {field: cohort.distribution(field, school, grade) for field in FIELDS}
+        return jsonify({"success": True, "groups": cohort.groups(),
+                        "total": distributions[FIELDS[0]]['total'],
+                        "distributions": {field: result['counts'] for field, result in distributions.items()}})
+
+    @app.route('/analytics/crosstab')
+    def analytics_crosstab():
+        if not authorized():
+            return jsonify({"success": False, "error": "无权查看统计"}), 403
+        school, grade = scope()
+        try:
+            table = cohort.crosstab(request.args.get('row', ''), request.args.get('column', ''), school, grade)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return jsonify({"success": True, "table": table})
@@ -1,33 +1,61 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
+from flask import Flask, request, jsonify, render_template, redirect, url_for, session, make_response
 import os
 import sys
 import json
+import math
+import time
 import requests
 import logging
-import traceback
 from dotenv import load_dotenv
-from ai_engine import AIEngine
+from ai_engine import AIEngine, invalidated_sections
+from llm_client import get_model_chain, get_model_display_name
+from resilience import Deadline
+from admission import AdmissionController, Overloaded
+from llm_scheduler import INTERACTIVE, REGENERATION
+from tier_router import ENHANCED, BASIC
+from student_profile import ProfileSchema, InvalidSubmission
+from report_store import ReportStore
+from speculation import Speculator
+from analytics import CohortAnalytics
+from memory_watchdog import MemoryWatchdog
+from markdown_render import render_report_sections
+import http_cache
+import assets
+import warmup
+import export
+import analytics
+import memory_watchdog
+import structured_logging
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 log_level = logging.DEBUG if os.getenv('DEBUG', 'False').lower() == 'true' else logging.INFO
-logging.basicConfig(level=log_level, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+structured_logging.configure(log_level)
 logger = logging.getLogger(__name__)
 
 # Log deployment environment information
-logger.info(f"Starting application in {os.getenv('FLASK_ENV', 'development')} mode")
-logger.info(f"Python version: {sys.version}")
-logger.info(f"Running on Render: {os.getenv('RENDER', 'false')}")
+logger.info("Starting application in %s mode", os.getenv('FLASK_ENV', 'development'))
+logger.info("Python version: %s", sys.version)
+logger.info("Running on Render: %s", os.getenv('RENDER', 'false'))
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
 
+# ETags, conditional GETs and gzip/brotli compression for HTML and JSON
+http_cache.init_app(app)
+
+# Fingerprinted static files (built by build_assets.py), served as immutable
+assets.init_app(app)
+
+# /ready turns healthy once the warmup at the end of this module has run
+warmup.init_app(app)
+
 # Configure error handling
 @app.errorhandler(500)
 def server_error(e):
-    logger.error(f"Server error: {str(e)}\n{traceback.format_exc()}")
+    logger.error("Server error: %s", e, exc_info=True)
     return render_template('error.html', error="Internal server error. Please try again later."), 500
 
 @app.errorhandler(404)
@@ -37,18 +65,58 @@ def not_found(e):
 # Initialize AI Engine
 ai_engine = AIEngine()
 
+# Reports are kept server-side (they outgrow the session cookie); the session
+# only holds the report ID
+report_store = ReportStore.from_env(app.instance_path)
+
+# Counselors download a grade's reports as one streamed ZIP (needs EXPORT_TOKEN)
+export.init_app(app, report_store)
+
+# Per school and grade rollups of every submission, for the counselor dashboard
+cohort = CohortAnalytics(report_store.path)
+analytics.init_app(app, cohort, export.authorized)
+
+# Bounds concurrent report generations; past capacity /submit answers with
+# the instant template report ('template', offering an upgrade later) or
+# with 429 and Retry-After ('reject')
+admission = AdmissionController()
+ADMISSION_OVERLOAD_MODE = os.getenv('ADMISSION_OVERLOAD_MODE', 'template').lower()
+
+# Each gunicorn worker samples its RSS; past MEMORY_RSS_LIMIT_MB it stops
+# admitting generations, lets the ones in flight finish and is replaced
+memory = MemoryWatchdog(drain=admission.drain, in_flight=lambda: admission.in_flight)
+memory_watchdog.init_app(app, memory, export.authorized)
+
+# Sections of a report generated while the student is still answering,
+# keyed by the draft ID the assessment page sends along with /submit
+speculator = Speculator(ai_engine)
+
 # Log AI Engine status
 if ai_engine.use_hf:
-    model_preference = os.getenv('LLM_MODEL_PREFERENCE', 'deepseek')
-    logger.info(f"Enhanced AI reports enabled with Hugging Face integration using {model_preference} model")
+    model_chain = get_model_chain()
+    logger.info("Enhanced AI reports enabled with Hugging Face integration using model chain %s",
+                ' -> '.join(model_chain))
 else:
     logger.info("Using standard report generation (Hugging Face not configured)")
 
+# The question bank and the rendered assessment page are identical for every
+# student, so both are cached; the source files are re-checked for changes at
+# most every QUESTIONS_CHECK_INTERVAL seconds
+QUESTIONS_CHECK_INTERVAL = float(os.getenv('QUESTIONS_CHECK_INTERVAL', '5'))
+_questions_cache = {'mtime': None, 'questions': None}
+_schema_cache = {'questions': None, 'schema': None}
+_assessment_page_cache = {'key': None, 'checked_at': 0.0, 'body': None, 'etag': None, 'encoded': {}}
+
 # Load questions from JSON file
 def load_questions():
     try:
-        with open('questions.json', 'r', encoding='utf-8') as file:
-            return json.load(file)
+        mtime = os.path.getmtime('questions.json')
+        if _questions_cache['mtime'] != mtime:
+            with open('questions.json', 'r', encoding='utf-8') as file:
+                _questions_cache['questions'] = json.load(file)
+            _questions_cache['mtime'] = mtime
+            logger.info("Loaded question bank from questions.json")
+        return _questions_cache['questions']
     except FileNotFoundError:
         # Default questions if file not found
         return {
@@ -89,64 +157,300 @@ def load_questions():
             ]
         }
 
+def get_profile_schema():
+    """The answer schema compiled from the current question bank"""
+    questions = load_questions()
+    if _schema_cache['questions'] is not questions:
+        _schema_cache['schema'] = ProfileSchema(questions)
+        _schema_cache['questions'] = questions
+    return _schema_cache['schema']
+
+def parse_budget(value):
+    """The budget_seconds a submission asked for, as a float, or None; InvalidSubmission if it is not a number"""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError(value)
+        budget = float(value)
+    except (TypeError, ValueError):
+        raise InvalidSubmission("'budget_seconds' must be a number of seconds")
+    if not math.isfinite(budget) or budget < 0:
+        raise InvalidSubmission("'budget_seconds' must be a number of seconds")
+    return budget
+
+def invalid_submission_response(e):
+    """400 for answers that do not fit the question bank"""
+    logger.warning("Rejected submission: %s", e)
+    return jsonify({"success": False, "error": str(e)}), 400
+
 # Routes
 @app.route('/')
 def index():
     return render_template("index.html")
 
+def get_assessment_page():
+    """Return the cached rendered assessment page, re-rendering when its sources change"""
+    page = _assessment_page_cache
+    now = time.monotonic()
+    if page['body'] is not None and now - page['checked_at'] < QUESTIONS_CHECK_INTERVAL:
+        return page
+    
+    questions_path = 'questions.json'
+    template_path = os.path.join(app.root_path, 'templates', 'assessment.html')
+    key = (os.path.getmtime(questions_path) if os.path.exists(questions_path) else None,
+           os.path.getmtime(template_path))
+    if page['key'] != key or page['body'] is None:
+        body = render_template("assessment.html", questions=load_questions()).encode('utf-8')
+        page.update(key=key, body=body, etag=http_cache.compute_etag(body), encoded={})
+    page['checked_at'] = now
+    return page
+
 @app.route('/assessment')
 def assessment():
-    questions = load_questions()
-    return render_template("assessment.html", questions=questions)
+    page = get_assessment_page()
+    if http_cache.is_not_modified(page['etag']):
+        return http_cache.not_modified_response(app, page['etag'], 'no-cache')
+    
+    # Serve a cached compressed copy when the client accepts one
+    encoding = http_cache.choose_encoding() if len(page['body']) >= http_cache.COMPRESS_MIN_SIZE else None
+    if encoding:
+        body = page['encoded'].get(encoding)
+        if body is None:
+            body = page['encoded'][encoding] = http_cache.compress(page['body'], encoding)
+        response = app.response_class(body, mimetype='text/html')
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{page['etag']}-{encoding}")
+    else:
+        response = app.response_class(page['body'], mimetype='text/html')
+        response.set_etag(page['etag'])
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def too_busy_response(overloaded):
+    """429 telling the client when to retry"""
+    response = jsonify({"success": False, "error": "服务器繁忙，请稍后重试", "retry_after": overloaded.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(overloaded.retry_after)
+    return response
+
+def update_cohort(report_id, responses, replaces=None):
+    """Count a stored submission in the cohort rollups, in place of the report it replaces"""
+    try:
+        if replaces is not None:
+            cohort.remove(replaces)
+        cohort.record(report_id, responses, ai_engine.catalog_matches(responses))
+    except Exception as e:
+        logger.error("Error updating cohort analytics: %s", e)
 
 @app.route('/submit', methods=['POST'])
 def submit():
     if request.method == 'POST':
-        responses = request.json
-        session['responses'] = responses
+        responses = request.get_json(silent=True)
+        draft_id = budget = None
+        if isinstance(responses, dict):
+            responses = dict(responses)
+            draft_id = responses.pop('draft_id', None)
+            # Seconds the caller is willing to wait, e.g. 2 for a live demo
+            budget = responses.pop('budget_seconds', None)
+        
+        # Validated and normalized once; every generator reads the profile
+        try:
+            budget = parse_budget(budget)
+            profile = get_profile_schema().validate(responses)
+        except InvalidSubmission as e:
+            return invalid_submission_response(e)
+        responses = profile.answers()
+        
+        degraded = False
+        try:
+            with admission.admit():
+                # Generate report within the end-to-end deadline, started on arrival
+                deadline = Deadline.from_env(budget)
+                ready = speculator.take(draft_id, responses) if draft_id else {}
+                if ready:
+                    # Only the sections not generated ahead of time are left
+                    logger.info("Reusing %d speculatively generated sections", len(ready))
+                report, tier = generate_report(profile, deadline, priority=INTERACTIVE, ready=ready)
+        except Overloaded as e:
+            logger.warning("Submission not admitted: %s", e)
+            if ADMISSION_OVERLOAD_MODE == 'reject':
+                return too_busy_response(e)
+            report, tier = ai_engine.generate_routed_report(profile, tiers=(ENHANCED, BASIC))
+            degraded = True
         
-        # Generate report
-        report = generate_report(responses)
-        session['report'] = report
+        session['report_id'] = report_store.create(responses, report, degraded=degraded, tier=tier)
+        update_cohort(session['report_id'], responses)
         
+        return jsonify({"success": True, "redirect": url_for('report'), "degraded": degraded, "tier": tier})
+
+@app.route('/draft', methods=['POST'])
+def save_draft():
+    """Accept a completed section of answers and start generating what it makes possible"""
+    data = request.get_json(silent=True)
+    try:
+        if not isinstance(data, dict):
+            raise InvalidSubmission("Request body must be a JSON object")
+        if not isinstance(data.get('draft_id'), (str, type(None))):
+            raise InvalidSubmission("Invalid value for 'draft_id'")
+        profile = get_profile_schema().validate(data.get('answers') or {})
+    except InvalidSubmission as e:
+        return invalid_submission_response(e)
+    draft_id, generating = speculator.update(data.get('draft_id'), profile.answers(), tenant=profile.school_id)
+    return jsonify({"success": True, "draft_id": draft_id, "generating": generating})
+
+@app.route('/report/upgrade', methods=['POST'])
+def upgrade_report():
+    """Regenerate a report that was served from the template while over capacity"""
+    stored = report_store.get(session['report_id']) if 'report_id' in session else None
+    if stored is None:
+        return jsonify({"success": False, "error": "报告不存在"}), 404
+    if not stored['degraded']:
         return jsonify({"success": True, "redirect": url_for('report')})
+    
+    try:
+        with admission.admit():
+            report, tier = generate_report(stored['responses'], Deadline.from_env(), priority=REGENERATION)
+    except Overloaded as e:
+        return too_busy_response(e)
+    
+    session['report_id'] = report_store.create(stored['responses'], report, tier=tier, replaces=stored['id'])
+    update_cohort(session['report_id'], stored['responses'], replaces=stored['id'])
+    return jsonify({"success": True, "redirect": url_for('report')})
+
+@app.route('/report/edit', methods=['POST'])
+def edit_report():
+    """Apply edited answers, re-generating only the report sections they affect"""
+    stored = report_store.get(session['report_id']) if 'report_id' in session else None
+    if stored is None:
+        return jsonify({"success": False, "error": "报告不存在"}), 404
+    
+    changes = request.get_json(silent=True)
+    try:
+        if not isinstance(changes, dict):
+            raise InvalidSubmission("Request body must be a JSON object")
+        get_profile_schema().validate(changes)
+    except InvalidSubmission as e:
+        return invalid_submission_response(e)
+    profile = ai_engine.profile_of(dict(stored['responses'], **changes))
+    responses = profile.answers()
+    # Compared in normalized form, so answers stored before normalization
+    # only count as changed when they really were edited
+    sections = invalidated_sections(ai_engine.profile_of(stored['responses']).answers(), responses)
+    report = stored['report']
+    if sections:
+        try:
+            with admission.admit():
+                report = ai_engine.regenerate_sections(report, profile, sections, Deadline.from_env(),
+                                                       priority=REGENERATION, tenant=profile.school_id)
+        except Overloaded as e:
+            return too_busy_response(e)
+    
+    report_id = report_store.create(responses, report, degraded=stored['degraded'], tier=stored['tier'],
+                                    replaces=stored['id'])
+    
+    # Sections that did not change keep their already rendered HTML
+    if stored['html'] is not None:
+        html = {field: value for field, value in stored['html'].items()
+                if report.get(field) == stored['report'].get(field)}
+        html.update(render_report_sections({field: value for field, value in report.items() if field not in html}))
+        report_store.set_html(report_id, html)
+    
+    session['report_id'] = report_id
+    update_cohort(report_id, responses, replaces=stored['id'])
+    return jsonify({"success": True, "redirect": url_for('report'), "regenerated": sections})
 
 @app.route('/report')
 def report():
-    if 'report' not in session:
+    report_id = session.get('report_id')
+    if not report_id:
         return redirect(url_for('assessment'))
     
-    report = session['report']
-    responses = session['responses']
-    
     # Get model name for the template
-    model_preference = os.getenv('LLM_MODEL_PREFERENCE', 'llama3').lower()
-    if model_preference == 'llama3':
-        model_name = "Llama 3 (8B)"
-    elif model_preference == 'llama2':
-        model_name = "Llama 2"
-    elif model_preference == 'mistral':
-        model_name = "Mistral"
-    elif model_preference == 'falcon':
-        model_name = "Falcon"
-    else:
-        model_name = "Llama 3 (8B)"
+    model_name = get_model_display_name(get_model_chain()[0])
+    
+    stored = report_store.get(report_id)
+    if stored is None:
+        return redirect(url_for('assessment'))
     
-    return render_template("report.html", report=report, responses=responses, model_name=model_name)
+    # A stored report never changes, so a repeat view is validated from the
+    # report ID, the template and the fingerprinted assets the page links to,
+    # without rendering anything
+    template_mtime = os.path.getmtime(os.path.join(app.root_path, 'templates', 'report.html'))
+    etag = http_cache.compute_etag(report_id, model_name, str(template_mtime), app.config.get('ASSET_VERSION', ''))
+    if http_cache.is_not_modified(etag):
+        return http_cache.not_modified_response(app, etag, 'private, no-cache')
+    
+    # Markdown is rendered to HTML on the first view only
+    sections = stored['html']
+    if sections is None:
+        sections = render_report_sections(stored['report'])
+        report_store.set_html(report_id, sections)
+    
+    response = make_response(render_template("report.html", report=stored['report'], sections=sections,
+                                             responses=stored['responses'], model_name=model_name,
+                                             degraded=stored['degraded']))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/admin/llm')
+def admin_llm():
+    """The adaptive LLM concurrency limit and the scheduler's queues, for monitoring (needs EXPORT_TOKEN)"""
+    if not export.authorized():
+        return jsonify({"success": False, "error": "无权查看LLM状态"}), 403
+    limit = getattr(ai_engine, 'llm_limit', None)
+    if limit is None:
+        return jsonify({"success": False, "error": "LLM未启用"}), 404
+    scheduler = ai_engine.llm_scheduler.snapshot()
+    return jsonify({"success": True, "limit": limit.snapshot(), "queued": sum(scheduler['queued'].values()),
+                    "scheduler": scheduler, "breakers": ai_engine.circuit_breaker.snapshot()})
 
-def generate_report(responses):
-    """Generate a personalized report based on assessment responses"""
+@app.route('/admin/catalogs')
+def admin_catalogs():
+    """Resident per-school catalogs and the cache's hit, miss and eviction counts (needs EXPORT_TOKEN)"""
+    if not export.authorized():
+        return jsonify({"success": False, "error": "无权查看学校数据缓存"}), 403
+    catalogs = getattr(ai_engine, 'catalogs', None)
+    if catalogs is None:
+        return jsonify({"success": False, "error": "AI引擎未启用"}), 404
+    return jsonify({"success": True, "catalogs": catalogs.snapshot()})
+
+def generate_report(responses, deadline=None, priority=INTERACTIVE, ready=None):
+    """Generate a personalized report based on assessment responses, returning (report, tier)
+
+    ready holds sections already generated ahead of submission.
+    """
     try:
-        logger.info("Generating report using AI Engine")
-        # Use the AI Engine to generate an enhanced report
-        return ai_engine.generate_enhanced_report(responses)
+        # The AI Engine serves the best tier that fits in the deadline; the
+        # school the submission came from is its tenant for LLM quotas
+        profile = ai_engine.profile_of(responses)
+        return ai_engine.generate_routed_report(profile, deadline=deadline, priority=priority,
+                                                tenant=profile.school_id, ready=ready)
     except Exception as e:
-        logger.error(f"Error generating report: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Error generating report: %s", e, exc_info=True)
         # Fallback report in case of errors
         return {
             "summary": "无法生成完整的个性化报告。请检查您的回答是否完整，或稍后再试。",
             "error": str(e)
-        }
+        }, None
+
+def warm_assessment_page():
+    """Render the assessment page and its compressed copies ahead of the first request"""
+    page = get_assessment_page()
+    if len(page['body']) >= http_cache.COMPRESS_MIN_SIZE:
+        encodings = ('br', 'gzip') if http_cache.brotli is not None else ('gzip',)
+        for encoding in encodings:
+            page['encoded'][encoding] = http_cache.compress(page['body'], encoding)
+
+def check_ai_engine():
+    """Fail the warmup when the AI Engine or its catalogs did not load"""
+    if not ai_engine.is_available or getattr(ai_engine, 'catalogs', None) is None:
+        raise RuntimeError("AI Engine failed to initialize")
+
+# Build every cache before gunicorn forks the workers (preload_app)
+warmup.run(app, check_ai_engine, load_questions, warm_assessment_page)
 
 if __name__ == '__main__':
     # Get port from environment variable (Render sets this)
@@ -0,0 +1,81 @@
+"""
+Fingerprinted static assets for the Student Assessment System
+Resolves template asset references through the build manifest and serves
+the hashed files as immutable, picking precompressed variants when accepted
+"""
+
+import os
+import json
+import hashlib
+import logging
+import mimetypes
+from flask import request, send_from_directory, url_for
+
+logger = logging.getLogger(__name__)
+
+DIST_SUBDIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Hashed file names change with their content, so they can be cached forever
+ONE_YEAR = 31536000
+IMMUTABLE_CACHE_CONTROL = f'public, max-age={ONE_YEAR}, immutable'
+
+# Preferred first
+PRECOMPRESSED_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def load_manifest(static_folder):
+    """Load static/dist/manifest.json, or an empty manifest if assets were not built"""
+    path = os.path.join(static_folder, DIST_SUBDIR, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.warning("Asset manifest not found; run build_assets.py to fingerprint static files")
+        return {}
+    except Exception as e:
+        logger.error("Error loading asset manifest: %s", e)
+        return {}
+
+
+def init_app(app):
+    """Register the /assets route and the asset_url/asset_srcset template helpers
+
+    app.config['ASSET_VERSION'] is set to a hash of the manifest, which
+    changes whenever build_assets.py fingerprints different files, for
+    validators of pages that reference them.
+    """
+    manifest = load_manifest(app.static_folder)
+    app.config['ASSET_VERSION'] = hashlib.sha256(
+        json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    dist_folder = os.path.join(app.static_folder, DIST_SUBDIR)
+    encodings_by_path = {entry['path']: entry.get('encodings', []) for entry in manifest.values()}
+
+    def asset_url(path):
+        """URL of the fingerprinted copy of a static file, or the plain static URL"""
+        entry = manifest.get(path)
+        if entry is None:
+            return url_for('static', filename=path)
+        return url_for('assets', filename=entry['path'])
+
+    def asset_srcset(path, fmt):
+        """srcset value listing the resized copies of an image in one format"""
+        variants = manifest.get(path, {}).get('variants', {}).get(fmt, [])
+        return ', '.join(f"{url_for('assets', filename=v['path'])} {v['width']}w" for v in variants)
+
+    app.jinja_env.globals.update(asset_url=asset_url, asset_srcset=asset_srcset)
+
+    @app.route('/assets/<path:filename>')
+    def assets(filename):
+        available = encodings_by_path.get(filename, [])
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+            if encoding in available and request.accept_encodings[encoding]:
+                response = send_from_directory(dist_folder, filename + suffix, max_age=ONE_YEAR)
+                response.headers['Content-Encoding'] = encoding
+                response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                break
+        else:
+            response = send_from_directory(dist_folder, filename, max_age=ONE_YEAR)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        return response
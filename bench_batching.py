@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark dynamic batching of local-model inference on CPU
+
+Sends the same set of concurrent prompts through a BatchingGenerator with
+batching disabled (max batch size 1, i.e. one generate() per request) and
+with batching enabled, and reports throughput and latency for each.
+
+By default a small causal LM (distilgpt2) is loaded from the Hugging Face
+cache; with --random-init, or when it cannot be loaded, a randomly
+initialized GPT-2 of similar shape with a character-level tokenizer is used
+instead, which measures the same compute without any download.
+
+With --shared-prefix every prompt starts with the same instruction block,
+as the report prompts do, and each batch size is run twice: prefilling the
+whole prompt, and reusing the cached KV of the prefix.
+
+Usage:
+    python bench_batching.py [--requests 32] [--new-tokens 32] [--batch-sizes 1,4,8,16] [--shared-prefix]
+"""
+
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer, GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+from local_inference import BatchingGenerator
+
+PROMPTS = [
+    "The student enjoys mathematics and computer science, and wants to",
+    "A good study plan for a visual learner who struggles to focus is",
+    "Extracurricular activities that build leadership include",
+    "Universities in Canada with strong engineering programs are",
+    "To prepare for a career in data science, a high school student should",
+    "The most important skills in the age of artificial intelligence are",
+    "Students who prefer working in teams often become",
+    "When applying to universities abroad, the personal statement should",
+]
+
+# Fixed instructions in front of every prompt with --shared-prefix
+PREFIX = (
+    "You are an experienced education consultant and psychologist. Based on the student information at the end, "
+    "write a detailed, personalized assessment report with these parts: a summary of the student's key traits and "
+    "potential; academic analysis and learning strategies; personality insights and personal development; career "
+    "guidance and planning; extracurricular recommendations; university application advice; and the skills needed "
+    "in the age of artificial intelligence. Make the report highly personalized, give concrete and practical advice, "
+    "keep the language professional but easy to understand, and consider the student's unique needs.\n\n"
+    "Student information: "
+)
+
+
+def _random_init_model():
+    """distilgpt2-shaped GPT-2 with random weights and a character-level tokenizer"""
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    chars = sorted(set(''.join(PROMPTS) + PREFIX))
+    vocab = {'<pad>': 0, '<eos>': 1, '<unk>': 2}
+    vocab.update({c: i + 3 for i, c in enumerate(chars)})
+    backend = Tokenizer(models.WordLevel(vocab, unk_token='<unk>'))
+    backend.pre_tokenizer = pre_tokenizers.Split('', 'isolated')
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=backend, pad_token='<pad>',
+                                        eos_token='<eos>', unk_token='<unk>')
+
+    config = GPT2Config(vocab_size=len(vocab), n_positions=1024, n_embd=768, n_layer=6, n_head=12,
+                        bos_token_id=1, eos_token_id=1)
+    torch.manual_seed(0)
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+
+def load_model(name, random_init):
+    if not random_init:
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(name)
+            model = AutoModelForCausalLM.from_pretrained(name).eval()
+            return model, tokenizer, name
+        except Exception as e:
+            print(f"Could not load {name} ({type(e).__name__}), using a randomly initialized GPT-2 instead")
+    model, tokenizer = _random_init_model()
+    return model, tokenizer, 'random-init gpt2 (6 layers, 768 wide)'
+
+
+def run(model, tokenizer, max_batch_size, requests, new_tokens, max_wait, prefix=None, cache_prefix=False):
+    generator = BatchingGenerator(model, tokenizer, max_batch_size=max_batch_size, max_wait=max_wait,
+                                  do_sample=False, min_new_tokens=new_tokens)
+
+    def call(prompt):
+        if cache_prefix:
+            return generator.generate(prompt, max_new_tokens=new_tokens, prefix=prefix)
+        return generator.generate((prefix or '') + prompt, max_new_tokens=new_tokens)
+
+    # Warm up kernels, allocator and the prefix cache outside the timed region
+    call(PROMPTS[0])
+
+    def one(i):
+        started = time.perf_counter()
+        call(PROMPTS[i % len(PROMPTS)])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=requests) as pool:
+        latencies = sorted(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'max_batch_size': max_batch_size,
+        'prefix': 'cached' if cache_prefix else ('prefill' if prefix else '-'),
+        'elapsed_s': elapsed,
+        'req_per_s': requests / elapsed,
+        'tokens_per_s': requests * new_tokens / elapsed,
+        'p50_s': statistics.median(latencies),
+        'p95_s': latencies[int(0.95 * (len(latencies) - 1))],
+        'mean_batch': (generator.batched_requests - 1) / max(1, generator.batches - 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='distilgpt2', help='Hugging Face model id or local path')
+    parser.add_argument('--random-init', action='store_true', help='skip loading weights, use a random GPT-2')
+    parser.add_argument('--requests', type=int, default=32, help='concurrent prompts per run')
+    parser.add_argument('--new-tokens', type=int, default=32, help='tokens generated per prompt')
+    parser.add_argument('--batch-sizes', default='1,4,8,16', help='comma-separated max batch sizes')
+    parser.add_argument('--max-wait-ms', type=float, default=20, help='batching window in milliseconds')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--shared-prefix', action='store_true', help='prepend a fixed instruction block to every prompt')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model, tokenizer, label = load_model(args.model, args.random_init)
+
+    print(f"model={label} device=cpu torch threads={torch.get_num_threads()}")
+    print(f"requests={args.requests} new tokens={args.new_tokens} max wait={args.max_wait_ms}ms")
+    if args.shared_prefix:
+        print(f"shared prefix={len(tokenizer(PREFIX)['input_ids'])} tokens")
+    print(f"{'batch':>6} {'prefix':>8} {'mean':>6} {'elapsed s':>10} {'req/s':>8} {'tok/s':>8} {'p50 s':>8} {'p95 s':>8}")
+    modes = (False, True) if args.shared_prefix else (False,)
+    for max_batch_size in (int(b) for b in args.batch_sizes.split(',')):
+        for cache_prefix in modes:
+            r = run(model, tokenizer, max_batch_size, args.requests, args.new_tokens, args.max_wait_ms / 1000,
+                    prefix=PREFIX if args.shared_prefix else None, cache_prefix=cache_prefix)
+            print(f"{r['max_batch_size']:>6} {r['prefix']:>8} {r['mean_batch']:>6.1f} {r['elapsed_s']:>10.2f} "
+                  f"{r['req_per_s']:>8.2f} {r['tokens_per_s']:>8.1f} {r['p50_s']:>8.2f} {r['p95_s']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark /submit throughput under the sync and gevent gunicorn worker classes
+
+The Hugging Face call is replaced with a fake client that sleeps for a fixed
+latency, so the numbers measure how many I/O-bound report generations one
+worker process can overlap, not model speed.
+
+Usage:
+    python bench_concurrency.py [--requests 100] [--concurrency 100] [--latency 1.0]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_RESPONSES = {
+    "p1": "16-17岁", "p2": "高二", "a1": "数学和计算机科学", "a2": ["视觉学习者"],
+    "a3": "有时候难以长时间集中注意力", "a4": "数学、物理", "a5": "历史、政治",
+    "c1": "软件工程师或数据科学家", "c2": "科技、人工智能", "c3": "计算机科学",
+    "ps1": ["策划者"], "ps2": "视情况而定", "ps3": "把大问题分解成小问题", "ps4": "较高",
+    "e1": "机器人俱乐部、数学竞赛", "e2": "机器人俱乐部", "e3": "编程、下棋",
+    "d1": "领导能力", "d2": "逻辑思维", "d3": "时间管理", "d4": "有一定了解",
+    "i1": "中级", "i4": ["美国"]
+}
+
+FAKE_REPORT = json.dumps({
+    "summary": "基准测试摘要", "academic_analysis": "学术分析", "personality_insights": "性格洞察",
+    "career_guidance": "职业指导", "extracurricular_recommendations": "课外活动建议",
+    "development_plan": "发展计划", "university_application_advice": "大学申请建议",
+    "ai_era_skills": "AI时代技能"
+}, ensure_ascii=False)
+
+
+def _install_fake_llm():
+    """Replace the Hugging Face client with one that only waits on a timer"""
+    import ai_engine
+
+    latency = float(os.environ.get('BENCH_LLM_LATENCY', '1.0'))
+
+    class FakeInferenceClient:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def text_generation(self, prompt, **kwargs):
+            time.sleep(latency)
+            return FAKE_REPORT
+
+    ai_engine.InferenceClient = FakeInferenceClient
+
+
+if os.environ.get('BENCH_WORKER') == '1':
+    # Imported by gunicorn inside the benchmark: build the app with the fake LLM
+    os.environ.setdefault('HF_API_TOKEN', 'bench-token')
+    os.environ.pop('RENDER', None)
+    import ai_engine
+    ai_engine.hf_api_key = os.environ['HF_API_TOKEN']
+    _install_fake_llm()
+    from app import app  # noqa: E402
+
+
+def _worker_rss_kb(master_pid):
+    """Sum VmRSS of the gunicorn worker processes (Linux only)"""
+    total = 0
+    try:
+        children = open(f'/proc/{master_pid}/task/{master_pid}/children').read().split()
+    except OSError:
+        return None
+    for pid in children:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def _post_submit(url):
+    body = json.dumps(SAMPLE_RESPONSES, ensure_ascii=False).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def _wait_until_up(url, deadline):
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def run_mode(worker_class, args, port):
+    env = dict(os.environ, BENCH_WORKER='1', BENCH_LLM_LATENCY=str(args.latency),
+               GUNICORN_WORKER_CLASS=worker_class, PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'bench_concurrency:app', '-c', 'gunicorn_config.py',
+         '--log-level', 'warning', '--timeout', '600'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        if not _wait_until_up(base + '/', time.time() + 60):
+            raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+
+        peak_rss = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(_post_submit, base + '/submit') for _ in range(args.requests)]
+            while not all(f.done() for f in futures):
+                peak_rss = max(peak_rss, _worker_rss_kb(server.pid) or 0)
+                time.sleep(0.1)
+            results = [f.result() for f in futures]
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    latencies = sorted(lat for ok, lat in results if ok)
+    succeeded = len(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float('nan')
+
+    return {
+        'worker_class': worker_class,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'elapsed_s': elapsed,
+        'throughput_rps': succeeded / elapsed if elapsed else 0.0,
+        'p50_s': pct(0.50),
+        'p95_s': pct(0.95),
+        'peak_worker_rss_mb': peak_rss / 1024 if peak_rss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='total /submit requests per mode')
+    parser.add_argument('--concurrency', type=int, default=100, help='concurrent client connections')
+    parser.add_argument('--latency', type=float, default=1.0, help='simulated LLM latency in seconds')
+    parser.add_argument('--modes', default='sync,gevent', help='comma-separated worker classes')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} simulated LLM latency={args.latency}s")
+    print(f"{'worker':<8} {'ok':>5} {'fail':>5} {'elapsed s':>10} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'RSS MB':>8}")
+    for mode in args.modes.split(','):
+        r = run_mode(mode.strip(), args, args.port)
+        rss = f"{r['peak_worker_rss_mb']:.0f}" if r['peak_worker_rss_mb'] else 'n/a'
+        print(f"{r['worker_class']:<8} {r['succeeded']:>5} {r['failed']:>5} {r['elapsed_s']:>10.1f} "
+              f"{r['throughput_rps']:>8.2f} {r['p50_s']:>8.2f} {r['p95_s']:>8.2f} {rss:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark the logging overhead of a request
+
+Each simulated request logs what /submit logs on its way through the app
+(a handful of INFO lines, optionally one error with a traceback) from
+several threads at once. The time spent inside the logging calls is
+measured for the previous setup (basicConfig: a StreamHandler formatting
+and writing in the request thread) and for the queue pipeline from
+structured_logging (JSON, formatted and written by the listener thread),
+with and without sampling. The sink can be slowed down with --sink-delay-ms
+to show what a blocked pipe or a busy disk does to request threads.
+
+Usage:
+    python bench_logging.py [--requests 2000] [--threads 8] [--sink-delay-ms 0.2] [--errors 0.05]
+"""
+
+import io
+import time
+import random
+import logging
+import argparse
+import statistics
+from queue import Queue
+from logging.handlers import QueueListener
+from concurrent.futures import ThreadPoolExecutor
+
+from structured_logging import TEXT_FORMAT, JSONFormatter, SamplingFilter, LazyQueueHandler, parse_sampling
+
+
+class SlowSink(io.TextIOBase):
+    """Discards writes after sleeping, like a pipe whose reader is falling behind"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, data):
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += 1
+        return len(data)
+
+
+def simulated_request(eager, error_rate):
+    """The log calls of one /submit; eager uses the f-strings the app used before"""
+    engine, client, app = (logging.getLogger(name) for name in ('ai_engine', 'llm_client', 'app'))
+    model, ready, sections = "Qwen2.5 7B Instruct", 4, ['career_guidance', 'skill_development', 'learning_style']
+    if eager:
+        client.info(f"Requesting report from {model}")
+        app.info(f"Reusing {ready} speculatively generated sections")
+        engine.info(f"Re-generated sections: {', '.join(sections)}")
+        engine.info(f"Report generated by {model}")
+        engine.info(f"Using template text for sections: {', '.join(sections)}")
+    else:
+        client.info("Requesting report from %s", model)
+        app.info("Reusing %d speculatively generated sections", ready)
+        engine.info("Re-generated sections: %s", ', '.join(sections))
+        engine.info("Report generated by %s", model)
+        engine.info("Using template text for sections: %s", ', '.join(sections))
+    if random.random() < error_rate:
+        try:
+            raise KeyError('positive')
+        except KeyError as e:
+            if eager:
+                import traceback
+                app.error(f"Error generating report: {str(e)}\n{traceback.format_exc()}")
+            else:
+                app.error("Error generating report: %s", e, exc_info=True)
+
+
+def run(setup, requests, threads, sink_delay, error_rate, sampling):
+    sink = SlowSink(sink_delay)
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.setLevel(logging.INFO)
+
+    listener = None
+    if setup == 'blocking':
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        target = logging.StreamHandler(sink)
+        target.setFormatter(JSONFormatter())
+        handler = LazyQueueHandler(Queue(-1))
+        handler.addFilter(SamplingFilter(parse_sampling(sampling if setup == 'queue+sampling' else '')))
+        listener = QueueListener(handler.queue, target, respect_handler_level=True)
+        listener.start()
+    root.addHandler(handler)
+
+    def one(_):
+        started = time.perf_counter()
+        simulated_request(setup == 'blocking', error_rate)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - started
+    if listener is not None:
+        listener.stop()
+    drained = time.perf_counter() - started
+    root.removeHandler(handler)
+
+    return {
+        'setup': setup,
+        'mean_us': statistics.mean(latencies) * 1e6,
+        'p50_us': statistics.median(latencies) * 1e6,
+        'p99_us': latencies[int(0.99 * (len(latencies) - 1))] * 1e6,
+        'elapsed_s': elapsed,
+        'drained_s': drained,
+        'lines': sink.lines,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='simulated requests per setup')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent request threads')
+    parser.add_argument('--sink-delay-ms', type=float, default=0, help='time the sink takes per line')
+    parser.add_argument('--errors', type=float, default=0.05, help='fraction of requests logging a traceback')
+    parser.add_argument('--sampling', default='ai_engine=0.1,llm_client=0.5', help='LOG_SAMPLING for the sampled run')
+    args = parser.parse_args()
+
+    print(f"requests={args.requests} threads={args.threads} sink delay={args.sink_delay_ms}ms "
+          f"errors={args.errors:.0%} sampling={args.sampling}")
+    print(f"{'setup':>15} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'elapsed s':>10} {'drained s':>10} {'lines':>7}")
+    for setup in ('blocking', 'queue', 'queue+sampling'):
+        r = run(setup, args.requests, args.threads, args.sink_delay_ms / 1000, args.errors, args.sampling)
+        print(f"{r['setup']:>15} {r['mean_us']:>9.1f} {r['p50_us']:>9.1f} {r['p99_us']:>9.1f} "
+              f"{r['elapsed_s']:>10.3f} {r['drained_s']:>10.3f} {r['lines']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed static assets
+
+Copies every file under static/ into static/dist/ with a content hash in
+its name, writes .gz/.br variants of text assets, emits resized WebP/AVIF
+copies of raster images, and records the mapping in static/dist/manifest.json.
+The app serves these files with Cache-Control: immutable (see assets.py).
+
+Usage:
+    python build_assets.py
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image, features
+except ImportError:
+    Image = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+RASTER_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+
+# Widths of the resized image copies; wider than the source are skipped
+IMAGE_WIDTHS = (480, 960, 1440)
+
+
+def _fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _hashed_name(rel_path, digest, suffix=''):
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}{suffix}.{digest}{ext}"
+
+
+def _write(rel_path, data):
+    out_path = os.path.join(DIST_DIR, rel_path)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+
+
+def _precompress(rel_path, data):
+    """Write .gz and .br next to a text asset when they are smaller; return the encodings written"""
+    encodings = []
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gz) < len(data):
+        _write(rel_path + '.gz', gz)
+        encodings.append('gzip')
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            _write(rel_path + '.br', br)
+            encodings.append('br')
+    return encodings
+
+
+def _image_variants(rel_path, source_path):
+    """Write resized WebP/AVIF copies of a raster image; return {format: [{width, path}]}"""
+    if Image is None:
+        logger.warning("Pillow not installed, skipping image variants for %s", rel_path)
+        return {}
+    try:
+        image = Image.open(source_path)
+        image.load()
+    except Exception as e:
+        logger.warning("Cannot decode %s as an image (%s), skipping variants", rel_path, e)
+        return {}
+
+    formats = [('webp', 'WEBP', {'quality': 80, 'method': 6})]
+    if 'avif' in getattr(features, 'modules', {}) and features.check('avif'):
+        formats.append(('avif', 'AVIF', {'quality': 60}))
+    else:
+        logger.warning("Pillow has no AVIF support, emitting WebP only")
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    widths = [w for w in IMAGE_WIDTHS if w < image.width] + [image.width]
+    variants = {}
+    for fmt, pil_format, options in formats:
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            out_rel = os.path.splitext(rel_path)[0] + f'.{fmt}'
+            tmp_path = os.path.join(DIST_DIR, out_rel + '.tmp')
+            os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+            resized.save(tmp_path, pil_format, **options)
+            with open(tmp_path, 'rb') as f:
+                data = f.read()
+            os.remove(tmp_path)
+            hashed = _hashed_name(out_rel, _fingerprint(data), suffix=f'.{width}w')
+            _write(hashed, data)
+            variants.setdefault(fmt, []).append({'width': width, 'path': hashed})
+    return variants
+
+
+def build():
+    """Rebuild static/dist from static/ and return the manifest"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for dirpath, dirnames, filenames in os.walk(STATIC_DIR):
+        if os.path.abspath(dirpath).startswith(DIST_DIR):
+            continue
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != DIST_DIR]
+        for filename in sorted(filenames):
+            source_path = os.path.join(dirpath, filename)
+            rel_path = os.path.relpath(source_path, STATIC_DIR).replace(os.sep, '/')
+            with open(source_path, 'rb') as f:
+                data = f.read()
+
+            hashed = _hashed_name(rel_path, _fingerprint(data))
+            _write(hashed, data)
+            entry = {'path': hashed}
+
+            ext = os.path.splitext(filename)[1].lower()
+            if ext in TEXT_EXTENSIONS:
+                entry['encodings'] = _precompress(hashed, data)
+            elif ext in RASTER_EXTENSIONS:
+                variants = _image_variants(rel_path, source_path)
+                if variants:
+                    entry['variants'] = variants
+
+            manifest[rel_path] = entry
+            logger.info("%s -> %s", rel_path, hashed)
+
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    logger.info("Wrote %d assets to %s", len(manifest), DIST_DIR)
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,211 @@
+"""
+Career, university and education catalogs for the Student Assessment System
+A catalog is compiled once into keyword indexes over its programs and
+careers plus a segmenter dictionary of its words. Partner schools can ship
+their own catalogs (data/tenants/<school_id>/); those are compiled on first
+use and kept in an LRU bounded by their estimated memory, so one process
+can serve many schools without holding every catalog.
+"""
+
+import os
+import sys
+import json
+import logging
+import threading
+from collections import OrderedDict
+from segmenter import Segmenter
+
+logger = logging.getLogger(__name__)
+
+EDUCATION = 'education_data.json'
+CAREERS = 'career_data.json'
+UNIVERSITIES = 'university_data.json'
+CATALOG_FILES = (EDUCATION, CAREERS, UNIVERSITIES)
+
+
+def load_json(path):
+    """Load a JSON data file, or return an empty dict if it is missing or invalid"""
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        logger.warning("Data file %s not found", path)
+    except Exception as e:
+        logger.error("Error loading data file %s: %s", path, e)
+    return {}
+
+
+def _referenced(obj):
+    if isinstance(obj, dict):
+        return list(obj.keys()) + list(obj.values())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return obj
+    return ()
+
+
+def object_ids(obj):
+    """ids of obj and every container and value reachable from it"""
+    seen = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        stack.extend(_referenced(item))
+    return seen
+
+
+def deep_sizeof(obj, exclude=frozenset()):
+    """Approximate bytes held by obj and everything it references, skipping the ids in exclude"""
+    seen = set(exclude)
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        stack.extend(_referenced(item))
+    return total
+
+
+class Catalog:
+    """One set of catalogs compiled for matching
+
+    programs and careers are indexed by keyword (keyword -> positions), and
+    the segmenter knows every keyword and name in the three catalogs.
+    """
+
+    def __init__(self, data, cache_size=4096):
+        self.data = data
+        self.programs = []
+        self.program_index = {}
+        for university in data[UNIVERSITIES].get('universities', []):
+            for program in university.get('programs', []):
+                for keyword in set(program.get('keywords', [])):
+                    self.program_index.setdefault(keyword, []).append(len(self.programs))
+                self.programs.append({
+                    'university': university.get('name'),
+                    'program': program.get('name'),
+                    'country': university.get('country'),
+                    'description': program.get('description', ''),
+                    'requirements': program.get('requirements', '')
+                })
+
+        self.careers = data[CAREERS].get('careers', [])
+        self.career_index = {}
+        for position, career in enumerate(self.careers):
+            for keyword in set(career.get('keywords', [])):
+                self.career_index.setdefault(keyword, []).append(position)
+
+        self.segmenter = Segmenter(self._vocabulary(), cache_size=cache_size)
+        self.size = 0
+
+    @classmethod
+    def load(cls, directory, fallback=None, cache_size=4096):
+        """Compile the catalog files in directory; files it lacks come from fallback's data"""
+        data = {}
+        for filename in CATALOG_FILES:
+            path = os.path.join(directory, filename)
+            if fallback is not None and not os.path.exists(path):
+                data[filename] = fallback.data[filename]
+            else:
+                data[filename] = load_json(path)
+        return cls(data, cache_size)
+
+    def _vocabulary(self):
+        """Every keyword and name in the career, university and education catalogs"""
+        words = set(self.program_index) | set(self.career_index)
+        words.update(program['program'] or '' for program in self.programs)
+        words.update(career.get('name', '') for career in self.careers)
+
+        education = self.data[EDUCATION]
+        words.update(item.get('style', '') for item in education.get('learning_styles', []))
+        words.update(item.get('challenge', '') for item in education.get('learning_challenges', []))
+        for trait in education.get('personality_traits', []):
+            words.add(trait.get('trait', ''))
+            words.update(trait.get('strengths', []))
+            words.update(trait.get('career_matches', []))
+        return words
+
+
+class CatalogCache:
+    """Per-school catalogs, compiled lazily and kept in an LRU bounded by estimated bytes
+
+    A school with a directory under root gets a catalog built from the
+    files there, falling back to the default catalog's data for any file
+    it does not override; every other school uses the default catalog,
+    which is always resident and not counted against max_bytes. A tenant
+    catalog's size counts its indexes, segmenter and own data, not what it
+    shares with the default. Segment caches are bounded by entry count
+    (segment_cache_size) rather than bytes.
+    """
+
+    def __init__(self, default, root=None, max_bytes=None, segment_cache_size=256):
+        self.default = default
+        self.root = root if root is not None else os.getenv('TENANT_CATALOG_DIR', os.path.join('data', 'tenants'))
+        self.max_bytes = max_bytes if max_bytes is not None \
+            else int(float(os.getenv('TENANT_CATALOG_CACHE_MB', '64')) * 1024 * 1024)
+        self.segment_cache_size = segment_cache_size
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self._entries = OrderedDict()
+        self._shared_ids = None
+        self._lock = threading.Lock()
+
+    def _directory(self, school_id):
+        """The school's catalog directory, or None when it has none (or the ID is not a plain name)"""
+        if not school_id or not isinstance(school_id, str) or school_id.startswith('.') \
+                or school_id != os.path.basename(school_id):
+            return None
+        directory = os.path.join(self.root, school_id)
+        return directory if os.path.isdir(directory) else None
+
+    def get(self, school_id):
+        """The catalog to match a submission from this school against"""
+        directory = self._directory(school_id)
+        if directory is None:
+            return self.default
+
+        with self._lock:
+            catalog = self._entries.get(school_id)
+            if catalog is not None:
+                self._entries.move_to_end(school_id)
+                self.hits += 1
+                return catalog
+            self.misses += 1
+            if self._shared_ids is None:
+                self._shared_ids = object_ids(self.default.data)
+
+        # Compiled outside the lock; if two requests race, the first to finish is kept
+        catalog = Catalog.load(directory, fallback=self.default, cache_size=self.segment_cache_size)
+        catalog.size = deep_sizeof((catalog.data, catalog.programs, catalog.program_index, catalog.careers,
+                                    catalog.career_index, catalog.segmenter.root), exclude=self._shared_ids)
+        logger.info("Compiled catalog of %s: %d words, about %d KB", school_id, catalog.segmenter.size,
+                    catalog.size // 1024)
+
+        with self._lock:
+            existing = self._entries.get(school_id)
+            if existing is not None:
+                return existing
+            self._entries[school_id] = catalog
+            self.bytes += catalog.size
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+                self.evicted_bytes += evicted.size
+                logger.debug("Evicted catalog of %s (%d bytes)", evicted_id, evicted.size)
+        return catalog
+
+    def snapshot(self):
+        """Resident tenant catalogs, their estimated bytes, and hit, miss and eviction counts"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'evicted_bytes': self.evicted_bytes}
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk export of stored reports as a ZIP archive
+
+Reports are read from the store a page at a time, rendered to standalone
+HTML (and PDF when WeasyPrint is installed) by a pool of worker threads,
+and written into a ZIP archive whose bytes are handed out entry by entry.
+Only one page of reports, the reports being rendered and the entry being
+compressed are held in memory (plus the archive's central directory, about
+200 bytes per entry), so memory stays flat whatever the size of the cohort,
+and the first bytes go out as soon as the first report is rendered.
+
+Usage:
+    python export.py --grade 高二 --format html,pdf -o 高二.zip
+"""
+
+import os
+import sys
+import hmac
+import time
+import zipfile
+import logging
+import argparse
+from urllib.parse import quote
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from flask import Response, request, jsonify
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markdown_render import render_report_sections
+
+try:
+    from weasyprint import HTML
+except ImportError:
+    HTML = None
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_NAME = 'report_export.html'
+FORMATS = ('html', 'pdf')
+
+
+def parse_formats(value):
+    """Parse 'html,pdf' into a tuple of formats, raising ValueError for ones that cannot be produced"""
+    formats = tuple(dict.fromkeys(part.strip().lower() for part in (value or 'html').split(',') if part.strip()))
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown or not formats:
+        raise ValueError(f"Unknown export format: {', '.join(unknown) or value}")
+    if 'pdf' in formats and HTML is None:
+        raise ValueError("PDF export requires WeasyPrint (pip install weasyprint)")
+    return formats
+
+
+class _ChunkWriter:
+    """Write-only file that collects what zipfile writes until it is drained
+
+    It has no tell() or seek(), so zipfile streams each entry followed by a
+    data descriptor instead of seeking back to patch its header.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def document_name(stored, extension):
+    grade = stored['responses'].get('p2') or '未知年级'
+    created = time.strftime('%Y%m%d', time.localtime(stored['created_at']))
+    return f"{grade}/{created}_{stored['id'][:12]}.{extension}"
+
+
+def render_documents(template, stored, formats):
+    """Render one stored report, returning [(archive name, bytes)] for each format"""
+    sections = stored['html'] or render_report_sections(stored['report'])
+    html = template.render(report=stored['report'], sections=sections, responses=stored['responses'],
+                           report_id=stored['id'],
+                           created_at=time.strftime('%Y-%m-%d %H:%M', time.localtime(stored['created_at'])))
+    documents = []
+    if 'html' in formats:
+        documents.append((document_name(stored, 'html'), html.encode('utf-8')))
+    if 'pdf' in formats:
+        documents.append((document_name(stored, 'pdf'), HTML(string=html).write_pdf()))
+    return documents
+
+
+def stream_zip(template, reports, formats=('html',), workers=None):
+    """Yield the bytes of a ZIP archive of the rendered reports, entry by entry
+
+    The pool renders at most two reports per worker ahead of the archive;
+    entries keep the order of reports.
+    """
+    workers = workers or int(os.getenv('EXPORT_WORKERS', '4'))
+    reports = iter(reports)
+    writer = _ChunkWriter()
+    count = 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export') as executor:
+        pending = deque()
+
+        def fill():
+            while len(pending) < workers * 2:
+                stored = next(reports, None)
+                if stored is None:
+                    return
+                pending.append(executor.submit(render_documents, template, stored, formats))
+
+        archive = zipfile.ZipFile(writer, 'w', compression=zipfile.ZIP_DEFLATED)
+        fill()
+        while pending:
+            for name, data in pending.popleft().result():
+                archive.writestr(name, data)
+            count += 1
+            fill()
+            chunk = writer.drain()
+            if chunk:
+                yield chunk
+        archive.close()
+        yield writer.drain()
+
+    logger.info("Exported %d reports as %s", count, ', '.join(formats))
+
+
+def authorized():
+    """Whether the request carries EXPORT_TOKEN, as 'Authorization: Bearer <token>' or ?token=
+
+    Always False while EXPORT_TOKEN is not set.
+    """
+    expected = os.getenv('EXPORT_TOKEN')
+    header = request.headers.get('Authorization', '')
+    token = header[len('Bearer '):] if header.startswith('Bearer ') else request.args.get('token', '')
+    return bool(expected) and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+
+def init_app(app, report_store):
+    """Register GET /export/reports.zip, authorized by EXPORT_TOKEN (see authorized())
+
+    Query parameters: grade (answer p2, e.g. 高二), school and format (html,pdf).
+    """
+
+    @app.route('/export/reports.zip')
+    def export_reports():
+        if not authorized():
+            return jsonify({"success": False, "error": "无权导出报告"}), 403
+
+        try:
+            formats = parse_formats(request.args.get('format'))
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
+        grade = request.args.get('grade')
+        reports = report_store.iter_reports(grade=grade, school_id=request.args.get('school'))
+        filename = f"reports-{grade}.zip" if grade else "reports.zip"
+        return Response(
+            stream_zip(app.jinja_env.get_template(TEMPLATE_NAME), reports, formats),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f"attachment; filename=reports.zip; filename*=UTF-8''{quote(filename)}",
+                     'Cache-Control': 'no-store'})
+
+
+def main():
+    from report_store import ReportStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.getenv('REPORT_DB_PATH', os.path.join('instance', 'reports.db')),
+                        help='report database (default: REPORT_DB_PATH or instance/reports.db)')
+    parser.add_argument('--grade', help='only reports of this grade, e.g. 高二')
+    parser.add_argument('--school', help='only reports of this school_id')
+    parser.add_argument('--format', default='html', help='comma-separated formats: html, pdf')
+    parser.add_argument('--workers', type=int, default=None, help='rendering threads (default: EXPORT_WORKERS or 4)')
+    parser.add_argument('-o', '--output', default='-', help='ZIP file to write, or - for stdout')
+    args = parser.parse_args()
+
+    try:
+        formats = parse_formats(args.format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')),
+                      autoescape=select_autoescape())
+    reports = ReportStore(args.db).iter_reports(grade=args.grade, school_id=args.school)
+    out = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in stream_zip(env.get_template(TEMPLATE_NAME), reports, formats, workers=args.workers):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
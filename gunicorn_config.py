@@ -3,22 +3,38 @@ Gunicorn configuration file for optimizing performance on Render
 """
 
 import os
+import importlib.util
 import multiprocessing
 
+# Worker class: 'sync' handles one request at a time; 'gevent' runs requests
+# as cooperative greenlets, so report generations waiting on the LLM API
+# do not block each other. gevent is the default wherever it is installed.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or \
+    ('gevent' if importlib.util.find_spec('gevent') is not None else 'sync')
+
+if worker_class == 'gevent':
+    # Patch before preload_app imports the application, so sockets opened
+    # by the HTTP clients are cooperative from the start
+    from gevent import monkey
+    monkey.patch_all()
+
 # Bind to the port provided by Render
 bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
 
 # Use minimal workers for Render free tier
-workers = 1
+workers = int(os.environ.get('GUNICORN_WORKERS', '1'))
 
 # Use a single thread per worker to reduce memory usage
-threads = 1
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
 
 # Timeout for worker processes (in seconds)
 timeout = 120
 
-# Maximum number of requests a worker will process before restarting
-max_requests = 1000
+# Maximum number of requests a worker will process before restarting. With
+# MEMORY_RSS_LIMIT_MB set, workers are recycled on memory instead (see
+# post_worker_init below) and the request count no longer applies by default.
+rss_limit_set = float(os.environ.get('MEMORY_RSS_LIMIT_MB', '0')) > 0
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0' if rss_limit_set else '1000'))
 max_requests_jitter = 50
 
 # Log level
@@ -27,11 +43,9 @@ loglevel = 'info'
 # Preload the application to save memory
 preload_app = True
 
-# Worker class
-worker_class = 'sync'
-
 # Limit the maximum number of simultaneous clients
-worker_connections = 100
+# (per worker; only applies to the gevent worker class)
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '500'))
 
 # Restart workers when code changes (development only)
 reload = os.environ.get('FLASK_ENV') == 'development'
@@ -41,3 +55,16 @@ graceful_timeout = 30
 
 # Keep-alive timeout
 keepalive = 5
+
+def when_ready(server):
+    # Admission control in /submit can only shed load it can see: a sync
+    # worker with one thread never has more than one request in the app,
+    # the rest wait in the socket backlog
+    if worker_class != 'gevent' and threads <= 1:
+        server.log.warning("Worker class %s with one thread: admission control never sees more than one "
+                           "request at a time; use GUNICORN_WORKER_CLASS=gevent", worker_class)
+
+def post_worker_init(worker):
+    # Sample the worker's RSS and recycle it gracefully past MEMORY_RSS_LIMIT_MB
+    import memory_watchdog
+    memory_watchdog.start_in_worker()
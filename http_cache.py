@@ -0,0 +1,134 @@
+"""
+HTTP response optimizations for the Student Assessment System
+Strong ETags with conditional GETs, and dynamic gzip/brotli compression
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent as-is; compression would not pay off
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+
+COMPRESSIBLE_TYPES = ('text/html', 'application/json', 'text/css', 'application/javascript', 'text/plain')
+
+
+def compute_etag(*parts):
+    """Return a strong ETag value for the given content
+
+    Parts may be bytes, str or JSON-serializable objects; dicts are hashed
+    with sorted keys so equal content always gives the same tag.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode('utf-8')
+        else:
+            data = json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode('utf-8')
+        digest.update(data)
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+def _strip_encoding_suffix(etag):
+    """Compressed representations carry '-gzip'/'-br' after the content tag"""
+    for suffix in ('-gzip', '-br'):
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+    return etag
+
+
+def is_not_modified(etag):
+    """Return True if the request's If-None-Match matches the content tag"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    if if_none_match.star_tag:
+        return True
+    return any(_strip_encoding_suffix(tag) == etag for tag in if_none_match)
+
+
+def not_modified_response(app, etag, cache_control=None):
+    """Build an empty 304 response carrying the validator"""
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def choose_encoding():
+    """Pick the best content encoding the client accepts, or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body with 'br' or 'gzip'"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _finalize_response(response):
+    """after_request hook: add a content ETag, answer conditional GETs, compress"""
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 \
+            or response.direct_passthrough or response.is_streamed:
+        return response
+
+    mimetype = response.mimetype or ''
+    if mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    body = response.get_data()
+
+    etag, _ = response.get_etag()
+    if etag is None:
+        etag = compute_etag(body)
+        response.set_etag(etag)
+    else:
+        etag = _strip_encoding_suffix(etag)
+
+    if is_not_modified(etag):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if len(body) < COMPRESS_MIN_SIZE or 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.set_etag(f"{etag}-{encoding}")
+    return response
+
+
+def init_app(app):
+    """Register ETag/compression handling on a Flask app"""
+    app.after_request(_finalize_response)
+    logger.info("Response compression enabled (brotli available: %s)", brotli is not None)
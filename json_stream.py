@@ -0,0 +1,100 @@
+"""
+Streaming detection of a complete JSON report in generated text
+The model is asked for one JSON object; anything it writes after closing
+that object is paid for and then thrown away. JSONCompletionDetector is fed
+the generated text as it arrives and tells the caller when to stop: when
+the first top-level object closes, or as soon as every required field's
+value has closed, whichever comes first.
+"""
+
+OPENERS = '{['
+CLOSERS = '}]'
+
+
+class JSONCompletionDetector:
+    """Incremental, string- and escape-aware scanner for the end of the first JSON object
+
+    Text before the first '{' (a preamble or code fence) is skipped.
+    feed() returns True once the object is complete; end is then the
+    offset just past it in the text fed so far, and closed_early tells
+    whether it stopped after the last required field instead of at the
+    closing brace (the document then still needs its '}').
+    """
+
+    def __init__(self, required_fields=None):
+        self.required = frozenset(required_fields or ())
+        self.closed_fields = set()
+        self.done = False
+        self.closed_early = False
+        self.start = None
+        self.end = None
+        self._offset = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect_key = False
+        self._key_chars = None
+        self._key = None
+
+    def feed(self, text):
+        """Scan the next piece of generated text; True once the object is complete"""
+        if self.done:
+            return True
+        for i, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._key = ''.join(self._key_chars)
+                        self._key_chars = None
+                        self._expect_key = False
+                    continue
+                if self._key_chars is not None:
+                    self._key_chars.append(char)
+            elif self.start is None:
+                if char == '{':
+                    self.start = self._offset + i
+                    self._depth = 1
+                    self._expect_key = True
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect_key:
+                    self._key_chars = []
+            elif char in OPENERS:
+                self._depth += 1
+            elif char in CLOSERS:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._close_field()
+                    return self._finish(self._offset + i + 1, False)
+            elif char == ',' and self._depth == 1:
+                self._close_field()
+                if self.required and self.required <= self.closed_fields:
+                    return self._finish(self._offset + i, True)
+                self._expect_key = True
+        self._offset += len(text)
+        return False
+
+    def _close_field(self):
+        if self._key is not None:
+            self.closed_fields.add(self._key)
+            self._key = None
+
+    def _finish(self, end, closed_early):
+        self.done = True
+        self.end = end
+        self.closed_early = closed_early
+        return True
+
+
+def extract_document(text, required_fields=None):
+    """The first complete JSON object in text, closed after its required fields if needed, or None"""
+    detector = JSONCompletionDetector(required_fields)
+    if not detector.feed(text):
+        return None
+    document = text[detector.start:detector.end]
+    return document + '}' if detector.closed_early else document
@@ -0,0 +1,285 @@
+"""
+LLM client for the Student Assessment System
+Calls an ordered chain of hosted models with hedged requests and failover
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from resilience import DeadlineExceeded
+from llm_scheduler import INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Model key -> (Hugging Face model ID, display name)
+MODEL_REGISTRY = {
+    'llama3': ("meta-llama/Meta-Llama-3-8B", "Llama 3 (8B)"),
+    'llama2': ("meta-llama/Llama-2-7b-chat-hf", "Llama 2"),
+    'mistral': ("mistralai/Mistral-7B-Instruct-v0.2", "Mistral"),
+    'falcon': ("tiiuae/falcon-7b-instruct", "Falcon"),
+}
+
+DEFAULT_MODEL = 'llama3'
+DEFAULT_MODEL_CHAIN = ['llama3', 'mistral', 'falcon']
+
+
+def get_model_chain():
+    """Return the ordered list of model keys to try for report generation
+
+    LLM_MODEL_CHAIN overrides the default chain; LLM_MODEL_PREFERENCE, when
+    set, is moved to the front so existing deployments keep their primary.
+    """
+    chain_env = os.getenv('LLM_MODEL_CHAIN')
+    if chain_env:
+        chain = [key.strip().lower() for key in chain_env.split(',') if key.strip()]
+    else:
+        chain = list(DEFAULT_MODEL_CHAIN)
+
+    preference = os.getenv('LLM_MODEL_PREFERENCE', '').strip().lower()
+    if preference:
+        chain = [preference] + [key for key in chain if key != preference]
+
+    known = [key for key in chain if key in MODEL_REGISTRY]
+    for key in chain:
+        if key not in MODEL_REGISTRY:
+            logger.warning("Unknown model '%s' in model chain, skipping", key)
+    return known or [DEFAULT_MODEL]
+
+
+def get_model_id(model_key):
+    """Return the Hugging Face model ID for a model key"""
+    return MODEL_REGISTRY.get(model_key, MODEL_REGISTRY[DEFAULT_MODEL])[0]
+
+
+def get_model_display_name(model_key):
+    """Return the human-readable name for a model key"""
+    return MODEL_REGISTRY.get(model_key, MODEL_REGISTRY[DEFAULT_MODEL])[1]
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model"""
+
+    def __init__(self, window=50, min_samples=5):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_key, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(model_key, deque(maxlen=self.window))
+            samples.append(seconds)
+
+    def percentile(self, model_key, q):
+        """Return the q-th quantile (0..1) of recent latencies, or None without enough samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(model_key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(q * len(samples)))
+        return samples[index]
+
+
+class AllModelsFailedError(RuntimeError):
+    """Raised when every model in the chain failed to produce a response"""
+
+
+class HedgedGenerator:
+    """Run text generation across a model chain with hedging
+
+    The primary model is called first. If it has not answered within its
+    observed p90 latency of starting (time spent waiting for a scheduler
+    slot does not count), the next model is fired as a hedge and whichever
+    finishes first wins; the loser is cancelled. A model that fails outright
+    is replaced by the next one in the chain immediately. Models whose
+    circuit breaker is open are skipped, and no call outlives the deadline.
+    With a scheduler, every call first waits for a slot in its priority class.
+    With a stop_detector, each call's stream is closed as soon as the
+    detector reports the output complete. With a limiter
+    (resilience.AdaptiveLimit), every call's outcome is reported to it.
+
+    client_factory is called with the timeout for one call.
+    """
+
+    def __init__(self, client_factory, latency_tracker=None, default_hedge_delay=None, max_workers=None,
+                 breaker=None, call_timeout=None, scheduler=None, limiter=None):
+        self.client_factory = client_factory
+        self.scheduler = scheduler
+        self.limiter = limiter
+        self.latency = latency_tracker or LatencyTracker()
+        self.breaker = breaker
+        self.call_timeout = call_timeout
+        self.default_hedge_delay = default_hedge_delay if default_hedge_delay is not None \
+            else float(os.getenv('LLM_HEDGE_DELAY', '30'))
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('LLM_MAX_PARALLEL_CALLS', '32')),
+            thread_name_prefix='llm')
+
+    def hedge_delay(self, model_key):
+        """Seconds to wait on a model before firing the next one"""
+        p90 = self.latency.percentile(model_key, 0.9)
+        return p90 if p90 is not None else self.default_hedge_delay
+
+    def _call_model(self, model_key, prompt, cancel_event, deadline, gen_kwargs, priority=INTERACTIVE, tenant=None,
+                    stop_detector=None, started=None):
+        """Call one model once the scheduler grants a slot
+
+        started, a Future, is resolved with the time the call actually began.
+        """
+        if self.scheduler is None:
+            if started is not None:
+                started.set_result(time.monotonic())
+            return self._stream_model(model_key, prompt, cancel_event, deadline, gen_kwargs, stop_detector)
+        with self.scheduler.slot(priority, tenant, deadline):
+            if cancel_event.is_set():
+                return None
+            if started is not None:
+                started.set_result(time.monotonic())
+            return self._stream_model(model_key, prompt, cancel_event, deadline, gen_kwargs, stop_detector)
+
+    def _stream_model(self, model_key, prompt, cancel_event, deadline, gen_kwargs, stop_detector=None):
+        """Call one model, streaming so the call can be abandoned when cancelled or complete"""
+        start = time.monotonic()
+        epoch = self.limiter.begin() if self.limiter else None
+        tokens = None
+        try:
+            timeout = deadline.cap(self.call_timeout) if deadline else self.call_timeout
+            client = self.client_factory(timeout)
+            response = client.text_generation(prompt, model=get_model_id(model_key), stream=True, **gen_kwargs)
+
+            if isinstance(response, str):
+                text = response
+            else:
+                chunks = []
+                detector = stop_detector() if stop_detector else None
+                try:
+                    for token in response:
+                        if cancel_event.is_set():
+                            logger.info("Cancelled hedged call to %s", model_key)
+                            if self.limiter:
+                                self.limiter.abandoned(epoch)
+                            return None
+                        if deadline:
+                            deadline.check(f"generation with {model_key}")
+                        chunk = token if isinstance(token, str) else token.token.text
+                        chunks.append(chunk)
+                        if detector is not None and detector.feed(chunk):
+                            logger.info("Output of %s complete after %d tokens, closing the stream",
+                                        model_key, len(chunks))
+                            break
+                finally:
+                    close = getattr(response, 'close', None)
+                    if close:
+                        close()
+                text = ''.join(chunks)
+                tokens = len(chunks)
+        except Exception as e:
+            # A call cut short by this request's own deadline (checked while
+            # streaming, or a client timeout capped to the time left) says
+            # nothing about the model, so it neither opens the shared
+            # breaker nor lowers the limit
+            judged = not cancel_event.is_set() and not isinstance(e, DeadlineExceeded) \
+                and not (deadline is not None and deadline.expired())
+            if self.limiter:
+                if judged:
+                    self.limiter.failed(epoch, e)
+                else:
+                    self.limiter.abandoned(epoch)
+            if self.breaker and judged:
+                self.breaker.record_failure(model_key, time.monotonic() - start)
+            raise
+
+        elapsed = time.monotonic() - start
+        if self.limiter:
+            self.limiter.succeeded(epoch, elapsed, tokens)
+        if not cancel_event.is_set():
+            self.latency.record(model_key, elapsed)
+            if self.breaker:
+                self.breaker.record_success(model_key, elapsed)
+        return text
+
+    def generate(self, prompt, model_chain, deadline=None, priority=INTERACTIVE, tenant=None, stop_detector=None,
+                 **gen_kwargs):
+        """Generate text from the first model in the chain to answer
+
+        priority and tenant are passed to the scheduler for every call made.
+        stop_detector, when given, is called for a fresh detector per call
+        (e.g. json_stream.JSONCompletionDetector) whose feed() returns True
+        once the output is complete.
+        Returns a (text, model_key) tuple. Raises AllModelsFailedError when
+        every model in the chain fails or is short-circuited, and
+        DeadlineExceeded when the deadline passes first.
+        """
+        pending_models = list(model_chain)
+        in_flight = {}
+        errors = {}
+
+        def launch_next():
+            while pending_models:
+                model_key = pending_models.pop(0)
+                if self.breaker is None or self.breaker.allow(model_key):
+                    break
+                logger.info("Circuit breaker open for %s, skipping", model_key)
+                errors[model_key] = RuntimeError("circuit open")
+            else:
+                return False
+            cancel_event = threading.Event()
+            started = Future()
+            future = self.executor.submit(self._call_model, model_key, prompt, cancel_event, deadline, gen_kwargs,
+                                          priority, tenant, stop_detector, started)
+            in_flight[future] = (model_key, cancel_event, started)
+            logger.info("Requesting report from %s", get_model_display_name(model_key))
+            return True
+
+        launch_next()
+        try:
+            while in_flight:
+                newest_model, _, started = list(in_flight.values())[-1]
+                waiting_on = list(in_flight)
+                hedge_wait = None
+                if pending_models:
+                    if started.done():
+                        # The hedge clock runs from when the call started streaming
+                        hedge_wait = max(0.0, started.result() + self.hedge_delay(newest_model) - time.monotonic())
+                    else:
+                        # Still queued for a slot: hedging now would only queue
+                        # another call behind it, so wait for it to start
+                        waiting_on.append(started)
+                timeout = deadline.cap(hedge_wait) if deadline else hedge_wait
+                done, _ = wait(waiting_on, timeout=timeout, return_when=FIRST_COMPLETED)
+                done = [future for future in done if future in in_flight]
+
+                if not done:
+                    if deadline and deadline.expired():
+                        raise DeadlineExceeded(f"Deadline of {deadline.budget:.1f}s exceeded waiting for the LLM")
+                    if hedge_wait is None:
+                        # The newest call just got its slot; start its hedge clock
+                        continue
+                    # Primary is slower than usual: hedge with the next model
+                    logger.info("%s exceeded hedge delay of %.1fs, hedging", newest_model,
+                                self.hedge_delay(newest_model))
+                    launch_next()
+                    continue
+
+                for future in done:
+                    model_key = in_flight.pop(future)[0]
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        logger.warning("Model %s failed: %s", model_key, e)
+                        errors[model_key] = e
+                    else:
+                        if text:
+                            return text, model_key
+                        errors[model_key] = ValueError("empty response")
+                    # Fail over: replace the failed attempt with the next model
+                    launch_next()
+        finally:
+            for _, cancel_event, _ in in_flight.values():
+                cancel_event.set()
+
+        raise AllModelsFailedError(
+            "All models failed: " + ", ".join(f"{key}: {err}" for key, err in errors.items()))
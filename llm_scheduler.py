@@ -0,0 +1,169 @@
+"""
+Priority scheduler for LLM calls
+Every text-generation call takes a slot from one shared scheduler, which
+enforces a global concurrency cap and per-tenant quotas, and decides who
+goes next when slots are scarce: interactive requests (a student waiting on
+the loading overlay) always first, then re-generation and batch work
+sharing the rest by weighted fair queuing.
+"""
+
+import os
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from resilience import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+REGENERATION = 'regeneration'
+BATCH = 'batch'
+
+PRIORITY_CLASSES = (INTERACTIVE, REGENERATION, BATCH)
+
+# Relative shares of the background classes when both are waiting
+DEFAULT_WEIGHTS = {REGENERATION: 3, BATCH: 1}
+
+
+def _parse_weights(value):
+    """Parse 'regeneration=3,batch=1' into a weights dict"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, weight = item.split('=', 1)
+            if name.strip() in weights:
+                weights[name.strip()] = max(0.001, float(weight))
+    return weights
+
+
+class _Waiter:
+    __slots__ = ('tenant', 'granted')
+
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.granted = threading.Event()
+
+
+class LLMScheduler:
+    """Admits LLM calls under a global cap, per-tenant quotas and priorities
+
+    Interactive calls are strictly preferred. Among the background classes
+    each grant advances the class's virtual time by 1/weight, and the class
+    with the lowest virtual time goes next, so over time they share slots
+    in proportion to their weights without either starving. A waiter whose
+    tenant is at its quota is passed over until one of its calls finishes.
+    """
+
+    def __init__(self, max_concurrency=None, tenant_quota=None, weights=None):
+        self.max_concurrency = max_concurrency if max_concurrency is not None \
+            else int(os.getenv('LLM_GLOBAL_CONCURRENCY', '16'))
+        # 0 means no per-tenant limit
+        self.tenant_quota = tenant_quota if tenant_quota is not None \
+            else int(os.getenv('LLM_TENANT_QUOTA', '0'))
+        self.weights = weights or _parse_weights(os.getenv('LLM_SCHEDULER_WEIGHTS'))
+
+        self.in_flight = 0
+        self._tenant_in_flight = {}
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._virtual_time = {priority: 0.0 for priority in self.weights}
+        self._granted = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._lock = threading.Lock()
+
+    def _tenant_has_room(self, tenant):
+        return not self.tenant_quota or tenant is None \
+            or self._tenant_in_flight.get(tenant, 0) < self.tenant_quota
+
+    def _next_eligible(self, priority):
+        """First waiter of a class whose tenant is under quota, or None"""
+        for waiter in self._queues[priority]:
+            if self._tenant_has_room(waiter.tenant):
+                return waiter
+        return None
+
+    def _grant(self, priority, waiter):
+        self._queues[priority].remove(waiter)
+        self.in_flight += 1
+        if waiter.tenant is not None:
+            self._tenant_in_flight[waiter.tenant] = self._tenant_in_flight.get(waiter.tenant, 0) + 1
+        self._granted[priority] += 1
+        if priority in self._virtual_time:
+            self._virtual_time[priority] += 1.0 / self.weights[priority]
+        waiter.granted.set()
+
+    def _dispatch(self):
+        """Hand free slots to waiters; called with the lock held"""
+        while self.in_flight < self.max_concurrency:
+            waiter = self._next_eligible(INTERACTIVE)
+            if waiter is not None:
+                self._grant(INTERACTIVE, waiter)
+                continue
+
+            candidates = []
+            for priority in self.weights:
+                waiter = self._next_eligible(priority)
+                if waiter is not None:
+                    candidates.append((self._virtual_time[priority], priority, waiter))
+            if not candidates:
+                return
+            _, priority, waiter = min(candidates, key=lambda c: c[0])
+            self._grant(priority, waiter)
+
+    def _release(self, tenant):
+        with self._lock:
+            self.in_flight -= 1
+            if tenant is not None:
+                remaining = self._tenant_in_flight.get(tenant, 1) - 1
+                if remaining > 0:
+                    self._tenant_in_flight[tenant] = remaining
+                else:
+                    self._tenant_in_flight.pop(tenant, None)
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority=INTERACTIVE, tenant=None, deadline=None):
+        """Hold one LLM call slot for the duration of the block
+
+        Raises DeadlineExceeded if the deadline passes while still queued.
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class '{priority}'")
+
+        waiter = _Waiter(tenant)
+        with self._lock:
+            if priority in self._virtual_time and not self._queues[priority]:
+                # A class that was idle does not get to spend credit it saved
+                # up: it rejoins at the virtual time of the busy classes
+                busy = [self._virtual_time[p] for p in self._virtual_time if self._queues[p]]
+                if busy:
+                    self._virtual_time[priority] = max(self._virtual_time[priority], min(busy))
+            self._queues[priority].append(waiter)
+            self._dispatch()
+
+        if not waiter.granted.wait(deadline.remaining() if deadline is not None else None):
+            with self._lock:
+                if not waiter.granted.is_set():
+                    self._queues[priority].remove(waiter)
+                    raise DeadlineExceeded(f"Deadline of {deadline.budget:.1f}s exceeded waiting for an LLM slot")
+
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def set_max_concurrency(self, max_concurrency):
+        """Change the global cap; a higher cap hands its new slots to waiters right away"""
+        with self._lock:
+            self.max_concurrency = max_concurrency
+            self._dispatch()
+
+    def snapshot(self):
+        """Return queue lengths, in-flight counts and grants per class"""
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'queued': {priority: len(queue) for priority, queue in self._queues.items()},
+                'granted': dict(self._granted),
+                'tenants_in_flight': dict(self._tenant_in_flight),
+            }
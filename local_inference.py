@@ -0,0 +1,233 @@
+"""
+Local model inference for the Student Assessment System
+Keeps fallback models resident and batches concurrent prompts: requests
+arriving within a short window are padded into one batch and served by a
+single generate() call, and each decoded output is routed back to its caller.
+Prompts that start with a shared fixed prefix (the report instructions) reuse
+that prefix's attention KV cache, so only the per-student part is prefilled.
+"""
+
+import os
+import copy
+import time
+import queue
+import logging
+import threading
+import torch
+from collections import OrderedDict
+from transformers import AutoModelForCausalLM, AutoTokenizer, StoppingCriteria, StoppingCriteriaList
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest:
+    __slots__ = ('prompt', 'prefix', 'max_new_tokens', 'timeout', 'detector', 'done', 'text', 'error')
+
+    def __init__(self, prompt, prefix, max_new_tokens, timeout, detector):
+        self.prompt = prompt
+        self.prefix = prefix
+        self.max_new_tokens = max_new_tokens
+        self.timeout = timeout
+        self.detector = detector
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+
+
+class _DetectorStoppingCriteria(StoppingCriteria):
+    """Stops each row of a batch once its request's detector reports the output complete
+
+    Only the newest token of each row is decoded and fed to the detector,
+    which looks at JSON structure alone; the full output is decoded once
+    generation ends.
+    """
+
+    def __init__(self, tokenizer, batch):
+        self.tokenizer = tokenizer
+        self.detectors = [p.detector for p in batch]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        stopped = []
+        for row, detector in enumerate(self.detectors):
+            if detector is not None and not detector.done:
+                detector.feed(self.tokenizer.decode(input_ids[row, -1:], skip_special_tokens=True))
+            stopped.append(detector is not None and detector.done)
+        return torch.tensor(stopped, dtype=torch.bool, device=input_ids.device)
+
+
+class BatchingGenerator:
+    """Dynamic batching front end for a causal LM
+
+    Callers block in generate(); a single scheduler thread takes the first
+    waiting prompt, keeps collecting for up to max_wait seconds or until
+    max_batch_size prompts are queued, then runs one batched generate().
+    Prompts are left-padded, the batch decodes up to the largest requested
+    max_new_tokens, and each output is trimmed to its own request's budget.
+
+    Prompts given with a prefix are batched with others sharing it. The
+    prefix is tokenized and run through the model once, and its KV cache is
+    kept (the prefix_cache_size most recently used prefixes) and copied into
+    each batch; the padding goes between the prefix and the prompts, so
+    every row sees the prefix at the positions it was cached at.
+
+    A request with a stop_detector stops decoding as soon as its detector
+    reports the output complete; the batch ends when every row has stopped.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=None, max_wait=None, prefix_cache_size=None, **gen_kwargs):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size if max_batch_size is not None \
+            else int(os.getenv('LOCAL_BATCH_MAX_SIZE', '8'))
+        self.max_wait = max_wait if max_wait is not None \
+            else float(os.getenv('LOCAL_BATCH_MAX_WAIT_MS', '20')) / 1000
+        self.prefix_cache_size = prefix_cache_size if prefix_cache_size is not None \
+            else int(os.getenv('LOCAL_PREFIX_CACHE_SIZE', '4'))
+        self.gen_kwargs = gen_kwargs
+
+        # Decoder-only models must be padded on the left so every prompt
+        # ends right where generation starts
+        self.tokenizer.padding_side = 'left'
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.prefix_hits = 0
+        self.prefix_tokens_reused = 0
+        self._prefix_caches = OrderedDict()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='local-batcher', daemon=True)
+        self._thread.start()
+
+    def generate(self, prompt, max_new_tokens=256, timeout=None, prefix=None, stop_detector=None):
+        """Generate a completion for prefix + prompt, waiting at most timeout seconds
+
+        prefix is fixed text shared by many prompts, whose KV cache is reused.
+        stop_detector is called for a detector whose feed() returns True
+        once the output is complete (see json_stream).
+        """
+        pending = _PendingRequest(prompt, prefix, max_new_tokens, timeout, stop_detector() if stop_detector else None)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Local generation did not finish within {timeout:.1f}s")
+        if pending.error is not None:
+            raise pending.error
+        return pending.text
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the window closes"""
+        batch = [self._queue.get()]
+        window_ends = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = window_ends - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups = OrderedDict()
+            for pending in self._collect():
+                groups.setdefault(pending.prefix, []).append(pending)
+            for prefix, batch in groups.items():
+                try:
+                    self._generate_batch(batch, prefix)
+                except Exception as e:
+                    logger.error("Batched local generation failed for %d prompts: %s", len(batch), e)
+                    for pending in batch:
+                        pending.error = e
+                for pending in batch:
+                    pending.done.set()
+
+    def _prefix_cache(self, prefix):
+        """(input_ids, KV cache) of a prefix, computed on first use and kept LRU"""
+        cached = self._prefix_caches.get(prefix)
+        if cached is not None:
+            self._prefix_caches.move_to_end(prefix)
+            self.prefix_hits += 1
+            return cached
+        input_ids = self.tokenizer([prefix], return_tensors='pt')['input_ids'].to(self.model.device)
+        with torch.no_grad():
+            past_key_values = self.model(input_ids=input_ids, use_cache=True).past_key_values
+        cached = (input_ids, past_key_values)
+        self._prefix_caches[prefix] = cached
+        while len(self._prefix_caches) > self.prefix_cache_size:
+            self._prefix_caches.popitem(last=False)
+        return cached
+
+    def _generate_batch(self, batch, prefix=None):
+        if prefix is None:
+            inputs = self.tokenizer([p.prompt for p in batch], return_tensors='pt', padding=True)
+            inputs = {name: tensor.to(self.model.device) for name, tensor in inputs.items()}
+        else:
+            prefix_ids, prefix_cache = self._prefix_cache(prefix)
+            inputs = self.tokenizer([p.prompt for p in batch], return_tensors='pt', padding=True,
+                                    add_special_tokens=False)
+            # [prefix][padding][prompt]: position ids follow the attention
+            # mask, so the prompts continue right after the cached prefix
+            rows = len(batch)
+            inputs = {
+                'input_ids': torch.cat([prefix_ids.expand(rows, -1),
+                                        inputs['input_ids'].to(self.model.device)], dim=1),
+                'attention_mask': torch.cat([torch.ones(rows, prefix_ids.shape[1], dtype=torch.long,
+                                                        device=self.model.device),
+                                             inputs['attention_mask'].to(self.model.device)], dim=1),
+                # generate() extends the cache in place, so each batch gets a copy
+                'past_key_values': copy.deepcopy(prefix_cache),
+            }
+            if rows > 1:
+                inputs['past_key_values'].batch_repeat_interleave(rows)
+            self.prefix_tokens_reused += rows * prefix_ids.shape[1]
+        max_new_tokens = max(p.max_new_tokens for p in batch)
+
+        # The batch may run as long as its most patient member allows
+        timeouts = [p.timeout for p in batch]
+        max_time = None if None in timeouts else max(timeouts)
+        if any(p.detector is not None for p in batch):
+            inputs['stopping_criteria'] = StoppingCriteriaList([_DetectorStoppingCriteria(self.tokenizer, batch)])
+
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                max_time=max_time,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **self.gen_kwargs)
+
+        prompt_length = inputs['input_ids'].shape[1]
+        for pending, output in zip(batch, outputs):
+            new_tokens = output[prompt_length:prompt_length + pending.max_new_tokens]
+            pending.text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+
+        self.batches += 1
+        self.batched_requests += len(batch)
+        logger.debug("Local batch of %d prompts, %d new tokens", len(batch), max_new_tokens)
+
+
+# Resident generators, one per model, loaded on first use
+_generators = {}
+_generators_lock = threading.Lock()
+
+
+def get_local_generator(model_path, **gen_kwargs):
+    """Return the shared BatchingGenerator for a model, loading it on first use"""
+    with _generators_lock:
+        generator = _generators.get(model_path)
+        if generator is None:
+            logger.info("Loading local model %s", model_path)
+            tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
+            model = AutoModelForCausalLM.from_pretrained(
+                model_path,
+                trust_remote_code=True,
+                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+                device_map="auto"
+            )
+            model.eval()
+            generator = BatchingGenerator(model, tokenizer, **gen_kwargs)
+            _generators[model_path] = generator
+        return generator
@@ -0,0 +1,105 @@
+"""
+Server-side Markdown rendering for report sections
+Handles the subset the AI engine produces (headings, bold/italic, nested
+bullet and numbered lists, paragraphs). All text is HTML-escaped before any
+markup is added, so the output is safe to embed without further sanitizing.
+"""
+
+import re
+import html
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_LIST_ITEM = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+_BOLD = re.compile(r'\*\*(.+?)\*\*')
+_ITALIC = re.compile(r'(?<![*A-Za-z0-9])\*(?!\s)(.+?)(?<!\s)\*(?![*A-Za-z0-9])')
+_CODE = re.compile(r'`([^`]+)`')
+
+
+def render_inline(text):
+    """Escape text and apply inline bold, italic and code markup"""
+    text = html.escape(text, quote=False)
+    text = _CODE.sub(r'<code>\1</code>', text)
+    text = _BOLD.sub(r'<strong>\1</strong>', text)
+    text = _ITALIC.sub(r'<em>\1</em>', text)
+    return text
+
+
+def render_markdown(text):
+    """Render a Markdown string to HTML"""
+    if not text:
+        return ''
+    if not isinstance(text, str):
+        text = str(text)
+
+    out = []
+    paragraph = []
+    # Open lists as (indent, tag), innermost last
+    lists = []
+    after_blank = False
+
+    def flush_paragraph():
+        if paragraph:
+            out.append('<p>' + '<br>\n'.join(render_inline(line) for line in paragraph) + '</p>')
+            paragraph.clear()
+
+    def close_list():
+        _, tag = lists.pop()
+        out.append(f'</li></{tag}>')
+
+    def close_lists_deeper_than(indent):
+        while lists and lists[-1][0] > indent:
+            close_list()
+
+    for raw_line in text.splitlines():
+        line = raw_line.expandtabs(4)
+        if not line.strip():
+            flush_paragraph()
+            after_blank = True
+            continue
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            flush_paragraph()
+            indent = len(item.group(1))
+            marker = item.group(2)
+            tag = 'ol' if marker[0].isdigit() else 'ul'
+
+            close_lists_deeper_than(indent)
+            if lists and lists[-1][0] == indent and lists[-1][1] != tag:
+                close_list()
+
+            if lists and lists[-1][0] == indent:
+                out.append('</li>')
+            else:
+                start = int(marker[:-1]) if tag == 'ol' else 1
+                out.append(f'<ol start="{start}">' if tag == 'ol' and start != 1 else f'<{tag}>')
+                lists.append((indent, tag))
+            out.append('<li>' + render_inline(item.group(3)))
+            after_blank = False
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            flush_paragraph()
+            close_lists_deeper_than(-1)
+            level = len(heading.group(1))
+            out.append(f'<h{level}>{render_inline(heading.group(2))}</h{level}>')
+            after_blank = False
+            continue
+
+        if lists and (line[0] == ' ' or not after_blank):
+            # Continuation of the current list item
+            out.append('<br>\n' + render_inline(line.strip()))
+        else:
+            close_lists_deeper_than(-1)
+            paragraph.append(line.strip())
+        after_blank = False
+
+    flush_paragraph()
+    close_lists_deeper_than(-1)
+    return '\n'.join(out)
+
+
+def render_report_sections(report):
+    """Render every text section of a report, returning {field: html}"""
+    return {field: render_markdown(value) for field, value in report.items() if isinstance(value, str)}
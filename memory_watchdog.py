@@ -0,0 +1,198 @@
+"""
+Memory accounting and RSS-based worker recycling for the Student Assessment System
+Each gunicorn worker samples its resident set size every few seconds. Once
+it crosses MEMORY_RSS_LIMIT_MB the worker stops admitting report
+generations, waits for the ones in flight to finish, and then asks gunicorn
+to replace it (SIGTERM is a graceful stop for a worker), instead of growing
+until the host's OOM killer takes it down mid-request. With tracemalloc
+enabled, /admin/memory also lists the top allocation sites.
+"""
+
+import os
+import time
+import signal
+import logging
+import threading
+import tracemalloc
+from collections import deque
+from flask import request, jsonify
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where it cannot be read"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def terminate_gracefully():
+    """Ask gunicorn to replace this worker once its current requests are done"""
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+class MemoryWatchdog:
+    """Periodic RSS samples of this process and recycling past a ceiling
+
+    limit_bytes of 0 only samples. When the limit is crossed, drain() is
+    called to stop new work, then the watchdog waits up to drain_timeout
+    seconds for in_flight() to reach zero before calling recycle(). A
+    worker that starts out over the limit is not recycled, since its
+    replacement would be too.
+    tracemalloc_frames > 0 starts tracemalloc in the worker with that many
+    frames per allocation (it slows allocation-heavy code noticeably).
+    """
+
+    def __init__(self, limit_bytes=None, interval=None, drain_timeout=None, drain=None, in_flight=None,
+                 tracemalloc_frames=None, history=60):
+        self.limit_bytes = limit_bytes if limit_bytes is not None \
+            else int(float(os.getenv('MEMORY_RSS_LIMIT_MB', '0')) * MB)
+        self.interval = interval if interval is not None else float(os.getenv('MEMORY_SAMPLE_INTERVAL', '10'))
+        self.drain_timeout = drain_timeout if drain_timeout is not None \
+            else float(os.getenv('MEMORY_DRAIN_SECONDS', '90'))
+        self.tracemalloc_frames = tracemalloc_frames if tracemalloc_frames is not None \
+            else int(os.getenv('MEMORY_TRACEMALLOC_FRAMES', '0'))
+        self.drain = drain
+        self.in_flight = in_flight
+        self.rss = None
+        self.peak = 0
+        self.baseline = None
+        self.recycling = False
+        self.samples = deque(maxlen=history)
+        self._previous_snapshot = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, recycle=terminate_gracefully):
+        """Sample in a background thread for the life of this (worker) process"""
+        if self.tracemalloc_frames > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+        self.baseline = self.sample()
+        if self.limit_bytes and self.baseline is not None and self.baseline > self.limit_bytes:
+            logger.error("A fresh worker already uses %d MB, over MEMORY_RSS_LIMIT_MB (%d MB); not recycling",
+                         self.baseline // MB, self.limit_bytes // MB)
+            self.limit_bytes = 0
+        self._thread = threading.Thread(target=self._run, args=(recycle,), name='memory-watchdog', daemon=True)
+        self._thread.start()
+        logger.info("Memory watchdog started: limit %d MB, sampling every %.0fs",
+                    self.limit_bytes // MB, self.interval)
+        return self._thread
+
+    def _run(self, recycle):
+        while True:
+            if self.sample() is not None and self.limit_bytes and self.rss > self.limit_bytes:
+                self._recycle(recycle)
+                return
+            time.sleep(self.interval)
+
+    def sample(self):
+        """Read and record the current RSS"""
+        rss = rss_bytes()
+        if rss is not None:
+            with self._lock:
+                self.rss = rss
+                self.peak = max(self.peak, rss)
+                self.samples.append((time.time(), rss))
+        return rss
+
+    def _recycle(self, recycle):
+        self.recycling = True
+        logger.warning("RSS %d MB is over the %d MB limit; draining before recycling the worker",
+                       self.rss // MB, self.limit_bytes // MB)
+        if self.drain is not None:
+            self.drain()
+        waited_until = time.monotonic() + self.drain_timeout
+        while self.in_flight is not None and self.in_flight() > 0 and time.monotonic() < waited_until:
+            time.sleep(0.5)
+        remaining = self.in_flight() if self.in_flight is not None else 0
+        logger.warning("Recycling worker %d at %d MB RSS (%d requests still in flight)",
+                       os.getpid(), self.rss // MB, remaining)
+        recycle()
+
+    def top_allocations(self, limit=20, compare=False, group_by='lineno'):
+        """The allocation sites holding the most memory, or their growth since the previous call with compare
+
+        None while tracemalloc is not tracing.
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        with self._lock:
+            previous, self._previous_snapshot = self._previous_snapshot, snapshot
+        if compare and previous is not None:
+            stats = snapshot.compare_to(previous, group_by)
+            return [{'site': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1),
+                     'size_diff_kb': round(stat.size_diff / 1024, 1), 'count': stat.count,
+                     'count_diff': stat.count_diff} for stat in stats[:limit]]
+        return [{'site': str(stat.traceback), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                for stat in snapshot.statistics(group_by)[:limit]]
+
+    def snapshot(self):
+        """Current and peak RSS, the limit, recent samples and whether the worker is being recycled"""
+        with self._lock:
+            samples = list(self.samples)
+        return {
+            'pid': os.getpid(),
+            'rss_mb': round(self.rss / MB, 1) if self.rss is not None else None,
+            'peak_mb': round(self.peak / MB, 1),
+            'baseline_mb': round(self.baseline / MB, 1) if self.baseline is not None else None,
+            'limit_mb': round(self.limit_bytes / MB, 1),
+            'recycling': self.recycling,
+            'watching': self._thread is not None and self._thread.is_alive(),
+            'tracing': tracemalloc.is_tracing(),
+            'samples': [(round(at, 1), round(rss / MB, 1)) for at, rss in samples],
+        }
+
+
+_state = {}
+
+
+def start_in_worker():
+    """Start the watchdog registered by init_app(); called from gunicorn's post_worker_init hook"""
+    watchdog = _state.get('watchdog')
+    if watchdog is not None:
+        watchdog.start()
+
+
+def init_app(app, watchdog, authorized):
+    """Register GET /admin/memory, guarded by the authorized() check
+
+    ?top=N adds the N largest allocation sites when tracemalloc is
+    tracing; with compare=1 they are ranked by growth since the previous
+    request instead.
+    """
+    _state['watchdog'] = watchdog
+
+    @app.route('/admin/memory')
+    def admin_memory():
+        if not authorized():
+            return jsonify({"success": False, "error": "无权查看内存状态"}), 403
+        watchdog.sample()
+        result = {"success": True, "memory": watchdog.snapshot()}
+        top = request.args.get('top', type=int)
+        if top:
+            result['top_allocations'] = watchdog.top_allocations(
+                min(top, 200), compare=request.args.get('compare') == '1',
+                group_by='traceback' if request.args.get('traceback') == '1' else 'lineno')
+        return jsonify(result)
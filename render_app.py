@@ -7,28 +7,65 @@ import os
 import sys
 import json
 import logging
-import traceback
 from dotenv import load_dotenv
+from report_store import ReportStore
+from markdown_render import render_report_sections
+from student_profile import ProfileSchema, InvalidSubmission
+from admission import AdmissionController, Overloaded
+from memory_watchdog import MemoryWatchdog
+import http_cache
+import assets
+import warmup
+import export
+import memory_watchdog
+import structured_logging
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+structured_logging.configure(logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Log deployment environment information
-logger.info(f"Starting application in {os.getenv('FLASK_ENV', 'development')} mode")
-logger.info(f"Python version: {sys.version}")
-logger.info(f"Running on Render: {os.getenv('RENDER', 'false')}")
+logger.info("Starting application in %s mode", os.getenv('FLASK_ENV', 'development'))
+logger.info("Python version: %s", sys.version)
+logger.info("Running on Render: %s", os.getenv('RENDER', 'false'))
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-secret-key')
 
+# ETags, conditional GETs and gzip/brotli compression for HTML and JSON
+http_cache.init_app(app)
+
+# Fingerprinted static files (built by build_assets.py), served as immutable
+assets.init_app(app)
+
+# /ready turns healthy once the warmup at the end of this module has run
+warmup.init_app(app)
+
+# Reports are kept server-side; the session only holds the report ID
+report_store = ReportStore.from_env(app.instance_path)
+
+# Counselors download a grade's reports as one streamed ZIP (needs EXPORT_TOKEN)
+export.init_app(app, report_store)
+
+# Bounds concurrent report generations; past capacity /submit_assessment
+# answers with 429 and Retry-After
+admission = AdmissionController()
+
+# Each gunicorn worker samples its RSS; past MEMORY_RSS_LIMIT_MB it stops
+# admitting generations, lets the ones in flight finish and is replaced
+memory = MemoryWatchdog(drain=admission.drain, in_flight=lambda: admission.in_flight)
+memory_watchdog.init_app(app, memory, export.authorized)
+
+# Submitted answers are checked against the question bank
+profile_schema = ProfileSchema.load()
+
 # Configure error handling
 @app.errorhandler(500)
 def server_error(e):
-    logger.error(f"Server error: {str(e)}\n{traceback.format_exc()}")
+    logger.error("Server error: %s", e, exc_info=True)
     return render_template('error.html', error="Internal server error. Please try again later."), 500
 
 @app.route('/')
@@ -42,36 +79,43 @@ def assessment():
 @app.route('/submit_assessment', methods=['POST'])
 def submit_assessment():
     try:
-        # Get form data
-        responses = {}
-        for key, value in request.form.items():
-            if key.startswith('p') or key.startswith('a') or key.startswith('c') or key.startswith('ps') or key.startswith('e') or key.startswith('d') or key.startswith('i'):
-                responses[key] = value
-        
-        # Generate a simple report (no AI for now)
-        report = generate_simple_report(responses)
+        # Get form data, validated against the question bank
+        try:
+            responses = profile_schema.validate_form(request.form).answers()
+        except InvalidSubmission as e:
+            logger.warning("Rejected submission: %s", e)
+            return jsonify({"success": False, "error": str(e)}), 400
         
-        # Store in session
-        session['responses'] = responses
-        session['report'] = report
+        # Generate a simple report (no AI for now) and store it, with its
+        # sections rendered once, while holding an admission slot
+        try:
+            with admission.admit():
+                report = generate_simple_report(responses)
+                report_id = report_store.create(responses, report)
+                report_store.set_html(report_id, render_report_sections(report))
+        except Overloaded as e:
+            response = jsonify({"success": False, "error": "服务器繁忙，请稍后重试", "retry_after": e.retry_after})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        session['report_id'] = report_id
         
         return jsonify({"success": True, "redirect": url_for('report')})
     except Exception as e:
-        logger.error(f"Error processing assessment: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Error processing assessment: %s", e, exc_info=True)
         return jsonify({"success": False, "error": str(e)}), 500
 
 @app.route('/report')
 def report():
-    if 'report' not in session:
+    stored = report_store.get(session['report_id']) if 'report_id' in session else None
+    if stored is None:
         return redirect(url_for('assessment'))
     
-    report = session['report']
-    responses = session['responses']
-    
     # Get model name for the template
     model_name = "Llama 3 (8B)"
     
-    return render_template("report.html", report=report, responses=responses, model_name=model_name)
+    return render_template("report.html", report=stored['report'], sections=stored['html'],
+                           responses=stored['responses'], model_name=model_name)
 
 def generate_simple_report(responses):
     """Generate a simple report without AI for testing on Render"""
@@ -90,13 +134,16 @@ def generate_simple_report(responses):
         
         return report
     except Exception as e:
-        logger.error(f"Error generating simple report: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Error generating simple report: %s", e, exc_info=True)
         # Fallback report in case of errors
         return {
             "summary": "无法生成完整的个性化报告。请检查您的回答是否完整，或稍后再试。",
             "error": str(e)
         }
 
+# Compile templates and freeze the heap before gunicorn forks the workers (preload_app)
+warmup.run(app)
+
 if __name__ == '__main__':
     # Get port from environment variable (Render sets this)
     port = int(os.environ.get('PORT', 5000))
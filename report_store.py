@@ -0,0 +1,145 @@
+"""
+Server-side report storage for the Student Assessment System
+Keeps each submission's responses and report in SQLite, keyed by a report ID
+held in the session, together with the rendered HTML of its sections
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    responses TEXT NOT NULL,
+    report TEXT NOT NULL,
+    report_html TEXT
+)
+"""
+
+# Columns added after the table was first created, applied to older databases
+_MIGRATIONS = {
+    'degraded': 'ALTER TABLE reports ADD COLUMN degraded INTEGER NOT NULL DEFAULT 0',
+    'tier': 'ALTER TABLE reports ADD COLUMN tier TEXT',
+    'superseded_by': 'ALTER TABLE reports ADD COLUMN superseded_by TEXT',
+}
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+_COLUMNS = 'id, created_at, responses, report, report_html, degraded, tier'
+
+
+def _row_to_report(row):
+    return {
+        'id': row[0],
+        'created_at': row[1],
+        'responses': json.loads(row[2]),
+        'report': json.loads(row[3]),
+        'html': json.loads(row[4]) if row[4] is not None else None,
+        'degraded': bool(row[5]),
+        'tier': row[6],
+    }
+
+
+class ReportStore:
+    """SQLite-backed store of generated reports
+
+    Each operation opens its own short-lived connection, so the store is
+    safe to share between threads, greenlets and gunicorn workers.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(reports)')}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.commit()
+        logger.info("Report store at %s", path)
+
+    @classmethod
+    def from_env(cls, instance_path):
+        """Store at REPORT_DB_PATH, or reports.db in the app's instance folder"""
+        return cls(os.getenv('REPORT_DB_PATH', os.path.join(instance_path, 'reports.db')))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create(self, responses, report, degraded=False, tier=None, replaces=None):
+        """Save a new report and return its ID
+
+        degraded marks a report generated without the LLM because the
+        server was over capacity; the student may upgrade it later.
+        tier records which generator served it (llm, enhanced or basic).
+        replaces is the ID of the report this one supersedes (an edited or
+        upgraded report); that one stays readable by ID but is no longer
+        listed by iter_reports().
+        """
+        report_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO reports (id, created_at, responses, report, degraded, tier) VALUES (?, ?, ?, ?, ?, ?)',
+                (report_id, time.time(), _dumps(responses), _dumps(report), int(degraded), tier))
+            if replaces is not None:
+                conn.execute('UPDATE reports SET superseded_by = ? WHERE id = ?', (report_id, replaces))
+            conn.commit()
+        return report_id
+
+    def get(self, report_id):
+        """Return {id, created_at, responses, report, html, degraded, tier} or None
+
+        html is None until the sections have been rendered and saved with set_html().
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(f'SELECT {_COLUMNS} FROM reports WHERE id = ?', (report_id,)).fetchone()
+        return _row_to_report(row) if row is not None else None
+
+    def iter_reports(self, grade=None, school_id=None, page_size=50):
+        """Yield current reports oldest first, optionally only one grade (answer p2) or school
+
+        Reports superseded by an edit or upgrade are left out.
+
+        Rows are read a page at a time, each page on its own connection, so
+        a slow consumer holds neither a connection nor more than one page.
+        """
+        conditions, params = ['superseded_by IS NULL'], []
+        if grade:
+            conditions.append("json_extract(responses, '$.p2') = ?")
+            params.append(grade)
+        if school_id:
+            conditions.append("json_extract(responses, '$.school_id') = ?")
+            params.append(school_id)
+        after = (-1.0, '')
+        while True:
+            where = ' AND '.join(conditions + ['(created_at > ? OR (created_at = ? AND id > ?))'])
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    f'SELECT {_COLUMNS} FROM reports WHERE {where} ORDER BY created_at, id LIMIT ?',
+                    params + [after[0], after[0], after[1], page_size]).fetchall()
+            for row in rows:
+                yield _row_to_report(row)
+            if len(rows) < page_size:
+                return
+            after = (rows[-1][1], rows[-1][0])
+
+    def set_html(self, report_id, html):
+        """Save the rendered HTML of a report's sections"""
+        with closing(self._connect()) as conn:
+            conn.execute('UPDATE reports SET report_html = ? WHERE id = ?', (_dumps(html), report_id))
+            conn.commit()
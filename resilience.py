@@ -0,0 +1,278 @@
+"""
+Resilience helpers for the LLM call path
+Per-model circuit breaker, end-to-end request deadlines and an adaptive
+limit on concurrent calls
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its time budget"""
+
+
+class Deadline:
+    """Absolute point in time by which a request must be answered
+
+    Created once when a request arrives and passed to every downstream call,
+    which caps its own timeout with remaining().
+    """
+
+    def __init__(self, seconds):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_env(cls, budget=None):
+        """Deadline for a report request, from REPORT_DEADLINE_SECONDS
+
+        A budget the request asked for (in seconds) applies when it is shorter.
+        """
+        seconds = float(os.getenv('REPORT_DEADLINE_SECONDS', '60'))
+        if budget is not None:
+            seconds = min(seconds, max(0.0, float(budget)))
+        return cls(seconds)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def cap(self, timeout):
+        """Return timeout limited to the time left, or the time left if timeout is None"""
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self, what="request"):
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline of {self.budget:.1f}s exceeded during {what}")
+
+
+class CircuitBreaker:
+    """Per-model circuit breaker over a rolling window of call outcomes
+
+    A model's breaker opens when the failure rate over its recent calls
+    reaches the threshold; calls slower than slow_call_seconds count as
+    failures. While open, the model is skipped. After the cooldown one
+    probe call is let through (half-open); its outcome closes or re-opens
+    the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate=None, min_calls=None, window=None, cooldown=None, slow_call_seconds=None):
+        self.failure_rate = failure_rate if failure_rate is not None \
+            else float(os.getenv('LLM_BREAKER_FAILURE_RATE', '0.5'))
+        self.min_calls = min_calls if min_calls is not None else int(os.getenv('LLM_BREAKER_MIN_CALLS', '5'))
+        self.window = window if window is not None else int(os.getenv('LLM_BREAKER_WINDOW', '20'))
+        self.cooldown = cooldown if cooldown is not None else float(os.getenv('LLM_BREAKER_COOLDOWN', '30'))
+        self.slow_call_seconds = slow_call_seconds if slow_call_seconds is not None \
+            else float(os.getenv('LLM_BREAKER_SLOW_CALL', '60'))
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _state(self, model_key):
+        state = self._models.get(model_key)
+        if state is None:
+            state = {'state': self.CLOSED, 'opened_at': 0.0, 'probing': False,
+                     'outcomes': deque(maxlen=self.window), 'latencies': deque(maxlen=self.window)}
+            self._models[model_key] = state
+        return state
+
+    def allow(self, model_key):
+        """Return True if a call to the model may go ahead"""
+        with self._lock:
+            state = self._state(model_key)
+            if state['state'] == self.CLOSED:
+                return True
+            if state['state'] == self.OPEN and time.monotonic() - state['opened_at'] >= self.cooldown:
+                state['state'] = self.HALF_OPEN
+                state['probing'] = False
+            if state['state'] == self.HALF_OPEN and not state['probing']:
+                state['probing'] = True
+                return True
+            return False
+
+    def is_open(self, model_key):
+        """Return True if calls to the model are currently being short-circuited"""
+        with self._lock:
+            state = self._state(model_key)
+            if state['state'] == self.OPEN:
+                return time.monotonic() - state['opened_at'] < self.cooldown
+            return state['state'] == self.HALF_OPEN and state['probing']
+
+    def all_open(self, model_keys):
+        return all(self.is_open(model_key) for model_key in model_keys)
+
+    def record_success(self, model_key, seconds):
+        self._record(model_key, seconds < self.slow_call_seconds, seconds)
+
+    def record_failure(self, model_key, seconds=None):
+        self._record(model_key, False, seconds)
+
+    def _record(self, model_key, ok, seconds):
+        with self._lock:
+            state = self._state(model_key)
+            state['outcomes'].append(ok)
+            if seconds is not None:
+                state['latencies'].append(seconds)
+
+            if state['state'] == self.HALF_OPEN:
+                if ok:
+                    logger.info("Circuit breaker for %s closed after successful probe", model_key)
+                    state['state'] = self.CLOSED
+                    state['outcomes'].clear()
+                else:
+                    self._open(model_key, state)
+                state['probing'] = False
+                return
+
+            outcomes = state['outcomes']
+            if state['state'] == self.CLOSED and len(outcomes) >= self.min_calls:
+                failures = outcomes.count(False)
+                if failures / len(outcomes) >= self.failure_rate:
+                    self._open(model_key, state)
+
+    def _open(self, model_key, state):
+        logger.warning("Circuit breaker for %s opened; skipping it for %.0fs", model_key, self.cooldown)
+        state['state'] = self.OPEN
+        state['opened_at'] = time.monotonic()
+
+    def snapshot(self):
+        """Return per-model state, failure rate and mean latency"""
+        with self._lock:
+            result = {}
+            for model_key, state in self._models.items():
+                outcomes = state['outcomes']
+                latencies = state['latencies']
+                result[model_key] = {
+                    'state': state['state'],
+                    'calls': len(outcomes),
+                    'failure_rate': outcomes.count(False) / len(outcomes) if outcomes else 0.0,
+                    'mean_latency': sum(latencies) / len(latencies) if latencies else None,
+                }
+            return result
+
+
+# Upstream answers that mean "too much load": rate limited or overloaded
+OVERLOAD_STATUS_CODES = (429, 503)
+
+
+def is_overload_error(error):
+    """Whether a failed call was rejected or timed out because the upstream is overloaded"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in OVERLOAD_STATUS_CODES:
+        return True
+    # Call timeouts: TimeoutError (socket timeouts, huggingface_hub's
+    # InferenceTimeoutError) and the HTTP clients' own timeout classes. An
+    # expired request deadline is not one.
+    return isinstance(error, TimeoutError) \
+        or any(cls.__name__ in ('Timeout', 'TimeoutException') for cls in type(error).__mro__)
+
+
+class AdaptiveLimit:
+    """AIMD limit on concurrent upstream calls
+
+    The limit grows additively, by about one per limit's worth of
+    successful calls, while the calls in flight use at least half of it;
+    it is cut multiplicatively (by backoff) on an overload error (429/503
+    or a timeout) and when the latency per token rises: a short-term
+    average more than tolerance times the long-term one. Outcomes of calls
+    that started before the last cut do not cut again, so one burst of
+    429s costs one cut rather than one per call in it.
+
+    on_change is called with the new whole-number limit whenever it changes.
+    """
+
+    def __init__(self, initial=None, min_limit=None, max_limit=None, backoff=None, tolerance=None, on_change=None):
+        self.min_limit = min_limit if min_limit is not None else int(os.getenv('LLM_LIMIT_MIN', '1'))
+        self.max_limit = max_limit if max_limit is not None else int(os.getenv('LLM_LIMIT_MAX', '32'))
+        initial = initial if initial is not None else int(os.getenv('LLM_GLOBAL_CONCURRENCY', '16'))
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.backoff = backoff if backoff is not None else float(os.getenv('LLM_LIMIT_BACKOFF', '0.7'))
+        self.tolerance = tolerance if tolerance is not None else float(os.getenv('LLM_LIMIT_LATENCY_TOLERANCE', '2'))
+        self.on_change = on_change
+        self.in_flight = 0
+        self.epoch = 0
+        self.decreases = {'overload': 0, 'latency': 0}
+        self.short_latency = None
+        self.long_latency = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The whole-number limit in force"""
+        return int(self.limit)
+
+    def begin(self):
+        """Count a call as started; returns the token to pass to the outcome method"""
+        with self._lock:
+            self.in_flight += 1
+            return self.epoch
+
+    def succeeded(self, epoch, seconds, tokens=None):
+        """Record a completed call and how many tokens it streamed"""
+        with self._lock:
+            utilized = self.in_flight * 2 >= self.limit
+            self.in_flight -= 1
+            if tokens:
+                per_token = seconds / tokens
+                if self.long_latency is None:
+                    self.short_latency = self.long_latency = per_token
+                else:
+                    self.short_latency += 0.3 * (per_token - self.short_latency)
+                    self.long_latency += 0.05 * (per_token - self.long_latency)
+                if self.short_latency > self.long_latency * self.tolerance:
+                    return self._decrease(epoch, 'latency')
+            if utilized:
+                self._set(min(self.max_limit, self.limit + 1.0 / self.limit), 'healthy')
+
+    def failed(self, epoch, error):
+        """Record a failed call; only overload errors lower the limit"""
+        with self._lock:
+            self.in_flight -= 1
+            if is_overload_error(error):
+                self._decrease(epoch, 'overload')
+
+    def abandoned(self, epoch):
+        """Record a call given up on (a cancelled hedge) without judging the upstream by it"""
+        with self._lock:
+            self.in_flight -= 1
+
+    def _decrease(self, epoch, reason):
+        if epoch != self.epoch:
+            return
+        self.epoch += 1
+        self.decreases[reason] += 1
+        self._set(max(self.min_limit, self.limit * self.backoff), reason)
+
+    def _set(self, limit, reason):
+        """Called with the lock held"""
+        previous = int(self.limit)
+        self.limit = limit
+        if int(limit) != previous:
+            logger.info("LLM concurrency limit %d -> %d (%s)", previous, int(limit), reason)
+            if self.on_change is not None:
+                self.on_change(int(limit))
+
+    def snapshot(self):
+        """Current limit, calls in flight, cuts by reason and per-token latency averages"""
+        with self._lock:
+            return {
+                'limit': int(self.limit),
+                'limit_exact': round(self.limit, 2),
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self.in_flight,
+                'decreases': dict(self.decreases),
+                'latency_per_token_short': round(self.short_latency, 4) if self.short_latency is not None else None,
+                'latency_per_token_long': round(self.long_latency, 4) if self.long_latency is not None else None,
+            }
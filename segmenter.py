@@ -0,0 +1,115 @@
+"""
+Dictionary-based Chinese word segmentation for keyword extraction
+Forward maximum matching over a character trie: at each position the
+longest dictionary word starting there is taken, so the cost per answer is
+linear in its length (times the bounded longest-word length). Results are
+memoized per answer string, since many students give the same short answers.
+"""
+
+import re
+from functools import lru_cache
+
+# Characters that always end a non-dictionary span
+_SEPARATORS = re.compile(r'[\s，,、。.；;：:！!？?（）()【】\[\]“”"‘’\'/\\|和与及或]+')
+
+_WORD_END = object()
+
+
+class Segmenter:
+    """Forward maximum-matching segmenter over a dictionary trie"""
+
+    def __init__(self, words, cache_size=4096):
+        self.root = {}
+        self.max_word_length = 0
+        self.size = 0
+        for word in words:
+            self.add(word)
+        self.segment = lru_cache(maxsize=cache_size)(self._segment)
+        self.keywords = lru_cache(maxsize=cache_size)(self._keywords)
+
+    def add(self, word):
+        word = word.strip()
+        if not word:
+            return
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if _WORD_END not in node:
+            node[_WORD_END] = True
+            self.size += 1
+            self.max_word_length = max(self.max_word_length, len(word))
+
+    def is_word(self, text):
+        node = self.root
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                return False
+        return _WORD_END in node
+
+    def _longest_match(self, text, start):
+        """Length of the longest dictionary word at text[start:], or 0"""
+        node = self.root
+        longest = 0
+        for offset in range(start, min(len(text), start + self.max_word_length)):
+            node = node.get(text[offset])
+            if node is None:
+                break
+            if _WORD_END in node:
+                longest = offset - start + 1
+        return longest
+
+    def _segment(self, text):
+        """Split text into a tuple of (token, is_dictionary_word)
+
+        Runs of characters that start no dictionary word are kept together
+        and broken only at punctuation and conjunctions.
+        """
+        tokens = []
+        position = 0
+        span_start = 0
+
+        def flush_span(end):
+            for part in _SEPARATORS.split(text[span_start:end]):
+                if part:
+                    tokens.append((part, False))
+
+        while position < len(text):
+            length = self._longest_match(text, position)
+            if length:
+                flush_span(position)
+                tokens.append((text[position:position + length], True))
+                position += length
+                span_start = position
+            else:
+                position += 1
+        flush_span(len(text))
+        return tuple(tokens)
+
+    def _inner_words(self, word):
+        """Shorter dictionary words contained in a matched word, e.g. 软件 in 软件工程师"""
+        inner = []
+        for start in range(len(word)):
+            node = self.root
+            for end in range(start, len(word)):
+                node = node.get(word[end])
+                if node is None:
+                    break
+                if _WORD_END in node and end - start + 1 < len(word):
+                    inner.append(word[start:end + 1])
+        return inner
+
+    def _keywords(self, text):
+        """Distinct keywords: dictionary words (each followed by the shorter
+        dictionary words inside it) in order of appearance, then the other
+        spans of two or more characters"""
+        words = []
+        others = []
+        for token, is_word in self.segment(text):
+            if is_word:
+                for word in [token] + self._inner_words(token):
+                    if word not in words:
+                        words.append(word)
+            elif len(token) > 1 and token not in others:
+                others.append(token)
+        return tuple(words + others)
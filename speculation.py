@@ -0,0 +1,159 @@
+"""
+Speculative report precomputation while the student is still answering
+The assessment page posts each section of answers as soon as it is complete,
+under a draft ID. Keyword extraction runs on the new answers right away, and
+every report section whose inputs are all answered is generated in the
+background at batch priority. Each result is keyed by the exact answers it
+was generated from, so a result whose answers have since changed is
+discarded; on submit the finished matching results are taken over and only
+the remaining sections are generated.
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from ai_engine import SECTION_INPUTS
+from llm_scheduler import BATCH
+from resilience import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+def _inputs_key(responses, question_ids):
+    """The answers a section is generated from, as a comparable string"""
+    return json.dumps([responses.get(question_id) for question_id in question_ids],
+                      ensure_ascii=False, sort_keys=True)
+
+
+class _Draft:
+    __slots__ = ('responses', 'tenant', 'sections', 'updated_at')
+
+    def __init__(self, tenant):
+        self.responses = {}
+        self.tenant = tenant
+        # field -> (inputs key, future of the section text)
+        self.sections = {}
+        self.updated_at = time.monotonic()
+
+
+class Speculator:
+    """Drafts of in-progress assessments and the work started for them
+
+    At most max_drafts drafts are kept; the least recently updated one, and
+    any draft idle for longer than ttl seconds, is dropped together with its
+    queued work.
+    """
+
+    def __init__(self, engine, max_workers=None, ttl=None, max_drafts=1000):
+        self.engine = engine
+        self.ttl = ttl if ttl is not None else float(os.getenv('SPECULATION_TTL_SECONDS', '3600'))
+        self.max_drafts = max_drafts
+        self.started = 0
+        self.reused = 0
+        self.discarded = 0
+        self._drafts = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('SPECULATION_WORKERS', '4')),
+            thread_name_prefix='speculate')
+
+    def _discard(self, draft):
+        for _, future in draft.sections.values():
+            future.cancel()
+        self.discarded += len(draft.sections)
+
+    def _evict(self):
+        """Drop expired drafts and those over max_drafts; called with the lock held"""
+        now = time.monotonic()
+        while self._drafts:
+            draft_id, draft = next(iter(self._drafts.items()))
+            if len(self._drafts) <= self.max_drafts and now - draft.updated_at <= self.ttl:
+                break
+            del self._drafts[draft_id]
+            self._discard(draft)
+
+    def _generate(self, responses, field, tenant):
+        return self.engine.generate_section(responses, field, deadline=Deadline.from_env(),
+                                            priority=BATCH, tenant=tenant)
+
+    def update(self, draft_id, answers, tenant=None):
+        """Merge answers into a draft and start work on the sections they complete
+
+        Returns (draft_id, fields being generated); a new draft ID is
+        issued when draft_id is None or unknown.
+        """
+        with self._lock:
+            draft = self._drafts.pop(draft_id, None) if draft_id else None
+            if draft is None:
+                draft_id = uuid.uuid4().hex
+                draft = _Draft(tenant)
+            self._drafts[draft_id] = draft
+            draft.updated_at = time.monotonic()
+            draft.responses.update(answers)
+            responses = dict(draft.responses)
+
+            for field, question_ids in SECTION_INPUTS.items():
+                if not all(question_id in responses for question_id in question_ids):
+                    continue
+                key = _inputs_key(responses, question_ids)
+                current = draft.sections.get(field)
+                if current is not None:
+                    if current[0] == key:
+                        continue
+                    # An answer the section depends on changed
+                    current[1].cancel()
+                    self.discarded += 1
+                draft.sections[field] = (key, self._executor.submit(self._generate, responses, field, draft.tenant))
+                self.started += 1
+            generating = list(draft.sections)
+            self._evict()
+
+        self._executor.submit(self.engine.precompute_keywords, answers)
+        return draft_id, generating
+
+    def take(self, draft_id, responses):
+        """Remove a draft and return {field: text} for the sections generated from these exact answers
+
+        Only sections that have finished are used. One still queued or
+        running is at batch priority, possibly waiting behind other batch
+        work for an LLM slot, so it is left out and generated with the
+        submission at interactive priority instead of being waited for.
+        """
+        with self._lock:
+            draft = self._drafts.pop(draft_id, None)
+        if draft is None:
+            return {}
+
+        ready = {}
+        unused = 0
+        for field, (key, future) in draft.sections.items():
+            if key != _inputs_key(responses, SECTION_INPUTS[field]) or not future.done():
+                # A running one cannot be stopped; its result is dropped
+                future.cancel()
+                unused += 1
+                continue
+            try:
+                text = future.result()
+            except Exception as e:
+                logger.warning("Speculative section %s not used: %s", field, str(e) or type(e).__name__)
+                continue
+            if text:
+                ready[field] = text
+        with self._lock:
+            self.reused += len(ready)
+            self.discarded += unused
+        return ready
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'drafts': len(self._drafts),
+                'started': self.started,
+                'reused': self.reused,
+                'discarded': self.discarded,
+            }
@@ -0,0 +1,149 @@
+"""
+Non-blocking structured logging for the Student Assessment System
+Request threads only put log records on an in-memory queue; one listener
+thread turns them into JSON lines and writes them out, so slow log I/O
+never holds up a request. Messages and tracebacks are formatted by the
+listener rather than by the thread that logged them, and loggers with
+high-volume messages can be sampled (LOG_SAMPLING) before a record is
+even queued.
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and any traceback"""
+
+    def format(self, record):
+        entry = {
+            'time': f"{self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}.{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        if getattr(record, 'sample_rate', None) is not None:
+            entry['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def parse_sampling(value):
+    """Parse 'ai_engine=0.1,llm_client=0.5' into {logger name: fraction kept}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, rate = item.split('=', 1)
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records below WARNING from the configured loggers
+
+    A rate applies to its logger and that logger's children. Kept records
+    carry sample_rate, so counts can be scaled back up.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def _rate(self, name):
+        if name not in self._resolved:
+            matches = [prefix for prefix in self.rates if name == prefix or name.startswith(prefix + '.')]
+            self._resolved[name] = self.rates[max(matches, key=len)] if matches else None
+        return self._resolved[name]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate is None:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queues records unformatted, leaving message and traceback formatting to the listener
+
+    The stock QueueHandler formats every record in the logging thread so
+    it can be pickled; the queue here never leaves the process. Arguments
+    are therefore rendered a moment after the call, so they should not be
+    mutated right after logging them.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+_state = {}
+
+
+def configure(level=logging.INFO, stream=None):
+    """Send all logging through the queue to a JSON stream handler (LOG_FORMAT=text for plain lines)
+
+    Replaces any handlers already on the root logger; calling it again
+    only changes the level.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if 'handler' in _state:
+        return _state['handler']
+
+    target = logging.StreamHandler(stream or sys.stderr)
+    if os.getenv('LOG_FORMAT', 'json').lower() == 'text':
+        target.setFormatter(logging.Formatter(TEXT_FORMAT))
+    else:
+        target.setFormatter(JSONFormatter())
+
+    handler = LazyQueueHandler(queue.Queue(-1))
+    handler.addFilter(SamplingFilter(parse_sampling(os.getenv('LOG_SAMPLING'))))
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+
+    _state.update(handler=handler, target=target)
+    _start_listener()
+    atexit.register(_stop_listener)
+    return handler
+
+
+def _start_listener():
+    _state['listener'] = QueueListener(_state['handler'].queue, _state['target'], respect_handler_level=True)
+    _state['listener'].start()
+
+
+def _stop_listener():
+    """Write out whatever is still queued"""
+    listener = _state.get('listener')
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork (gunicorn's preload_app), so
+    # each worker drains a fresh queue with its own listener
+    if 'handler' in _state:
+        _state['handler'].queue = queue.Queue(-1)
+        _start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
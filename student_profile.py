@@ -0,0 +1,213 @@
+"""
+Validated student answers for the Student Assessment System
+The question bank (questions.json) is compiled once into a schema of each
+question's type and options. A submission is checked and normalized against
+it a single time, at the edge: unknown fields, oversized answers and options
+the question does not offer are rejected. The result is an immutable
+StudentProfile that every report generator reads, with a canonical digest
+that is the same for the same answers however they were submitted.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+# Text of an unanswered question in reports and prompts
+MISSING = "未提供"
+
+# Longest accepted free-text answer, in characters
+MAX_TEXT_CHARS = int(os.getenv('PROFILE_MAX_TEXT_CHARS', '2000'))
+
+# Submission metadata accepted next to the answers, with its longest length
+METADATA_FIELDS = {'school_id': 64}
+
+TEXT = 'text'
+SELECT = 'select'
+MULTISELECT = 'multiselect'
+
+
+class InvalidSubmission(ValueError):
+    """A submission that does not fit the question bank"""
+
+
+class StudentProfile:
+    """One student's normalized answers
+
+    Answers are strings, or tuples of options in question bank order for
+    multiselect questions; unanswered questions are absent. Profiles are
+    immutable and compare and hash by digest, so they can key caches.
+    """
+
+    __slots__ = ('_answers', '_texts', 'school_id', 'digest')
+
+    def __init__(self, answers, school_id=None):
+        canonical = json.dumps([school_id, sorted(answers.items())], ensure_ascii=False, separators=(',', ':'))
+        object.__setattr__(self, '_answers', MappingProxyType(dict(answers)))
+        object.__setattr__(self, '_texts', {question_id: "、".join(value) if isinstance(value, tuple) else value
+                                            for question_id, value in answers.items()})
+        object.__setattr__(self, 'school_id', school_id)
+        object.__setattr__(self, 'digest', hashlib.sha256(canonical.encode('utf-8')).hexdigest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StudentProfile is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("StudentProfile is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, StudentProfile) and other.digest == self.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __contains__(self, question_id):
+        return question_id in self._answers
+
+    def __repr__(self):
+        return f"StudentProfile({self.digest[:12]}, {len(self._answers)} answers)"
+
+    def __getitem__(self, question_id):
+        return self._answers[question_id]
+
+    def get(self, question_id, default=None):
+        """The normalized answer to a question (a string or a tuple of options)"""
+        return self._answers.get(question_id, default)
+
+    def text(self, question_id, default=MISSING):
+        """The answer to a question as display text, multiselect options joined with '、'"""
+        return self._texts.get(question_id, default)
+
+    def items(self):
+        """(question ID, normalized answer) pairs of the answered questions"""
+        return self._answers.items()
+
+    def answers(self):
+        """The answers and metadata as a plain JSON-serializable dict"""
+        answers = {question_id: list(value) if isinstance(value, tuple) else value
+                   for question_id, value in self._answers.items()}
+        if self.school_id is not None:
+            answers['school_id'] = self.school_id
+        return answers
+
+
+class ProfileSchema:
+    """The answers a question bank accepts, compiled for validation
+
+    validate() is strict and raises InvalidSubmission; normalize() is for
+    answers that were accepted earlier (stored reports, internal callers)
+    and never raises: it keeps unknown fields as text and truncates what
+    is too long.
+    """
+
+    def __init__(self, questions, max_text_chars=None):
+        self.max_text_chars = max_text_chars if max_text_chars is not None else MAX_TEXT_CHARS
+        # question ID -> (type, {option: position} or None)
+        self.fields = {}
+        for section in questions.values():
+            for question in section:
+                options = question.get('options')
+                self.fields[question['id']] = (
+                    question.get('type', TEXT),
+                    {option: position for position, option in enumerate(options)} if options else None)
+
+    @classmethod
+    def load(cls, path='questions.json', max_text_chars=None):
+        """Compile the question bank in path; an empty schema if it cannot be read"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(json.load(f), max_text_chars)
+        except Exception as e:
+            logger.error("Error loading question bank %s: %s", path, e)
+            return cls({}, max_text_chars)
+
+    def validate(self, data):
+        """A StudentProfile of a submission, or InvalidSubmission naming the first field that does not fit"""
+        return self._parse(data, strict=True)
+
+    def normalize(self, data):
+        """A StudentProfile of previously accepted answers, or data itself if it is one already"""
+        if isinstance(data, StudentProfile):
+            return data
+        return self._parse(data, strict=False)
+
+    def validate_form(self, form):
+        """validate() for a form post, where a multiselect answer is every value sent under its name"""
+        data = {}
+        for key in form:
+            field = self.fields.get(key)
+            data[key] = form.getlist(key) if field is not None and field[0] == MULTISELECT else form.get(key)
+        return self.validate(data)
+
+    def _parse(self, data, strict):
+        if not isinstance(data, dict):
+            if strict:
+                raise InvalidSubmission("Submission must be an object of answers")
+            data = {}
+        answers = {}
+        school_id = None
+        for key, value in data.items():
+            if key in METADATA_FIELDS:
+                school_id = self._metadata(key, value, strict) or None
+                continue
+            field = self.fields.get(key)
+            if field is None:
+                if strict:
+                    raise InvalidSubmission(f"Unknown field '{key}'")
+                field = (MULTISELECT if isinstance(value, (list, tuple)) else TEXT, None)
+            value = self._value(key, value, field, strict)
+            if value:
+                answers[key] = value
+        return StudentProfile(answers, school_id)
+
+    def _metadata(self, key, value, strict):
+        if value is None:
+            return None
+        if not isinstance(value, str) or len(value) > METADATA_FIELDS[key]:
+            if strict:
+                raise InvalidSubmission(f"Invalid value for '{key}'")
+            value = str(value)[:METADATA_FIELDS[key]]
+        return value.strip()
+
+    def _value(self, key, value, field, strict):
+        """The normalized answer to one question, empty when unanswered"""
+        kind, options = field
+        if kind == MULTISELECT:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            chosen = set()
+            for item in values:
+                item = self._string(key, item, strict)
+                if not item:
+                    continue
+                if options is not None and item not in options and strict:
+                    raise InvalidSubmission(f"'{item}' is not an option of '{key}'")
+                chosen.add(item)
+            # Question bank order, so the same choices always compare equal
+            order = options or {}
+            return tuple(sorted(chosen, key=lambda item: (order.get(item, len(order)), item)))
+
+        if isinstance(value, (list, tuple)):
+            if strict and len(value) > 1:
+                raise InvalidSubmission(f"'{key}' takes a single answer")
+            value = value[0] if value else None
+        value = self._string(key, value, strict)
+        if value and options is not None and value not in options and strict:
+            raise InvalidSubmission(f"'{value}' is not an option of '{key}'")
+        return value
+
+    def _string(self, key, value, strict):
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            if strict and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise InvalidSubmission(f"Invalid value for '{key}'")
+            value = str(value)
+        value = value.strip()
+        if len(value) > self.max_text_chars:
+            if strict:
+                raise InvalidSubmission(f"Answer to '{key}' is longer than {self.max_text_chars} characters")
+            value = value[:self.max_text_chars]
+        return value
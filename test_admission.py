@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control on /submit and render_app's /submit_assessment
+"""
+
+import unittest
+from unittest.mock import patch
+import app as app_module
+import render_app
+from app import app
+from admission import AdmissionController, Overloaded
+
+
+class TestAdmissionController(unittest.TestCase):
+    """Test cases for queue depth and estimated wait limits"""
+
+    def test_rejects_past_max_queue(self):
+        controller = AdmissionController(concurrency=2, max_queue=2, max_wait=1000)
+        with controller.admit(), controller.admit():
+            with self.assertRaises(Overloaded):
+                with controller.admit():
+                    pass
+        self.assertEqual(controller.in_flight, 0)
+        self.assertEqual(controller.rejected, 1)
+
+    def test_rejects_when_estimated_wait_too_long(self):
+        controller = AdmissionController(concurrency=1, max_queue=100, max_wait=50, default_duration=30)
+        with controller.admit():
+            self.assertEqual(controller.estimated_wait(), 60)
+            with self.assertRaises(Overloaded) as raised:
+                with controller.admit():
+                    pass
+        self.assertEqual(raised.exception.retry_after, 30)
+
+    def test_learns_from_recent_durations(self):
+        controller = AdmissionController(concurrency=1, max_queue=100, max_wait=50, default_duration=30)
+        with controller.admit():
+            pass
+        self.assertLess(controller.mean_duration(), 1)
+        with controller.admit(), controller.admit():
+            pass
+
+
+class TestSubmitUnderLoad(unittest.TestCase):
+    """Test cases for /submit when the controller refuses admission"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.full = AdmissionController(concurrency=1, max_queue=0, max_wait=10, default_duration=7)
+
+    def test_template_fallback_with_upgrade(self):
+        with patch.object(app_module, 'admission', self.full), \
+                patch.object(app_module, 'generate_report') as generate:
+            response = self.client.post('/submit', json={"p2": "高二", "a1": "数学"})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.get_json()['degraded'])
+            generate.assert_not_called()
+
+            page = self.client.get('/report').get_data(as_text=True)
+            self.assertIn('id="upgradeBtn"', page)
+
+            upgrade = self.client.post('/report/upgrade')
+            self.assertEqual(upgrade.status_code, 429)
+            self.assertEqual(upgrade.headers['Retry-After'], '7')
+
+        with patch.object(app_module, 'generate_report', return_value=({"summary": "完整报告"}, "llm")):
+            upgrade = self.client.post('/report/upgrade')
+        self.assertEqual(upgrade.status_code, 200)
+        page = self.client.get('/report').get_data(as_text=True)
+        self.assertIn('完整报告', page)
+        self.assertNotIn('id="upgradeBtn"', page)
+
+    def test_reject_mode_returns_429(self):
+        with patch.object(app_module, 'admission', self.full), \
+                patch.object(app_module, 'ADMISSION_OVERLOAD_MODE', 'reject'):
+            response = self.client.post('/submit', json={"p2": "高二"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '7')
+        self.assertEqual(response.get_json()['retry_after'], 7)
+
+
+class TestRenderAppAdmission(unittest.TestCase):
+    """Test cases for admission and memory draining in render_app"""
+
+    def setUp(self):
+        self.client = render_app.app.test_client()
+
+    def test_submit_assessment_returns_429_when_full(self):
+        full = AdmissionController(concurrency=1, max_queue=0, max_wait=10, default_duration=7)
+        with patch.object(render_app, 'admission', full):
+            response = self.client.post('/submit_assessment', data={"p2": "高二"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '7')
+
+    def test_watchdog_drains_render_app_admission(self):
+        self.assertEqual(render_app.memory.in_flight(), 0)
+        with render_app.admission.admit():
+            self.assertEqual(render_app.memory.in_flight(), 1)
+        render_app.memory.drain()
+        try:
+            response = self.client.post('/submit_assessment', data={"p2": "高二"})
+            self.assertEqual(response.status_code, 429)
+        finally:
+            render_app.admission.draining = False
+
+
+if __name__ == "__main__":
+    unittest.main()
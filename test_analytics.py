@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for cohort analytics rollups and the dashboard endpoints
+"""
+
+import os
+import uuid
+import tempfile
+import unittest
+from unittest.mock import patch
+import app as app_module
+from app import app
+from analytics import CohortAnalytics
+
+
+class TestCohortAnalytics(unittest.TestCase):
+    """Test cases for incrementally maintained rollups"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cohort = CohortAnalytics(os.path.join(self.tmp.name, 'reports.db'))
+        self.cohort.record('r1', {"school_id": "s1", "p2": "高二", "ps1": ["领导者", "策划者"], "d4": "有一定了解",
+                                  "i4": ["美国"]}, {'careers': ["软件工程师"], 'programs': []})
+        self.cohort.record('r2', {"school_id": "s1", "p2": "高二", "ps1": ["领导者"], "d4": "非常了解"},
+                           {'careers': ["软件工程师", "数据科学家"], 'programs': []})
+        self.cohort.record('r3', {"school_id": "s2", "p2": "高三", "ps1": ["创新者"], "d4": "有一定了解"},
+                           {'careers': ["数据科学家"], 'programs': []})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_distribution(self):
+        result = self.cohort.distribution('ps1')
+        self.assertEqual(result['total'], 3)
+        self.assertEqual(result['counts'], {"领导者": 2, "策划者": 1, "创新者": 1})
+        self.assertEqual(list(result['counts'])[0], "领导者")
+
+        result = self.cohort.distribution('d4', school="s1", grade="高二")
+        self.assertEqual(result, {'total': 2, 'counts': {"有一定了解": 1, "非常了解": 1}})
+
+    def test_crosstab_either_orientation(self):
+        table = self.cohort.crosstab('ps1', 'career')
+        self.assertEqual(table["领导者"], {"软件工程师": 2, "数据科学家": 1})
+        self.assertEqual(table["创新者"], {"数据科学家": 1})
+
+        flipped = self.cohort.crosstab('career', 'ps1', school="s1")
+        self.assertEqual(flipped["数据科学家"], {"领导者": 1})
+
+    def test_remove_takes_submission_out(self):
+        self.cohort.remove('r1')
+        self.assertEqual(self.cohort.distribution('ps1'), {'total': 2, 'counts': {"领导者": 1, "创新者": 1}})
+        self.assertNotIn("策划者", self.cohort.crosstab('ps1', 'career'))
+        self.cohort.remove('r1')
+        self.assertEqual(self.cohort.distribution('ps1')['total'], 2)
+
+    def test_groups(self):
+        self.assertEqual(self.cohort.groups(), [{'school': 's1', 'grade': '高二', 'total': 2},
+                                                {'school': 's2', 'grade': '高三', 'total': 1}])
+
+    def test_unknown_fields(self):
+        with self.assertRaises(ValueError):
+            self.cohort.distribution('p3')
+        with self.assertRaises(ValueError):
+            self.cohort.crosstab('ps1', 'ps1')
+
+
+class TestDashboardEndpoints(unittest.TestCase):
+    """Test cases for /analytics/dashboard and /analytics/crosstab"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.headers = {'Authorization': 'Bearer secret'}
+
+    def test_submit_updates_dashboard(self):
+        school = f"测试学校-{uuid.uuid4().hex[:8]}"
+        with patch.object(app_module.ai_engine, 'use_hf', False):
+            self.client.post('/submit', json={"school_id": school, "p2": "高一", "a1": "计算机",
+                                              "c1": "软件工程师", "ps1": ["协调者"], "d4": "了解不多"})
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            response = self.client.get(f'/analytics/dashboard?school={school}', headers=self.headers)
+            data = response.get_json()
+            self.assertEqual(data['total'], 1)
+            self.assertEqual(data['distributions']['ps1'], {"协调者": 1})
+            self.assertTrue(data['distributions']['career'])
+
+            response = self.client.get(f'/analytics/crosstab?row=d4&column=ps1&school={school}',
+                                       headers=self.headers)
+            self.assertEqual(response.get_json()['table'], {"了解不多": {"协调者": 1}})
+
+            self.assertEqual(self.client.get('/analytics/crosstab?row=x&column=ps1',
+                                             headers=self.headers).status_code, 400)
+
+    def test_requires_token(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/analytics/dashboard').status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
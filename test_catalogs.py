@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for per-school catalogs and their memory-bounded cache
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from catalogs import Catalog, CatalogCache, CAREERS, UNIVERSITIES
+from ai_engine import AIEngine
+
+TENANT_CAREERS = {"careers": [{
+    "name": "茶艺师",
+    "keywords": ["茶艺", "茶文化", "品茶"],
+    "description": "研习并传播茶文化。",
+    "future_outlook": "文旅融合带来新的机会。",
+    "ai_impact": "AI难以替代现场的茶艺体验。",
+    "required_skills": ["茶艺", "沟通"]
+}]}
+
+
+class TestCatalogCache(unittest.TestCase):
+    """Test cases for loading, fallback and LRU eviction of tenant catalogs"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.default = Catalog.load('data')
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for school_id in ('tea', 'tea2', 'tea3'):
+            os.makedirs(os.path.join(self.root, school_id))
+            with open(os.path.join(self.root, school_id, CAREERS), 'w', encoding='utf-8') as f:
+                json.dump(TENANT_CAREERS, f, ensure_ascii=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_tenant_overrides_and_falls_back(self):
+        cache = CatalogCache(self.default, root=self.root)
+        catalog = cache.get('tea')
+        self.assertEqual([career['name'] for career in catalog.careers], ['茶艺师'])
+        self.assertIn('茶艺', catalog.career_index)
+        self.assertIs(catalog.data[UNIVERSITIES], self.default.data[UNIVERSITIES])
+        self.assertEqual(len(catalog.programs), len(self.default.programs))
+        self.assertIn('茶文化', catalog.segmenter.keywords('我喜欢茶文化'))
+
+    def test_unknown_school_uses_default(self):
+        cache = CatalogCache(self.default, root=self.root)
+        for school_id in (None, '', 'nowhere', '../tea', '.', '..', 'tea/..'):
+            self.assertIs(cache.get(school_id), self.default)
+        self.assertEqual(cache.snapshot()['misses'], 0)
+
+    def test_hits_reuse_the_compiled_catalog(self):
+        cache = CatalogCache(self.default, root=self.root)
+        first = cache.get('tea')
+        self.assertIs(cache.get('tea'), first)
+        snapshot = cache.snapshot()
+        self.assertEqual((snapshot['hits'], snapshot['misses'], snapshot['entries']), (1, 1, 1))
+        self.assertGreater(first.size, 0)
+        self.assertEqual(snapshot['bytes'], first.size)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        cache = CatalogCache(self.default, root=self.root)
+        size = cache.get('tea').size
+        cache = CatalogCache(self.default, root=self.root, max_bytes=int(size * 2.5))
+        cache.get('tea')
+        cache.get('tea2')
+        cache.get('tea')
+        cache.get('tea3')
+        snapshot = cache.snapshot()
+        self.assertEqual(snapshot['entries'], 2)
+        self.assertEqual(snapshot['evictions'], 1)
+        self.assertLessEqual(snapshot['bytes'], snapshot['max_bytes'])
+        self.assertIn('tea', cache._entries)
+        self.assertNotIn('tea2', cache._entries)
+
+    def test_keeps_one_catalog_larger_than_the_bound(self):
+        cache = CatalogCache(self.default, root=self.root, max_bytes=1)
+        catalog = cache.get('tea')
+        self.assertIs(cache.get('tea'), catalog)
+        self.assertEqual(cache.snapshot()['entries'], 1)
+
+
+class TestTenantReports(unittest.TestCase):
+    """Test cases for matching a submission against its school's catalog"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = AIEngine()
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'tea'))
+        with open(os.path.join(self.root, 'tea', CAREERS), 'w', encoding='utf-8') as f:
+            json.dump(TENANT_CAREERS, f, ensure_ascii=False)
+        self.default_cache = self.engine.catalogs
+        self.engine.catalogs = CatalogCache(self.engine.catalog, root=self.root)
+
+    def tearDown(self):
+        self.engine.catalogs = self.default_cache
+        shutil.rmtree(self.root)
+
+    def test_matches_use_the_school_catalog(self):
+        responses = {"a1": "茶文化和品茶", "a4": "茶艺", "c1": "开一家茶馆"}
+        self.assertEqual(self.engine.catalog_matches(dict(responses, school_id='tea'))['careers'], ['茶艺师'])
+        self.assertNotIn('茶艺师', self.engine.catalog_matches(responses)['careers'])
+
+    def test_template_report_for_tenant(self):
+        responses = {"school_id": "tea", "p2": "高二", "a1": "茶文化", "a4": "品茶", "c1": "茶艺"}
+        report = self.engine._generate_template_report(responses)
+        self.assertIn('茶艺师', json.dumps(report, ensure_ascii=False))
+
+
+
+class TestAdminCatalogsEndpoint(unittest.TestCase):
+    """Test cases for GET /admin/catalogs"""
+
+    def setUp(self):
+        import app as app_module
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+
+    def test_requires_token(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/admin/catalogs').status_code, 403)
+
+    def test_reports_cache_counters(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        cache = CatalogCache(Catalog.load('data'), root=root, max_bytes=1 << 20)
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}), \
+                patch.object(self.app_module.ai_engine, 'catalogs', cache, create=True):
+            response = self.client.get('/admin/catalogs', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()['catalogs']
+        self.assertEqual(data['max_bytes'], 1 << 20)
+        for key in ('entries', 'hits', 'misses', 'evictions', 'evicted_bytes'):
+            self.assertIn(key, data)
+
+
+if __name__ == '__main__':
+    unittest.main()
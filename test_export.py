@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming bulk export of reports
+"""
+
+import io
+import os
+import json
+import uuid
+import zipfile
+import tempfile
+import unittest
+from unittest.mock import patch
+import export
+import app as app_module
+from app import app
+from report_store import ReportStore
+
+
+class TestIterReports(unittest.TestCase):
+    """Test cases for ReportStore.iter_reports()"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ReportStore(os.path.join(self.tmp.name, 'reports.db'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pages_through_all_reports_in_order(self):
+        ids = [self.store.create({"p2": "高二" if i % 2 else "高三"}, {"summary": str(i)}) for i in range(7)]
+        self.assertEqual([r['id'] for r in self.store.iter_reports(page_size=2)], ids)
+        self.assertEqual([r['report']['summary'] for r in self.store.iter_reports(grade="高二", page_size=2)],
+                         ["1", "3", "5"])
+
+    def test_filters_by_school(self):
+        self.store.create({"p2": "高二", "school_id": "s1"}, {"summary": "a"})
+        self.store.create({"p2": "高二", "school_id": "s2"}, {"summary": "b"})
+        self.assertEqual([r['report']['summary'] for r in self.store.iter_reports(school_id="s2")], ["b"])
+
+    def test_skips_superseded_reports(self):
+        first = self.store.create({"p2": "高二"}, {"summary": "a"})
+        edited = self.store.create({"p2": "高二"}, {"summary": "a2"}, replaces=first)
+        upgraded = self.store.create({"p2": "高二"}, {"summary": "a3"}, replaces=edited)
+        other = self.store.create({"p2": "高二"}, {"summary": "b"})
+        self.assertEqual([r['id'] for r in self.store.iter_reports(page_size=1)], [upgraded, other])
+        self.assertEqual(self.store.get(first)['report']['summary'], "a")
+
+
+class TestStreamZip(unittest.TestCase):
+    """Test cases for export.stream_zip()"""
+
+    def setUp(self):
+        self.template = app.jinja_env.get_template(export.TEMPLATE_NAME)
+        with open('test_report.json', 'r', encoding='utf-8') as f:
+            self.report = json.load(f)
+
+    def stored(self, i):
+        return {'id': f"{i:012x}" + '0' * 20, 'created_at': 1700000000 + i, 'responses': {"p2": "高二"},
+                'report': self.report, 'html': None, 'degraded': False}
+
+    def test_archive_contains_one_document_per_report(self):
+        data = b''.join(export.stream_zip(self.template, (self.stored(i) for i in range(5)), workers=2))
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 5)
+            self.assertTrue(all(name.startswith("高二/") and name.endswith(".html") for name in names))
+            html = archive.read(names[0]).decode('utf-8')
+        self.assertIn(self.report['summary'], html)
+        self.assertIn('<h2 class="section-title">职业指导</h2>', html)
+
+    def test_first_bytes_before_all_reports_are_read(self):
+        consumed = []
+
+        def reports():
+            for i in range(50):
+                consumed.append(i)
+                yield self.stored(i)
+
+        chunks = export.stream_zip(self.template, reports(), workers=2)
+        first = next(chunks)
+        self.assertTrue(first.startswith(b'PK'))
+        self.assertLessEqual(len(consumed), 5)
+        self.assertEqual(len(zipfile.ZipFile(io.BytesIO(first + b''.join(chunks))).namelist()), 50)
+
+    def test_parse_formats(self):
+        self.assertEqual(export.parse_formats('HTML'), ('html',))
+        with self.assertRaises(ValueError):
+            export.parse_formats('docx')
+        if export.HTML is None:
+            with self.assertRaises(ValueError):
+                export.parse_formats('html,pdf')
+
+
+class TestExportEndpoint(unittest.TestCase):
+    """Test cases for GET /export/reports.zip"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.grade = "测试年级"
+        app_module.report_store.create({"p2": self.grade}, {"summary": "导出测试"})
+
+    def test_requires_token(self):
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop('EXPORT_TOKEN', None)
+            self.assertEqual(self.client.get('/export/reports.zip?token=').status_code, 403)
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/export/reports.zip?token=wrong').status_code, 403)
+
+    def test_streams_zip_for_grade(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            response = self.client.get(f'/export/reports.zip?grade={self.grade}',
+                                       headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+            names = archive.namelist()
+            self.assertTrue(names and all(name.startswith(f"{self.grade}/") for name in names))
+            self.assertIn("导出测试", archive.read(names[-1]).decode('utf-8'))
+
+    def test_edited_report_exported_once(self):
+        school = uuid.uuid4().hex
+        with patch.object(app_module.ai_engine, 'generate_routed_report',
+                          return_value=({"summary": "原始报告"}, "basic")):
+            self.client.post('/submit', json={"p2": "高二", "e1": "篮球", "school_id": school})
+        with patch.object(app_module.ai_engine, 'regenerate_sections',
+                          side_effect=lambda report, *args, **kwargs: dict(report, summary="修改后的报告")):
+            self.assertEqual(self.client.post('/report/edit', json={"e1": "足球"}).status_code, 200)
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            response = self.client.get(f'/export/reports.zip?school={school}',
+                                       headers={'Authorization': 'Bearer secret'})
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 1)
+            self.assertIn("修改后的报告", archive.read(names[0]).decode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
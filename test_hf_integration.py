@@ -106,6 +106,38 @@ class TestHFIntegration(unittest.TestCase):
                 logger.error(f"Error during report generation: {str(e)}")
                 self.fail(f"Test failed with error: {str(e)}")
 
+    @patch.dict(os.environ, {'LLM_SECTION_MODE': 'parallel'})
+    @patch('ai_engine.hf_api_key', 'test-token')
+    @patch('ai_engine.InferenceClient')
+    def test_parallel_section_generation(self, mock_inference_client):
+        """Sections are generated separately and a failed one degrades to template text"""
+        
+        def fake_text_generation(prompt, **kwargs):
+            if "「职业指导与规划」" in prompt:
+                raise RuntimeError("section failed")
+            # The instructions come first and the student's profile block closes the prompt
+            instructions, profile_block = prompt.rsplit("\n学生信息：\n", 1)
+            self.assertIn("请撰写", instructions)
+            self.assertTrue(profile_block.strip())
+            self.assertNotIn("请撰写", profile_block)
+            self.assertNotIn("\n  ", profile_block)
+            return "生成的章节内容"
+        
+        mock_client_instance = MagicMock()
+        mock_inference_client.return_value = mock_client_instance
+        mock_client_instance.text_generation.side_effect = fake_text_generation
+        
+        with patch('ai_engine.is_valid_hf_token', return_value=True):
+            ai_engine = AIEngine()
+            report = ai_engine._generate_hf_report(self.sample_responses)
+            template_report = ai_engine._generate_template_report(self.sample_responses)
+        
+        # Eight sections, plus the failed section walking the rest of the model chain
+        self.assertEqual(mock_client_instance.text_generation.call_count, 8 + 2)
+        self.assertEqual(report["summary"], "生成的章节内容")
+        self.assertEqual(report["ai_era_skills"], "生成的章节内容")
+        self.assertEqual(report["career_guidance"], template_report["career_guidance"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test script for response compression and conditional GETs
+"""
+
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+import app as app_module
+from app import app
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Test cases for ETags, 304 responses and compression"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        with open('test_report.json', 'r', encoding='utf-8') as f:
+            self.report = json.load(f)
+
+    def test_assessment_page_conditional_get(self):
+        first = self.client.get('/assessment')
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+
+        second = self.client.get('/assessment', headers={'If-None-Match': etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.data, b'')
+
+    def test_report_conditional_get(self):
+        report_id = app_module.report_store.create({"p2": "高二"}, self.report)
+        with self.client.session_transaction() as sess:
+            sess['report_id'] = report_id
+
+        first = self.client.get('/report')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first.headers['Cache-Control'])
+
+        second = self.client.get('/report', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+        # A different report is a different resource
+        other_id = app_module.report_store.create({"p2": "高二"}, dict(self.report, summary="已修改的摘要"))
+        with self.client.session_transaction() as sess:
+            sess['report_id'] = other_id
+        third = self.client.get('/report', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(third.status_code, 200)
+
+    def test_report_revalidated_after_asset_build(self):
+        report_id = app_module.report_store.create({"p2": "高二"}, self.report)
+        with self.client.session_transaction() as sess:
+            sess['report_id'] = report_id
+        etag = self.client.get('/report').headers['ETag']
+        with patch.dict(app.config, {'ASSET_VERSION': 'rebuilt'}):
+            response = self.client.get('/report', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_report_is_not_validated(self):
+        report_id = app_module.report_store.create({"p2": "高二"}, self.report)
+        with self.client.session_transaction() as sess:
+            sess['report_id'] = report_id
+        etag = self.client.get('/report').headers['ETag']
+        with patch.object(app_module.report_store, 'get', return_value=None):
+            response = self.client.get('/report', headers={'If-None-Match': etag})
+        self.assertNotEqual(response.status_code, 304)
+
+    def test_assessment_page_rendered_once(self):
+        app_module._assessment_page_cache['body'] = None
+        with patch.object(app_module, 'render_template', wraps=app_module.render_template) as render:
+            first = self.client.get('/assessment')
+            second = self.client.get('/assessment')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertIn('name="a1"', first.get_data(as_text=True))
+
+    def test_gzip_compression(self):
+        plain = self.client.get('/assessment')
+        compressed = self.client.get('/assessment', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+        self.assertEqual(gzip.decompress(compressed.data), plain.data)
+        self.assertLess(len(compressed.data), len(plain.data))
+
+        # The compressed representation still validates against the same content
+        revalidated = self.client.get('/assessment', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
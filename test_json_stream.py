@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming detection of a complete JSON report
+"""
+
+import json
+import unittest
+from json_stream import JSONCompletionDetector, extract_document
+
+
+def feed_in_chunks(detector, text, size):
+    for i in range(0, len(text), size):
+        if detector.feed(text[i:i + size]):
+            return True
+    return False
+
+
+class TestJSONCompletionDetector(unittest.TestCase):
+    """Test cases for the incremental scanner"""
+
+    def setUp(self):
+        self.document = ('{"summary": "喜欢{数学}和\\\\\\"编程\\"", "plan": {"short": ["a", "b]"], "long": null}, '
+                         '"score": 3}')
+        self.text = '好的，报告如下：\n```json\n' + self.document + '\n```\n希望对你有帮助。'
+
+    def test_detects_end_whatever_the_chunking(self):
+        for size in (1, 2, 7, len(self.text)):
+            detector = JSONCompletionDetector()
+            self.assertTrue(feed_in_chunks(detector, self.text, size))
+            self.assertEqual(self.text[detector.start:detector.end], self.document)
+            self.assertFalse(detector.closed_early)
+            self.assertEqual(detector.closed_fields, {"summary", "plan", "score"})
+
+    def test_incomplete_document(self):
+        detector = JSONCompletionDetector()
+        self.assertFalse(detector.feed(self.text[:40]))
+        self.assertIsNone(extract_document('没有JSON'))
+        self.assertIsNone(extract_document('{"summary": "未完'))
+
+    def test_stops_after_required_fields(self):
+        text = '{"summary": "a,b", "plan": {"x": 1}, "extra": "模型多写的内容'
+        detector = JSONCompletionDetector(["summary", "plan"])
+        self.assertTrue(feed_in_chunks(detector, text, 3))
+        self.assertTrue(detector.closed_early)
+        self.assertEqual(json.loads(extract_document(text, ["summary", "plan"])),
+                         {"summary": "a,b", "plan": {"x": 1}})
+
+    def test_nested_keys_do_not_count(self):
+        detector = JSONCompletionDetector(["summary"])
+        self.assertFalse(detector.feed('{"plan": {"summary": 1, "x": 2}, '))
+        self.assertEqual(detector.closed_fields, {"plan"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Test script for hedged requests and model failover in the LLM client
+"""
+
+import os
+import time
+import threading
+import unittest
+from unittest.mock import patch
+from llm_client import HedgedGenerator, LatencyTracker, AllModelsFailedError, get_model_chain, get_model_id
+from resilience import CircuitBreaker, Deadline, DeadlineExceeded, AdaptiveLimit
+from json_stream import JSONCompletionDetector
+from llm_scheduler import LLMScheduler, BATCH
+
+
+class FakeClient:
+    """Fake InferenceClient whose behaviour is scripted per model ID"""
+
+    def __init__(self, script, calls):
+        self.script = script
+        self.calls = calls
+
+    def text_generation(self, prompt, model=None, **kwargs):
+        self.calls.append(model)
+        delay, result = self.script[model]
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return iter([result[:2], result[2:]])
+
+
+class FakeStream:
+    """Token stream that records how much of it was read and whether it was closed"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        for token in self.tokens:
+            self.read += 1
+            yield token
+
+    def close(self):
+        self.closed = True
+
+
+class TestHedgedGenerator(unittest.TestCase):
+    """Test cases for the hedged generator"""
+
+    def make_generator(self, script, hedge_delay=0.05, **kwargs):
+        self.calls = []
+        return HedgedGenerator(lambda timeout: FakeClient(script, self.calls), default_hedge_delay=hedge_delay,
+                               max_workers=4, **kwargs)
+
+    def test_primary_answers_within_delay(self):
+        generator = self.make_generator({get_model_id('llama3'): (0.0, '{"a": 1}')})
+        text, model_key = generator.generate("prompt", ['llama3', 'mistral'])
+        self.assertEqual(text, '{"a": 1}')
+        self.assertEqual(model_key, 'llama3')
+        self.assertEqual(self.calls, [get_model_id('llama3')])
+
+    def test_slow_primary_is_hedged(self):
+        generator = self.make_generator({
+            get_model_id('llama3'): (1.0, 'slow'),
+            get_model_id('mistral'): (0.0, 'fast'),
+        })
+        start = time.monotonic()
+        text, model_key = generator.generate("prompt", ['llama3', 'mistral'])
+        self.assertEqual((text, model_key), ('fast', 'mistral'))
+        self.assertLess(time.monotonic() - start, 0.9)
+
+    def test_no_hedge_while_primary_waits_for_a_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        generator = self.make_generator({
+            get_model_id('llama3'): (0.0, 'primary'),
+            get_model_id('mistral'): (0.0, 'hedge'),
+        }, scheduler=scheduler)
+        release = threading.Event()
+
+        def hold_slot():
+            with scheduler.slot(BATCH):
+                release.wait(5)
+
+        holder = threading.Thread(target=hold_slot)
+        holder.start()
+        while scheduler.in_flight < 1:
+            time.sleep(0.001)
+        result = {}
+        caller = threading.Thread(target=lambda: result.update(
+            answer=generator.generate("prompt", ['llama3', 'mistral'])))
+        caller.start()
+        # Well past the hedge delay, still only the primary is queued
+        time.sleep(0.3)
+        self.assertEqual(sum(scheduler.snapshot()['queued'].values()), 1)
+        release.set()
+        caller.join(5)
+        holder.join(5)
+        self.assertEqual(result['answer'], ('primary', 'llama3'))
+        self.assertEqual(self.calls, [get_model_id('llama3')])
+
+    def test_failed_primary_fails_over(self):
+        generator = self.make_generator({
+            get_model_id('llama3'): (0.0, RuntimeError("503")),
+            get_model_id('mistral'): (0.0, RuntimeError("429")),
+            get_model_id('falcon'): (0.0, 'ok'),
+        }, hedge_delay=10)
+        text, model_key = generator.generate("prompt", ['llama3', 'mistral', 'falcon'])
+        self.assertEqual(model_key, 'falcon')
+
+    def test_all_models_failed(self):
+        generator = self.make_generator({
+            get_model_id('llama3'): (0.0, RuntimeError("503")),
+            get_model_id('mistral'): (0.0, RuntimeError("503")),
+        })
+        with self.assertRaises(AllModelsFailedError):
+            generator.generate("prompt", ['llama3', 'mistral'])
+
+    def test_open_breaker_skips_model(self):
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=1, cooldown=60)
+        breaker.record_failure('llama3')
+        generator = self.make_generator({get_model_id('mistral'): (0.0, 'ok')}, breaker=breaker)
+        text, model_key = generator.generate("prompt", ['llama3', 'mistral'])
+        self.assertEqual(model_key, 'mistral')
+        self.assertEqual(self.calls, [get_model_id('mistral')])
+
+    def test_deadline_stops_waiting(self):
+        generator = self.make_generator({get_model_id('llama3'): (1.0, 'slow')}, hedge_delay=10)
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            generator.generate("prompt", ['llama3'], deadline=Deadline(0.1))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_own_deadline_is_not_held_against_the_model(self):
+        class TimingOutClient:
+            """Times out when the (deadline-capped) client timeout runs out"""
+
+            def __init__(self, timeout):
+                self.timeout = timeout
+
+            def text_generation(self, prompt, model=None, **kwargs):
+                time.sleep(self.timeout)
+                raise TimeoutError("read timed out")
+
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=1, cooldown=60)
+        limiter = AdaptiveLimit(initial=10)
+        generator = HedgedGenerator(TimingOutClient, default_hedge_delay=10, max_workers=2, breaker=breaker,
+                                    call_timeout=30, limiter=limiter)
+        with self.assertRaises((DeadlineExceeded, AllModelsFailedError)):
+            generator.generate("prompt", ['llama3'], deadline=Deadline(0.1))
+        generator.executor.shutdown(wait=True)
+        self.assertTrue(breaker.allow('llama3'))
+        self.assertEqual(breaker.snapshot().get('llama3', {}).get('calls', 0), 0)
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+        self.assertEqual(limiter.current(), 10)
+
+        # The same timeout without a request deadline counts against the model
+        generator = HedgedGenerator(lambda timeout: TimingOutClient(0.01), max_workers=2, breaker=breaker,
+                                    limiter=limiter)
+        with self.assertRaises(AllModelsFailedError):
+            generator.generate("prompt", ['llama3'])
+        self.assertFalse(breaker.allow('llama3'))
+        self.assertLess(limiter.current(), 10)
+
+    def test_hedge_delay_uses_observed_p90(self):
+        tracker = LatencyTracker(min_samples=5)
+        generator = HedgedGenerator(lambda timeout: None, latency_tracker=tracker, default_hedge_delay=30)
+        self.assertEqual(generator.hedge_delay('llama3'), 30)
+        for seconds in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]:
+            tracker.record('llama3', seconds)
+        self.assertEqual(generator.hedge_delay('llama3'), 10)
+
+    def test_stream_closed_once_output_complete(self):
+        stream = FakeStream(['前言 {"a": "x}', '", "b"', ': [1, 2]}', ' 之后还有', '很多内容'])
+        client = type('Client', (), {'text_generation': lambda self, prompt, **kwargs: stream})()
+        generator = HedgedGenerator(lambda timeout: client, default_hedge_delay=10, max_workers=2)
+        text, _ = generator.generate("prompt", ['llama3'], stop_detector=JSONCompletionDetector)
+        self.assertEqual(text, '前言 {"a": "x}", "b": [1, 2]}')
+        self.assertEqual(stream.read, 3)
+        self.assertTrue(stream.closed)
+
+    def test_outcomes_reach_the_limiter(self):
+        class RateLimited(Exception):
+            response = type('Response', (), {'status_code': 429})()
+
+        limiter = AdaptiveLimit(initial=10, backoff=0.5)
+        generator = self.make_generator({
+            get_model_id('llama3'): (0.0, RateLimited()),
+            get_model_id('mistral'): (0.0, 'ok'),
+        }, hedge_delay=10, limiter=limiter)
+        text, model_key = generator.generate("prompt", ['llama3', 'mistral'])
+        self.assertEqual(model_key, 'mistral')
+        snapshot = limiter.snapshot()
+        self.assertEqual(snapshot['limit'], 5)
+        self.assertEqual(snapshot['in_flight'], 0)
+        self.assertIsNotNone(snapshot['latency_per_token_long'])
+
+    def test_cancelled_hedge_is_not_judged(self):
+        limiter = AdaptiveLimit(initial=10)
+        generator = self.make_generator({
+            get_model_id('llama3'): (0.3, 'slow'),
+            get_model_id('mistral'): (0.0, 'fast'),
+        }, limiter=limiter)
+        generator.generate("prompt", ['llama3', 'mistral'])
+        time.sleep(0.4)
+        self.assertEqual(limiter.snapshot()['in_flight'], 0)
+        self.assertEqual(limiter.current(), 10)
+
+
+class TestModelChain(unittest.TestCase):
+    """Test cases for model chain configuration"""
+
+    def test_default_chain(self):
+        with patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(get_model_chain(), ['llama3', 'mistral', 'falcon'])
+
+    def test_preference_moves_to_front(self):
+        with patch.dict(os.environ, {'LLM_MODEL_PREFERENCE': 'falcon'}, clear=True):
+            self.assertEqual(get_model_chain(), ['falcon', 'llama3', 'mistral'])
+
+    def test_unknown_models_are_skipped(self):
+        with patch.dict(os.environ, {'LLM_MODEL_CHAIN': 'deepseek,mistral'}, clear=True):
+            self.assertEqual(get_model_chain(), ['mistral'])
+
+
+
+class TestAdminLLMEndpoint(unittest.TestCase):
+    """Test cases for GET /admin/llm"""
+
+    def setUp(self):
+        import app as app_module
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+        self.scheduler = LLMScheduler(max_concurrency=4)
+        self.limit = AdaptiveLimit(initial=4, on_change=self.scheduler.set_max_concurrency)
+
+    def test_requires_token(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/admin/llm').status_code, 403)
+
+    def test_reports_limit_and_queues(self):
+        engine = self.app_module.ai_engine
+        self.limit.failed(self.limit.begin(), TimeoutError())
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}), \
+                patch.object(engine, 'llm_limit', self.limit, create=True), \
+                patch.object(engine, 'llm_scheduler', self.scheduler, create=True), \
+                patch.object(engine, 'circuit_breaker', CircuitBreaker(), create=True):
+            response = self.client.get('/admin/llm', headers={'Authorization': 'Bearer secret'})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['limit']['limit'], 2)
+        self.assertEqual(data['scheduler']['max_concurrency'], 2)
+        self.assertEqual(data['queued'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for the priority scheduler in front of LLM calls
+"""
+
+import time
+import threading
+import unittest
+from llm_scheduler import LLMScheduler, INTERACTIVE, REGENERATION, BATCH
+from resilience import Deadline, DeadlineExceeded
+
+
+class TestLLMScheduler(unittest.TestCase):
+    """Test cases for priorities, fair sharing, quotas and the global cap"""
+
+    def queue_behind_blocker(self, scheduler, requests):
+        """Hold the only slot, queue the given (priority, tenant) requests, then release and record grant order"""
+        order = []
+        order_lock = threading.Lock()
+        release = threading.Event()
+
+        def blocker():
+            with scheduler.slot(BATCH):
+                release.wait()
+
+        def call(name, priority, tenant):
+            with scheduler.slot(priority, tenant):
+                with order_lock:
+                    order.append(name)
+
+        threads = [threading.Thread(target=blocker)]
+        threads[0].start()
+        while scheduler.in_flight == 0:
+            time.sleep(0.001)
+        for i, (priority, tenant) in enumerate(requests):
+            thread = threading.Thread(target=call, args=(f"{priority}{i}", priority, tenant))
+            thread.start()
+            threads.append(thread)
+            # Enqueue in a known order
+            while sum(scheduler.snapshot()['queued'].values()) < i + 1:
+                time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        return order
+
+    def test_interactive_jumps_ahead(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        order = self.queue_behind_blocker(scheduler, [(BATCH, None), (REGENERATION, None), (INTERACTIVE, None)])
+        self.assertEqual(order[0], 'interactive2')
+
+    def test_weighted_fair_share(self):
+        scheduler = LLMScheduler(max_concurrency=1, weights={REGENERATION: 3, BATCH: 1})
+        order = self.queue_behind_blocker(scheduler, [(BATCH, None)] * 4 + [(REGENERATION, None)] * 4)
+        # Regeneration gets three slots for each batch slot, but batch is not starved
+        self.assertEqual([name.rstrip('0123456789') for name in order[:4]].count('regeneration'), 3)
+
+    def test_tenant_quota(self):
+        scheduler = LLMScheduler(max_concurrency=2, tenant_quota=1)
+        release = threading.Event()
+
+        def hold():
+            with scheduler.slot(BATCH, tenant='school-a'):
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        while scheduler.in_flight == 0:
+            time.sleep(0.001)
+
+        # Same tenant must wait despite a free global slot; another tenant goes straight through
+        with self.assertRaises(DeadlineExceeded):
+            with scheduler.slot(INTERACTIVE, tenant='school-a', deadline=Deadline(0.05)):
+                pass
+        with scheduler.slot(INTERACTIVE, tenant='school-b', deadline=Deadline(0.05)):
+            self.assertEqual(scheduler.in_flight, 2)
+
+        release.set()
+        holder.join()
+        self.assertEqual(scheduler.snapshot()['queued'][INTERACTIVE], 0)
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_global_cap(self):
+        scheduler = LLMScheduler(max_concurrency=3)
+        peak = []
+        lock = threading.Lock()
+
+        def call():
+            with scheduler.slot(INTERACTIVE):
+                with lock:
+                    peak.append(scheduler.in_flight)
+                time.sleep(0.01)
+
+        threads = [threading.Thread(target=call) for _ in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 3)
+        self.assertEqual(scheduler.snapshot()['granted'][INTERACTIVE], 12)
+
+
+    def test_raising_cap_grants_waiters(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        release = threading.Event()
+        started = []
+
+        def call():
+            with scheduler.slot(INTERACTIVE):
+                started.append(1)
+                release.wait()
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while sum(scheduler.snapshot()['queued'].values()) < 2:
+            time.sleep(0.001)
+        scheduler.set_max_concurrency(3)
+        self.assertEqual(scheduler.in_flight, 3)
+        release.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(len(started), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test script for the dynamic batching local inference scheduler
+"""
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from local_inference import BatchingGenerator
+from json_stream import JSONCompletionDetector
+
+
+class FakeTokenizer:
+    """Character-level tokenizer: token id = code point, 0 is padding"""
+
+    def __init__(self):
+        self.padding_side = 'right'
+        self.pad_token = None
+        self.eos_token = '\0'
+        self.pad_token_id = 0
+
+    def __call__(self, prompts, return_tensors='pt', padding=True, add_special_tokens=True):
+        width = max(len(p) for p in prompts)
+        rows = [[0] * (width - len(p)) + [ord(c) for c in p] for p in prompts]
+        mask = [[0] * (width - len(p)) + [1] * len(p) for p in prompts]
+        return {'input_ids': torch.tensor(rows), 'attention_mask': torch.tensor(mask)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return ''.join(chr(i) for i in ids.tolist() if i != 0)
+
+
+class FakeModel:
+    """Continues each prompt with its own last character repeated"""
+
+    device = torch.device('cpu')
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, **kwargs):
+        self.batch_sizes.append(input_ids.shape[0])
+        continuation = input_ids[:, -1:].repeat(1, max_new_tokens)
+        return torch.cat([input_ids, continuation], dim=1)
+
+
+class FakeCache:
+    """Stands in for a KV cache: remembers the prefix it was computed for and its batch size"""
+
+    def __init__(self, input_ids):
+        self.input_ids = input_ids
+        self.batch_size = 1
+
+    def batch_repeat_interleave(self, repeats):
+        self.batch_size *= repeats
+
+
+class FakePrefixModel(FakeModel):
+    """FakeModel that also records prefix forward passes and the caches handed to generate()"""
+
+    def __init__(self):
+        super().__init__()
+        self.prefills = []
+        self.caches = []
+
+    def __call__(self, input_ids, use_cache=True):
+        self.prefills.append(input_ids.shape[1])
+        return type('Output', (), {'past_key_values': FakeCache(input_ids)})()
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, past_key_values=None, **kwargs):
+        self.caches.append(past_key_values)
+        return super().generate(input_ids, attention_mask, max_new_tokens, **kwargs)
+
+
+class TestBatchingGenerator(unittest.TestCase):
+    """Test cases for batch collection and per-request output routing"""
+
+    def test_concurrent_prompts_share_a_batch(self):
+        model = FakeModel()
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=8, max_wait=0.5)
+        prompts = ['ab', 'xyz', 'q', 'hello']
+        with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+            results = list(pool.map(lambda p: generator.generate(p, max_new_tokens=3), prompts))
+
+        self.assertEqual(results, ['bbb', 'zzz', 'qqq', 'ooo'])
+        self.assertEqual(model.batch_sizes, [4])
+        self.assertEqual(generator.tokenizer.padding_side, 'left')
+
+    def test_outputs_trimmed_to_each_budget(self):
+        model = FakeModel()
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=2, max_wait=0.5)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            short = pool.submit(generator.generate, 'ab', 2)
+            long = pool.submit(generator.generate, 'cd', 5)
+        self.assertEqual(short.result(), 'bb')
+        self.assertEqual(long.result(), 'ddddd')
+
+    def test_max_batch_size(self):
+        model = FakeModel()
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=2, max_wait=0.2)
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            list(pool.map(lambda p: generator.generate(p, max_new_tokens=1), 'abcde'))
+        self.assertTrue(all(size <= 2 for size in model.batch_sizes))
+        self.assertEqual(sum(model.batch_sizes), 5)
+
+    def test_errors_reach_every_caller(self):
+        model = FakeModel()
+        model.generate = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("out of memory"))
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=4, max_wait=0.01)
+        with self.assertRaises(RuntimeError):
+            generator.generate('ab', max_new_tokens=2)
+
+
+class FakeStepModel(FakeModel):
+    """Writes a scripted continuation per prompt one token at a time, honouring stopping criteria"""
+
+    def __init__(self, continuations):
+        super().__init__()
+        self.continuations = continuations
+        self.steps = 0
+
+    def generate(self, input_ids, attention_mask, max_new_tokens, stopping_criteria=None, **kwargs):
+        prompts = [''.join(chr(i) for i in row.tolist() if i) for row in input_ids]
+        finished = torch.zeros(len(prompts), dtype=torch.bool)
+        for step in range(max_new_tokens):
+            tokens = torch.tensor([[0 if done else ord(self.continuations[p][step])]
+                                   for p, done in zip(prompts, finished.tolist())])
+            input_ids = torch.cat([input_ids, tokens], dim=1)
+            self.steps += 1
+            if stopping_criteria is not None:
+                finished |= stopping_criteria[0](input_ids, None)
+                if finished.all():
+                    break
+        return input_ids
+
+
+class TestStopDetector(unittest.TestCase):
+    """Test cases for stopping generation once the JSON output is complete"""
+
+    def test_rows_stop_independently(self):
+        model = FakeStepModel({'a': '{"x": "}"} 后面的废话' + '。' * 40, 'b': '{"y": [1]}' + '！' * 40})
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=2, max_wait=0.3)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            a = pool.submit(generator.generate, 'a', 50, None, None, JSONCompletionDetector)
+            b = pool.submit(generator.generate, 'b', 50, None, None, JSONCompletionDetector)
+        self.assertEqual(a.result(), '{"x": "}"}')
+        self.assertEqual(b.result(), '{"y": [1]}')
+        self.assertEqual(model.steps, len('{"x": "}"}'))
+
+    def test_without_detector_runs_to_budget(self):
+        model = FakeStepModel({'a': '{"x": 1}' + '。' * 10})
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=1, max_wait=0.01)
+        self.assertEqual(generator.generate('a', max_new_tokens=12), '{"x": 1}' + '。' * 4)
+
+
+class TestPrefixCache(unittest.TestCase):
+    """Test cases for reusing the KV cache of a shared prompt prefix"""
+
+    def test_prefix_prefilled_once(self):
+        model = FakePrefixModel()
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=8, max_wait=0.3)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(lambda p: generator.generate(p, max_new_tokens=2, prefix='指令'), ['ab', 'xyz', 'q']))
+        self.assertEqual(generator.generate('mn', max_new_tokens=2, prefix='指令'), 'nn')
+
+        self.assertEqual(results, ['bb', 'zz', 'qq'])
+        self.assertEqual(model.prefills, [2])
+        self.assertEqual([cache.batch_size for cache in model.caches], [3, 1])
+        self.assertIsNot(model.caches[0], model.caches[1])
+        self.assertEqual(generator.prefix_hits, 1)
+        self.assertEqual(generator.prefix_tokens_reused, 4 * 2)
+
+    def test_prefixes_batched_separately(self):
+        model = FakePrefixModel()
+        generator = BatchingGenerator(model, FakeTokenizer(), max_batch_size=8, max_wait=0.3, prefix_cache_size=1)
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            a = pool.submit(generator.generate, 'ab', 1, None, 'p1')
+            b = pool.submit(generator.generate, 'cd', 1, None, 'p2')
+            c = pool.submit(generator.generate, 'ef', 1)
+        self.assertEqual((a.result(), b.result(), c.result()), ('b', 'd', 'f'))
+        self.assertEqual(sorted(model.batch_sizes), [1, 1, 1])
+        self.assertEqual(len(generator._prefix_caches), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
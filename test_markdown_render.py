@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side Markdown rendering of report sections
+"""
+
+import json
+import unittest
+from unittest.mock import patch
+import app as app_module
+from app import app
+from markdown_render import render_markdown, render_report_sections
+
+
+class TestMarkdownRender(unittest.TestCase):
+    """Test cases for the Markdown renderer and the per-report HTML cache"""
+
+    def test_headings_and_inline(self):
+        html = render_markdown("### **软件工程师**\n\n这是*重点*内容")
+        self.assertIn('<h3><strong>软件工程师</strong></h3>', html)
+        self.assertIn('<p>这是<em>重点</em>内容</p>', html)
+
+    def test_nested_lists(self):
+        html = render_markdown("1. **技能**：说明\n   - 第一点\n   - 第二点\n\n2. 下一项")
+        self.assertEqual(html.count('<ol>'), 1)
+        self.assertEqual(html.count('<ul>'), 1)
+        self.assertEqual(html.count('<li>'), 4)
+        self.assertLess(html.index('<ul>'), html.index('下一项'))
+
+    def test_numbered_list_keeps_start(self):
+        html = render_markdown("段落\n\n3. 第三项")
+        self.assertIn('<ol start="3">', html)
+
+    def test_html_is_escaped(self):
+        html = render_markdown('- <script>alert(1)</script> **<b>粗体</b>**\n\n<img src=x onerror="x()">')
+        self.assertNotIn('<script>', html)
+        self.assertNotIn('<img', html)
+        self.assertIn('&lt;script&gt;', html)
+        self.assertIn('<strong>&lt;b&gt;粗体&lt;/b&gt;</strong>', html)
+
+    def test_report_sections_rendered_once(self):
+        with open('test_report.json', 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        report['academic_analysis'] = "**学术分析**\n\n- 数学突出"
+        report_id = app_module.report_store.create({"p2": "高二"}, report)
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['report_id'] = report_id
+
+        with patch.object(app_module, 'render_report_sections', wraps=render_report_sections) as render:
+            first = client.get('/report')
+            second = client.get('/report')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        page = first.get_data(as_text=True)
+        self.assertIn('<p><strong>学术分析</strong></p>', page)
+        self.assertNotIn('**学术分析**', page)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for RSS sampling, memory-based worker recycling and /admin/memory
+"""
+
+import os
+import threading
+import tracemalloc
+import unittest
+from unittest.mock import patch
+from app import app
+from admission import AdmissionController, Overloaded
+from memory_watchdog import MemoryWatchdog, rss_bytes
+
+
+class TestMemoryWatchdog(unittest.TestCase):
+    """Test cases for sampling, draining and recycling"""
+
+    def test_samples_rss(self):
+        self.assertGreater(rss_bytes(), 0)
+        watchdog = MemoryWatchdog(limit_bytes=0)
+        watchdog.sample()
+        snapshot = watchdog.snapshot()
+        self.assertGreater(snapshot['rss_mb'], 0)
+        self.assertEqual(snapshot['peak_mb'], snapshot['rss_mb'])
+        self.assertEqual(len(snapshot['samples']), 1)
+        self.assertFalse(snapshot['recycling'])
+
+    def start_then_grow(self, watchdog, recycle):
+        """Start below the limit, then cross it as if the worker had grown"""
+        watchdog.limit_bytes = 1 << 50
+        watchdog.start(recycle=recycle)
+        watchdog.limit_bytes = 1
+
+    def test_recycles_after_draining(self):
+        admission = AdmissionController()
+        recycled = threading.Event()
+        in_flight = iter([2, 1, 0])
+        watchdog = MemoryWatchdog(interval=0.01, drain=admission.drain, in_flight=lambda: next(in_flight, 0))
+        self.start_then_grow(watchdog, recycled.set)
+        self.assertTrue(recycled.wait(5))
+        self.assertTrue(watchdog.recycling)
+        self.assertTrue(admission.snapshot()['draining'])
+        with self.assertRaises(Overloaded):
+            with admission.admit():
+                pass
+
+    def test_recycles_when_drain_times_out(self):
+        recycled = threading.Event()
+        watchdog = MemoryWatchdog(interval=0.01, drain_timeout=0.1, in_flight=lambda: 1)
+        self.start_then_grow(watchdog, recycled.set)
+        self.assertTrue(recycled.wait(5))
+
+    def test_fresh_worker_over_limit_is_not_recycled(self):
+        recycled = threading.Event()
+        watchdog = MemoryWatchdog(limit_bytes=1, interval=0.01)
+        watchdog.start(recycle=recycled.set)
+        self.assertFalse(recycled.wait(0.1))
+        self.assertEqual(watchdog.limit_bytes, 0)
+
+    def test_stays_below_limit(self):
+        recycled = threading.Event()
+        watchdog = MemoryWatchdog(limit_bytes=1 << 50, interval=0.05)
+        watchdog.start(recycle=recycled.set)
+        self.assertFalse(recycled.wait(0.1))
+        self.assertTrue(watchdog.snapshot()['watching'])
+
+    def test_top_allocations(self):
+        watchdog = MemoryWatchdog(limit_bytes=0)
+        self.assertIsNone(watchdog.top_allocations())
+        tracemalloc.start()
+        try:
+            watchdog.top_allocations()
+            held = [bytearray(1024) for _ in range(2000)]
+            growth = watchdog.top_allocations(5, compare=True)
+            self.assertLessEqual(len(growth), 5)
+            self.assertIn(__file__, growth[0]['site'])
+            self.assertGreater(growth[0]['size_diff_kb'], 1000)
+            del held
+        finally:
+            tracemalloc.stop()
+
+
+class TestAdminMemoryEndpoint(unittest.TestCase):
+    """Test cases for GET /admin/memory"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_requires_token(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/admin/memory').status_code, 403)
+
+    def test_reports_memory(self):
+        with patch.dict(os.environ, {'EXPORT_TOKEN': 'secret'}):
+            response = self.client.get('/admin/memory?top=5', headers={'Authorization': 'Bearer secret'})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['memory']['pid'], os.getpid())
+        self.assertGreater(data['memory']['rss_mb'], 0)
+        self.assertIsNone(data['top_allocations'])
+
+
+if __name__ == '__main__':
+    unittest.main()
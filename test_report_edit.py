@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for re-generating only the report sections affected by edited answers
+"""
+
+import unittest
+from unittest.mock import patch
+import app as app_module
+from app import app
+from ai_engine import REPORT_SECTIONS, SECTION_DEPENDENCIES, invalidated_sections
+
+SAMPLE_RESPONSES = {
+    "p2": "高二",
+    "a1": "数学和计算机科学",
+    "a2": "视觉学习者",
+    "a3": "有时候难以长时间集中注意力",
+    "a4": "数学、物理",
+    "a5": "历史、政治",
+    "c1": "软件工程师",
+    "c2": "科技、人工智能",
+    "c3": "计算机科学",
+    "ps1": "策划者",
+    "ps2": "视情况而定",
+    "ps3": "把大问题分解成小问题来解决",
+    "ps4": "较高",
+    "e1": "机器人俱乐部",
+    "e2": "机器人俱乐部",
+    "e3": "编程",
+    "d1": "沟通技巧",
+    "d2": "逻辑思维",
+    "d3": "时间管理",
+    "d4": "有一定了解",
+    "i1": "较好",
+    "i4": "美国",
+}
+
+
+class TestSectionDependencies(unittest.TestCase):
+    """Test cases for the question-to-section dependency map"""
+
+    def test_map_names_only_report_sections(self):
+        for question_id, sections in SECTION_DEPENDENCIES.items():
+            self.assertTrue(set(sections) <= set(REPORT_SECTIONS), question_id)
+
+    def test_every_section_depends_on_some_answer(self):
+        covered = {field for sections in SECTION_DEPENDENCIES.values() for field in sections}
+        self.assertEqual(covered, set(REPORT_SECTIONS))
+
+    def test_invalidated_sections(self):
+        edited = dict(SAMPLE_RESPONSES, ps2="独立工作")
+        self.assertEqual(invalidated_sections(SAMPLE_RESPONSES, edited), ["personality_insights"])
+
+        edited = dict(SAMPLE_RESPONSES, ps1="领导者", d4="非常了解")
+        self.assertEqual(invalidated_sections(SAMPLE_RESPONSES, edited),
+                         ["summary", "personality_insights", "career_guidance",
+                          "extracurricular_recommendations", "development_plan", "ai_era_skills"])
+
+    def test_unread_or_unchanged_answers_invalidate_nothing(self):
+        self.assertEqual(invalidated_sections(SAMPLE_RESPONSES, dict(SAMPLE_RESPONSES)), [])
+        self.assertEqual(invalidated_sections(SAMPLE_RESPONSES, dict(SAMPLE_RESPONSES, ps5="从中学习")), [])
+
+
+class TestRegenerateSections(unittest.TestCase):
+    """Test cases for AIEngine.regenerate_sections()"""
+
+    def setUp(self):
+        self.engine = app_module.ai_engine
+        self.report = {field: f"旧的{field}" for field in REPORT_SECTIONS}
+
+    def test_only_requested_sections_change(self):
+        edited = dict(SAMPLE_RESPONSES, ps2="独立工作")
+        with patch.object(self.engine, 'use_hf', False):
+            updated = self.engine.regenerate_sections(self.report, edited, ["personality_insights"])
+        self.assertIn("独立工作", updated["personality_insights"])
+        for field in REPORT_SECTIONS:
+            if field != "personality_insights":
+                self.assertEqual(updated[field], self.report[field])
+
+    def test_missing_sections_are_filled(self):
+        partial = {"summary": "无法生成完整的个性化报告。", "error": "timeout"}
+        with patch.object(self.engine, 'use_hf', False):
+            updated = self.engine.regenerate_sections(partial, SAMPLE_RESPONSES, [])
+        self.assertEqual(set(updated), set(REPORT_SECTIONS))
+        self.assertEqual(updated["summary"], partial["summary"])
+
+
+class TestEditEndpoint(unittest.TestCase):
+    """Test cases for POST /report/edit"""
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.report = {field: f"旧的{field}" for field in REPORT_SECTIONS}
+        self.report_id = app_module.report_store.create(SAMPLE_RESPONSES, self.report)
+        with self.client.session_transaction() as sess:
+            sess['report_id'] = self.report_id
+
+    def test_edit_regenerates_affected_sections(self):
+        # Render the original once so its HTML is cached
+        self.assertEqual(self.client.get('/report').status_code, 200)
+
+        with patch.object(app_module.ai_engine, 'regenerate_sections',
+                          side_effect=lambda report, responses, sections, *a, **kw:
+                          dict(report, **{field: "新内容" for field in sections})) as regenerate:
+            response = self.client.post('/report/edit', json={"e3": "绘画"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['regenerated'], ["extracurricular_recommendations"])
+        self.assertEqual(regenerate.call_args[0][1]["e3"], "绘画")
+
+        with self.client.session_transaction() as sess:
+            new_id = sess['report_id']
+        self.assertNotEqual(new_id, self.report_id)
+        stored = app_module.report_store.get(new_id)
+        self.assertEqual(stored['responses']['e3'], "绘画")
+        self.assertEqual(stored['report']['extracurricular_recommendations'], "新内容")
+        self.assertEqual(stored['report']['summary'], self.report['summary'])
+        self.assertIn("新内容", stored['html']['extracurricular_recommendations'])
+        self.assertEqual(stored['html']['summary'], app_module.report_store.get(self.report_id)['html']['summary'])
+
+    def test_edit_without_affected_sections_skips_generation(self):
+        with patch.object(app_module.ai_engine, 'regenerate_sections') as regenerate:
+            response = self.client.post('/report/edit', json={"ps5": "从中学习"})
+        self.assertEqual(response.get_json()['regenerated'], [])
+        regenerate.assert_not_called()
+
+    def test_edit_rejects_non_object_body(self):
+        for kwargs in ({'json': []}, {'json': "x"}, {'data': "e3=绘画"}):
+            self.assertEqual(self.client.post('/report/edit', **kwargs).status_code, 400, kwargs)
+
+    def test_edit_without_report(self):
+        with self.client.session_transaction() as sess:
+            sess.clear()
+        self.assertEqual(self.client.post('/report/edit', json={"a4": "化学"}).status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
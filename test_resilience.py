@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Test script for the circuit breaker and request deadlines
+"""
+
+import time
+import unittest
+from resilience import CircuitBreaker, Deadline, DeadlineExceeded, AdaptiveLimit, is_overload_error
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the per-model circuit breaker"""
+
+    def make_breaker(self, **kwargs):
+        options = dict(failure_rate=0.5, min_calls=4, window=10, cooldown=0.1, slow_call_seconds=5)
+        options.update(kwargs)
+        return CircuitBreaker(**options)
+
+    def test_opens_on_failure_rate(self):
+        breaker = self.make_breaker()
+        breaker.record_success('llama3', 1.0)
+        breaker.record_success('llama3', 1.0)
+        breaker.record_failure('llama3')
+        self.assertTrue(breaker.allow('llama3'))
+        breaker.record_failure('llama3')
+        self.assertTrue(breaker.is_open('llama3'))
+        self.assertFalse(breaker.allow('llama3'))
+        self.assertTrue(breaker.allow('mistral'))
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record_success('llama3', 10.0)
+        self.assertTrue(breaker.is_open('llama3'))
+
+    def test_half_open_probe(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record_failure('llama3')
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow('llama3'))
+        # Only one probe is let through while half-open
+        self.assertFalse(breaker.allow('llama3'))
+        breaker.record_success('llama3', 1.0)
+        self.assertFalse(breaker.is_open('llama3'))
+        self.assertTrue(breaker.allow('llama3'))
+
+    def test_failed_probe_reopens(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record_failure('llama3')
+        time.sleep(0.15)
+        self.assertTrue(breaker.allow('llama3'))
+        breaker.record_failure('llama3')
+        self.assertTrue(breaker.all_open(['llama3']))
+
+
+class TestDeadline(unittest.TestCase):
+    """Test cases for request deadlines"""
+
+    def test_cap_and_expiry(self):
+        deadline = Deadline(0.05)
+        self.assertLessEqual(deadline.cap(10), 0.05)
+        self.assertEqual(deadline.cap(0.01), 0.01)
+        time.sleep(0.06)
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"{status_code} error")
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+class Timeout(OSError):
+    """Named like requests.exceptions.Timeout"""
+
+
+class TestAdaptiveLimit(unittest.TestCase):
+    """Test cases for the AIMD limit on concurrent LLM calls"""
+
+    def run_calls(self, limit, concurrent, seconds=1.0, tokens=100):
+        """Start concurrent calls together, then finish them all successfully"""
+        epochs = [limit.begin() for _ in range(concurrent)]
+        for epoch in epochs:
+            limit.succeeded(epoch, seconds, tokens)
+
+    def test_grows_additively_while_utilized(self):
+        changes = []
+        limit = AdaptiveLimit(initial=4, max_limit=8, on_change=changes.append)
+        for _ in range(6):
+            self.run_calls(limit, limit.current())
+        self.assertEqual(limit.current(), 6)
+        self.assertEqual(changes, [5, 6])
+        for _ in range(20):
+            self.run_calls(limit, 8)
+        self.assertEqual(limit.current(), 8)
+
+    def test_does_not_grow_while_idle(self):
+        limit = AdaptiveLimit(initial=8)
+        for _ in range(50):
+            self.run_calls(limit, 1)
+        self.assertEqual(limit.current(), 8)
+
+    def test_overload_cuts_once_per_burst(self):
+        limit = AdaptiveLimit(initial=10, backoff=0.5)
+        epochs = [limit.begin() for _ in range(5)]
+        for epoch in epochs:
+            limit.failed(epoch, HTTPError(429))
+        self.assertEqual(limit.current(), 5)
+        limit.failed(limit.begin(), Timeout())
+        self.assertEqual(limit.current(), 2)
+        self.assertEqual(limit.snapshot()['decreases'], {'overload': 2, 'latency': 0})
+        self.assertEqual(limit.snapshot()['in_flight'], 0)
+
+    def test_other_failures_keep_the_limit(self):
+        limit = AdaptiveLimit(initial=10)
+        limit.failed(limit.begin(), HTTPError(400))
+        limit.failed(limit.begin(), DeadlineExceeded("deadline"))
+        limit.abandoned(limit.begin())
+        self.assertEqual(limit.current(), 10)
+
+    def test_rising_latency_cuts(self):
+        limit = AdaptiveLimit(initial=10, backoff=0.5, tolerance=2)
+        for _ in range(20):
+            limit.succeeded(limit.begin(), 1.0, 100)
+        limit.succeeded(limit.begin(), 5.0, 100)
+        self.assertEqual(limit.current(), 10)
+        limit.succeeded(limit.begin(), 10.0, 100)
+        self.assertEqual(limit.current(), 5)
+        self.assertEqual(limit.snapshot()['decreases']['latency'], 1)
+
+    def test_bounds(self):
+        limit = AdaptiveLimit(initial=2, min_limit=1, backoff=0.1)
+        limit.failed(limit.begin(), HTTPError(503))
+        self.assertEqual(limit.current(), 1)
+
+    def test_overload_errors(self):
+        self.assertTrue(is_overload_error(HTTPError(429)))
+        self.assertTrue(is_overload_error(TimeoutError()))
+        self.assertTrue(is_overload_error(type('ReadTimeout', (Timeout,), {})()))
+        self.assertFalse(is_overload_error(HTTPError(404)))
+        self.assertFalse(is_overload_error(DeadlineExceeded("deadline")))
+
+
+if __name__ == "__main__":
+    unittest.main()
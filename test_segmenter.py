@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test script for the dictionary-trie segmenter
+"""
+
+import unittest
+from segmenter import Segmenter
+
+
+class TestSegmenter(unittest.TestCase):
+    """Test cases for maximum matching, keyword order and memoization"""
+
+    def setUp(self):
+        self.segmenter = Segmenter(["数学", "编程", "软件", "软件工程师", "工程", "人工智能", "时间"])
+
+    def test_splits_sentence_without_separators(self):
+        self.assertEqual(self.segmenter.segment("我喜欢数学和编程"),
+                         (("我喜欢", False), ("数学", True), ("编程", True)))
+
+    def test_longest_match_wins(self):
+        tokens = self.segmenter.segment("想当软件工程师")
+        self.assertIn(("软件工程师", True), tokens)
+        self.assertNotIn(("软件", True), tokens)
+
+    def test_keywords_include_inner_words(self):
+        self.assertEqual(self.segmenter.keywords("软件工程师、人工智能"),
+                         ("软件工程师", "软件", "工程", "人工智能"))
+
+    def test_keywords_keep_other_spans_last(self):
+        self.assertEqual(self.segmenter.keywords("长时间集中注意力"), ("时间", "集中注意力"))
+
+    def test_results_are_memoized(self):
+        self.segmenter.keywords("我喜欢数学和编程")
+        self.segmenter.keywords("我喜欢数学和编程")
+        self.assertEqual(self.segmenter.keywords.cache_info().hits, 1)
+
+    def test_empty_dictionary(self):
+        segmenter = Segmenter([])
+        self.assertEqual(segmenter.keywords("数学、物理"), ("数学", "物理"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for speculative report precomputation during the assessment
+"""
+
+import time
+import threading
+import unittest
+from concurrent.futures import wait
+from unittest.mock import patch
+import app as app_module
+from app import app
+from ai_engine import REPORT_SECTIONS
+from speculation import Speculator
+
+
+class FakeEngine:
+    """Generates each section as the answers it was given, optionally holding until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.keyword_calls = []
+
+    def generate_section(self, responses, field, deadline=None, priority=None, tenant=None):
+        self.calls.append((field, dict(responses)))
+        self.release.wait(5)
+        return f"{field}:{responses.get('ps2')}"
+
+    def precompute_keywords(self, responses):
+        self.keyword_calls.append(responses)
+
+
+class TestSpeculator(unittest.TestCase):
+    """Test cases for Speculator.update() and take()"""
+
+    def setUp(self):
+        self.engine = FakeEngine()
+        self.speculator = Speculator(self.engine, max_workers=2)
+
+    def finish_speculation(self):
+        """Wait for the sections started so far, as if the student took a while to submit"""
+        for draft in list(self.speculator._drafts.values()):
+            wait([future for _, future in draft.sections.values()], timeout=5)
+
+    def test_starts_sections_once_their_inputs_are_answered(self):
+        draft_id, generating = self.speculator.update(None, {"ps1": ["策划者"], "ps2": "团队合作", "ps3": "冷静"})
+        self.assertEqual(generating, [])
+
+        _, generating = self.speculator.update(draft_id, {"ps4": "较高"})
+        self.assertEqual(generating, ["personality_insights"])
+
+        self.finish_speculation()
+        ready = self.speculator.take(draft_id, {"ps1": ["策划者"], "ps2": "团队合作", "ps3": "冷静", "ps4": "较高"})
+        self.assertEqual(ready, {"personality_insights": "personality_insights:团队合作"})
+        self.assertEqual(self.speculator.snapshot()['reused'], 1)
+
+    def test_changed_answer_discards_stale_work(self):
+        answers = {"ps1": ["策划者"], "ps2": "团队合作", "ps3": "冷静", "ps4": "较高"}
+        draft_id, _ = self.speculator.update(None, answers)
+        self.speculator.update(draft_id, {"ps2": "独立工作"})
+        self.assertEqual(self.speculator.snapshot()['discarded'], 1)
+
+        self.finish_speculation()
+        ready = self.speculator.take(draft_id, dict(answers, ps2="独立工作"))
+        self.assertEqual(ready, {"personality_insights": "personality_insights:独立工作"})
+
+        # Edited again after the last draft update: nothing matches any more
+        draft_id, _ = self.speculator.update(None, answers)
+        self.assertEqual(self.speculator.take(draft_id, dict(answers, ps3="焦虑")), {})
+
+    def test_unfinished_sections_are_not_waited_for(self):
+        self.engine.release.clear()
+        answers = {"ps1": ["策划者"], "ps2": "团队合作", "ps3": "冷静", "ps4": "较高"}
+        draft_id, _ = self.speculator.update(None, answers)
+        while not self.engine.calls:
+            time.sleep(0.001)
+        start = time.monotonic()
+        self.assertEqual(self.speculator.take(draft_id, answers), {})
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.speculator.snapshot()['discarded'], 1)
+        self.engine.release.set()
+
+    def test_unrelated_answers_do_not_restart_sections(self):
+        draft_id, _ = self.speculator.update(None, {"ps1": [], "ps2": "团队合作", "ps3": "冷静", "ps4": "较高"})
+        self.speculator.update(draft_id, {"e1": "篮球", "ps4": "较高"})
+        self.assertEqual(self.speculator.snapshot()['started'], 1)
+
+    def test_unknown_draft(self):
+        self.assertEqual(self.speculator.take("missing", {}), {})
+
+    def test_old_drafts_evicted(self):
+        speculator = Speculator(self.engine, max_workers=1, max_drafts=2)
+        first, _ = speculator.update(None, {"p1": "16-17岁"})
+        speculator.update(None, {"p1": "16-17岁"})
+        speculator.update(None, {"p1": "16-17岁"})
+        self.assertEqual(speculator.snapshot()['drafts'], 2)
+        self.assertEqual(speculator.take(first, {"p1": "16-17岁"}), {})
+
+
+class TestDraftEndpoint(unittest.TestCase):
+    """Test cases for POST /draft and its use by /submit"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_draft_issues_id(self):
+        response = self.client.post('/draft', json={"answers": {"p1": "16-17岁", "p2": "高二"}})
+        data = response.get_json()
+        self.assertTrue(data['success'])
+        self.assertTrue(data['draft_id'])
+
+        again = self.client.post('/draft', json={"draft_id": data['draft_id'], "answers": {"a3": "注意力"}})
+        self.assertEqual(again.get_json()['draft_id'], data['draft_id'])
+
+    def test_draft_rejects_non_object_body(self):
+        for kwargs in ({'json': []}, {'json': "x"}, {'data': "answers"}, {'json': {"draft_id": ["x"]}}):
+            self.assertEqual(self.client.post('/draft', **kwargs).status_code, 400, kwargs)
+
+    def test_submit_reuses_speculative_sections(self):
+        ready = {"personality_insights": "提前生成的性格洞察"}
+        with patch.object(app_module.speculator, 'take', return_value=ready) as take, \
+                patch.object(app_module.ai_engine, 'use_hf', False):
+            response = self.client.post('/submit', json={"draft_id": "abc", "p2": "高二", "ps2": "独立工作"})
+        self.assertTrue(response.get_json()['success'])
+        # Without the LLM the other sections come from the template, and the tier says so
+        self.assertNotEqual(response.get_json()['tier'], 'llm')
+        self.assertEqual(take.call_args[0][0], "abc")
+        self.assertNotIn('draft_id', take.call_args[0][1])
+
+        with self.client.session_transaction() as sess:
+            stored = app_module.report_store.get(sess['report_id'])
+        self.assertEqual(stored['report']['personality_insights'], "提前生成的性格洞察")
+        self.assertEqual(set(REPORT_SECTIONS) - set(stored['report']), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the queue-based structured logging pipeline
+"""
+
+import io
+import sys
+import json
+import queue
+import logging
+import unittest
+from logging.handlers import QueueListener
+from structured_logging import JSONFormatter, SamplingFilter, LazyQueueHandler, parse_sampling
+
+
+def make_record(name, level, msg, args=(), exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+class TestJSONFormatter(unittest.TestCase):
+    """Test cases for JSON log lines"""
+
+    def test_fields(self):
+        entry = json.loads(JSONFormatter().format(make_record('ai_engine', logging.INFO, "Report generated by %s",
+                                                              ("通义千问",))))
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'ai_engine')
+        self.assertEqual(entry['message'], "Report generated by 通义千问")
+        self.assertNotIn('exc_info', entry)
+
+    def test_traceback(self):
+        try:
+            raise KeyError('positive')
+        except KeyError as e:
+            record = make_record('app', logging.ERROR, "Error generating report: %s", (e,), sys.exc_info())
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertIn("KeyError: 'positive'", entry['exc_info'])
+
+
+class TestSamplingFilter(unittest.TestCase):
+    """Test cases for per-logger sampling"""
+
+    def test_parse(self):
+        self.assertEqual(parse_sampling('ai_engine=0.1, llm_client=2'), {'ai_engine': 0.1, 'llm_client': 1.0})
+        self.assertEqual(parse_sampling(None), {})
+
+    def test_rates(self):
+        sampler = SamplingFilter({'ai_engine': 0.0, 'llm_client': 1.0})
+        self.assertFalse(sampler.filter(make_record('ai_engine', logging.INFO, "x")))
+        self.assertFalse(sampler.filter(make_record('ai_engine.segmenter', logging.INFO, "x")))
+        self.assertTrue(sampler.filter(make_record('ai_engine', logging.WARNING, "x")))
+        self.assertTrue(sampler.filter(make_record('ai_engine_other', logging.INFO, "x")))
+
+        record = make_record('llm_client', logging.INFO, "x")
+        self.assertTrue(sampler.filter(record))
+        self.assertEqual(record.sample_rate, 1.0)
+
+
+class TestQueuePipeline(unittest.TestCase):
+    """Test cases for LazyQueueHandler feeding a QueueListener"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        target = logging.StreamHandler(self.stream)
+        target.setFormatter(JSONFormatter())
+        self.handler = LazyQueueHandler(queue.Queue(-1))
+        self.listener = QueueListener(self.handler.queue, target, respect_handler_level=True)
+        self.logger = logging.getLogger('test_structured_logging')
+        self.logger.propagate = False
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = True
+
+    def test_records_are_queued_unformatted(self):
+        self.logger.warning("Reusing %d speculatively generated sections", 3)
+        record = self.handler.queue.get_nowait()
+        self.assertEqual(record.args, (3,))
+        self.assertEqual(self.stream.getvalue(), '')
+
+    def test_listener_writes_json_lines(self):
+        self.listener.start()
+        self.logger.warning("Requesting report from %s", "model-a")
+        try:
+            raise ValueError("boom")
+        except ValueError as e:
+            self.logger.error("Server error: %s", e, exc_info=True)
+        self.listener.stop()
+
+        lines = [json.loads(line) for line in self.stream.getvalue().splitlines()]
+        self.assertEqual([line['message'] for line in lines], ["Requesting report from model-a", "Server error: boom"])
+        self.assertIn("ValueError: boom", lines[1]['exc_info'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for the question bank schema and normalized student profiles
+"""
+
+import unittest
+from unittest.mock import patch
+from werkzeug.datastructures import MultiDict
+import app as app_module
+from app import app
+from student_profile import ProfileSchema, StudentProfile, InvalidSubmission, MISSING
+
+QUESTIONS = {
+    "personal": [
+        {"id": "p2", "text": "你目前就读的年级是？", "type": "select", "options": ["高一", "高二", "高三"]}
+    ],
+    "academic": [
+        {"id": "a1", "text": "你目前最感兴趣的学科是什么？", "type": "text"},
+        {"id": "a2", "text": "你认为你的学习风格是什么？", "type": "multiselect",
+         "options": ["视觉学习者", "听觉学习者", "动手实践者"]}
+    ]
+}
+
+
+class TestProfileSchema(unittest.TestCase):
+    """Test cases for validation and normalization of submissions"""
+
+    def setUp(self):
+        self.schema = ProfileSchema(QUESTIONS, max_text_chars=10)
+
+    def test_normalizes_answers(self):
+        profile = self.schema.validate({"p2": " 高二 ", "a1": "数学", "a2": ["动手实践者", "视觉学习者", "视觉学习者"],
+                                        "school_id": "s1"})
+        self.assertEqual(profile.get("p2"), "高二")
+        self.assertEqual(profile.get("a2"), ("视觉学习者", "动手实践者"))
+        self.assertEqual(profile.text("a2"), "视觉学习者、动手实践者")
+        self.assertEqual(profile.school_id, "s1")
+        self.assertEqual(profile.answers(), {"p2": "高二", "a1": "数学", "a2": ["视觉学习者", "动手实践者"],
+                                             "school_id": "s1"})
+
+    def test_unanswered_questions_are_missing(self):
+        profile = self.schema.validate({"a1": "  ", "a2": []})
+        self.assertNotIn("a1", profile)
+        self.assertEqual(profile.text("a2"), MISSING)
+        self.assertEqual(profile.answers(), {})
+
+    def test_rejects_what_does_not_fit(self):
+        for data in ({"x1": "?"}, {"a1": "太长" * 6}, {"p2": "大一"}, {"a2": ["飞行者"]}, {"p2": ["高一", "高二"]},
+                     {"a1": {"nested": 1}}, {"school_id": "s" * 65}, ["a1"]):
+            with self.assertRaises(InvalidSubmission, msg=data):
+                self.schema.validate(data)
+
+    def test_normalize_keeps_stored_answers(self):
+        profile = self.schema.normalize({"a1": "太长" * 6, "x1": "旧字段", "p2": "大一"})
+        self.assertEqual(profile.get("a1"), "太长" * 5)
+        self.assertEqual(profile.get("x1"), "旧字段")
+        self.assertEqual(profile.get("p2"), "大一")
+        self.assertIs(self.schema.normalize(profile), profile)
+
+    def test_canonical_digest(self):
+        first = self.schema.validate({"a2": ["动手实践者", "视觉学习者"], "a1": "数学"})
+        second = self.schema.validate({"a1": " 数学", "a2": ["视觉学习者", "动手实践者"], "p2": ""})
+        self.assertEqual(first.digest, second.digest)
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second}), 1)
+        self.assertNotEqual(first, self.schema.validate({"a1": "数学", "a2": ["视觉学习者", "动手实践者"],
+                                                         "school_id": "s1"}))
+
+    def test_profile_is_immutable(self):
+        profile = StudentProfile({"a1": "数学"})
+        with self.assertRaises(AttributeError):
+            profile.school_id = "s1"
+        with self.assertRaises(AttributeError):
+            profile.extra = 1
+        with self.assertRaises(TypeError):
+            profile._answers["a1"] = "物理"
+
+    def test_validate_form(self):
+        form = MultiDict([("p2", "高一"), ("a2", "听觉学习者"), ("a2", "视觉学习者")])
+        self.assertEqual(self.schema.validate_form(form).get("a2"), ("视觉学习者", "听觉学习者"))
+
+
+class TestSubmitValidation(unittest.TestCase):
+    """Test cases for rejecting and normalizing submissions at /submit and /draft"""
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_submit_rejects_unknown_field(self):
+        with patch.object(app_module.ai_engine, 'generate_routed_report') as generate:
+            response = self.client.post('/submit', json={"p2": "高二", "password": "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.get_json()['error'])
+        generate.assert_not_called()
+
+    def test_submit_passes_profile_to_generators(self):
+        with patch.object(app_module.ai_engine, 'generate_routed_report',
+                          return_value=({"summary": "报告"}, "basic")) as generate:
+            response = self.client.post('/submit', json={"p2": "高二", "ps1": ["创新者", "领导者"]})
+        self.assertEqual(response.status_code, 200)
+        profile = generate.call_args[0][0]
+        self.assertIsInstance(profile, StudentProfile)
+        self.assertEqual(profile.text("ps1"), "领导者、创新者")
+        with self.client.session_transaction() as session:
+            stored = app_module.report_store.get(session['report_id'])
+        self.assertEqual(stored['responses']['ps1'], ["领导者", "创新者"])
+
+    def test_draft_rejects_oversized_answer(self):
+        response = self.client.post('/draft', json={"answers": {"a1": "数" * 100000}})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestGeneratorsReadProfile(unittest.TestCase):
+    """Test cases for the report generators reading normalized answers"""
+
+    def test_multiselect_answers_read_as_text(self):
+        report = app_module.ai_engine._generate_basic_report({"p2": "高二", "ps1": ["领导者", "策划者"]})
+        self.assertIn("领导者、策划者", report["personality_insights"])
+        self.assertNotIn("['", report["personality_insights"])
+
+    def test_template_report_fills_every_placeholder(self):
+        report = app_module.ai_engine._generate_template_report({"a1": "数学", "a4": "物理", "c1": "数据科学家"})
+        for field, text in report.items():
+            self.assertNotRegex(text, r"\{\w+(\[|\})", field)
+
+    def test_every_chosen_learning_style_is_analyzed(self):
+        report = app_module.ai_engine._generate_template_report({"a2": ["视觉学习者", "听觉学习者"]})
+        self.assertIn("使用思维导图和图表来组织信息", report["academic_analysis"])
+        self.assertIn("录制课堂笔记并回听", report["academic_analysis"])
+        self.assertIn("视觉学习者、听觉学习者", report["summary"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for deadline-aware selection between the LLM, enhanced and basic reports
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+import app as app_module
+from app import app
+from resilience import Deadline
+from tier_router import TierRouter, TIERS, LLM, ENHANCED, BASIC
+from ai_engine import REPORT_SECTIONS
+
+
+class TestTierRouter(unittest.TestCase):
+    """Test cases for latency estimates and the choice of tier"""
+
+    def test_defaults_before_samples(self):
+        router = TierRouter(defaults={LLM: 20.0, ENHANCED: 1.0, BASIC: 0.1})
+        self.assertEqual(router.choose(60), LLM)
+        self.assertEqual(router.choose(2), ENHANCED)
+        self.assertEqual(router.choose(0.5), BASIC)
+        self.assertEqual(router.choose(0.01), BASIC)
+        self.assertEqual(router.choose(0.01, (LLM, ENHANCED)), ENHANCED)
+        self.assertEqual(router.choose(None), LLM)
+
+    def test_estimates_follow_recent_latency(self):
+        router = TierRouter(min_samples=5)
+        for seconds in (1.0, 1.2, 1.1, 1.3, 1.5):
+            router.record(LLM, seconds)
+        self.assertEqual(router.estimate(LLM), 1.5)
+        self.assertEqual(router.choose(2), LLM)
+
+        for _ in range(50):
+            router.record(ENHANCED, 5.0)
+        self.assertEqual(router.choose(4, (ENHANCED, BASIC)), BASIC)
+
+    def test_old_samples_expire(self):
+        router = TierRouter(min_samples=1, max_age=0.05, defaults={LLM: 20.0})
+        router.record(LLM, 90.0)
+        self.assertEqual(router.estimate(LLM), 90.0)
+        time.sleep(0.1)
+        self.assertEqual(router.estimate(LLM), 20.0)
+
+    def test_snapshot(self):
+        router = TierRouter()
+        router.record(BASIC, 0.01)
+        router.served(BASIC)
+        snapshot = router.snapshot()
+        self.assertEqual(set(snapshot), set(TIERS))
+        self.assertEqual(snapshot[BASIC]['served'], 1)
+        self.assertEqual(snapshot[BASIC]['samples'], 1)
+
+
+class TestRoutedReports(unittest.TestCase):
+    """Test cases for AIEngine.generate_routed_report() and /submit"""
+
+    def setUp(self):
+        self.engine = app_module.ai_engine
+        self.engine.tier_router = TierRouter()
+
+    def test_short_budget_skips_llm(self):
+        with patch.object(self.engine, 'available_tiers', return_value=TIERS), \
+                patch.object(self.engine, '_generate_hf_report') as hf:
+            report, tier = self.engine.generate_routed_report({"p2": "高二", "a1": "数学"}, Deadline(2))
+        hf.assert_not_called()
+        self.assertEqual(tier, ENHANCED)
+        self.assertIn("summary", report)
+        self.assertEqual(self.engine.tier_router.snapshot()[ENHANCED]['served'], 1)
+
+    def test_failed_llm_falls_through(self):
+        with patch.object(self.engine, 'available_tiers', return_value=TIERS), \
+                patch.object(self.engine, '_generate_hf_report', return_value=None) as hf:
+            _, tier = self.engine.generate_routed_report({"p2": "高二"}, Deadline(60))
+        hf.assert_called_once()
+        self.assertEqual(tier, ENHANCED)
+        self.assertEqual(self.engine.tier_router.snapshot()[LLM]['samples'], 1)
+
+    def test_submit_with_budget_records_tier(self):
+        client = app.test_client()
+        with patch.object(self.engine, 'available_tiers', return_value=TIERS), \
+                patch.object(self.engine, '_generate_hf_report') as hf:
+            response = client.post('/submit', json={"p2": "高二", "a1": "数学", "budget_seconds": 2})
+        hf.assert_not_called()
+        self.assertEqual(response.get_json()['tier'], ENHANCED)
+        with client.session_transaction() as session:
+            stored = app_module.report_store.get(session['report_id'])
+        self.assertEqual(stored['tier'], ENHANCED)
+        self.assertNotIn('budget_seconds', stored['responses'])
+
+    def test_invalid_submissions_are_rejected(self):
+        client = app.test_client()
+        for body in (["p2"], "高二", {"p2": "高二", "budget_seconds": "soon"}, {"p2": "高二", "budget_seconds": -1},
+                     {"p2": "高二", "budget_seconds": True}):
+            with patch.object(self.engine, 'generate_routed_report') as generate:
+                response = client.post('/submit', json=body)
+            self.assertEqual(response.status_code, 400, body)
+            generate.assert_not_called()
+
+    def test_ready_sections_are_routed_too(self):
+        ready = {"personality_insights": "提前生成的性格洞察"}
+        with patch.object(self.engine, 'available_tiers', return_value=TIERS), \
+                patch.object(self.engine, '_generate_hf_sections') as sections:
+            report, tier = self.engine.generate_routed_report({"p2": "高二"}, Deadline(2), ready=ready)
+        sections.assert_not_called()
+        self.assertEqual(tier, ENHANCED)
+        self.assertEqual(report["personality_insights"], "提前生成的性格洞察")
+        self.assertEqual(set(REPORT_SECTIONS) - set(report), set())
+
+    def test_llm_generates_only_the_sections_not_ready(self):
+        ready = {"personality_insights": "提前生成的性格洞察"}
+        with patch.object(self.engine, 'available_tiers', return_value=TIERS), \
+                patch.object(self.engine, '_generate_hf_sections',
+                             side_effect=lambda *args, fields=None, **kwargs: {f: "LLM" for f in fields}) as sections:
+            report, tier = self.engine.generate_routed_report({"p2": "高二"}, Deadline(60), ready=ready)
+        self.assertEqual(tier, LLM)
+        self.assertNotIn("personality_insights", sections.call_args.kwargs['fields'])
+        self.assertEqual(report["personality_insights"], "提前生成的性格洞察")
+        self.assertEqual(report["summary"], "LLM")
+        # Generating a few sections is not a sample of full-report LLM latency
+        self.assertEqual(self.engine.tier_router.snapshot()[LLM]['samples'], 0)
+        self.assertEqual(self.engine.tier_router.snapshot()[LLM]['served'], 1)
+
+    def test_fully_ready_report_needs_no_generation(self):
+        ready = {field: "提前生成" for field in REPORT_SECTIONS}
+        with patch.object(self.engine, '_generate_tier') as generate:
+            report, tier = self.engine.generate_routed_report({"p2": "高二"}, Deadline(2), ready=ready)
+        generate.assert_not_called()
+        self.assertEqual((report, tier), (ready, LLM))
+
+
+if __name__ == '__main__':
+    unittest.main()
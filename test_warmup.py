@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-fork warmup and the readiness probe
+"""
+
+import gc
+import unittest
+from flask import Flask
+import warmup
+import app as app_module
+from app import app
+
+
+class TestWarmup(unittest.TestCase):
+    """Test cases for warmup.run() and /ready"""
+
+    def test_ready_after_import(self):
+        response = app.test_client().get('/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ready')
+
+    def test_caches_built_before_first_request(self):
+        page = app_module._assessment_page_cache
+        self.assertIsNotNone(page['body'])
+        self.assertIn('gzip', page['encoded'])
+        self.assertIsNotNone(app_module._questions_cache['questions'])
+
+    def test_not_ready_until_warmup_runs(self):
+        fresh = Flask(__name__)
+        warmup.init_app(fresh)
+        client = fresh.test_client()
+        self.assertEqual(client.get('/ready').status_code, 503)
+
+        calls = []
+        warmup.run(fresh, lambda: calls.append('step'))
+        self.assertEqual(calls, ['step'])
+        self.assertEqual(client.get('/ready').status_code, 200)
+        self.assertGreater(gc.get_freeze_count(), 0)
+
+    def test_failed_step_keeps_app_not_ready(self):
+        fresh = Flask(__name__)
+        warmup.init_app(fresh)
+        client = fresh.test_client()
+
+        def load_model():
+            raise RuntimeError("model not found")
+
+        calls = []
+        warmup.run(fresh, load_model, lambda: calls.append('step'))
+        # Later steps still run, but the instance stays out of rotation
+        self.assertEqual(calls, ['step'])
+        response = client.get('/ready')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['status'], 'warmup_failed')
+        self.assertEqual(response.get_json()['failed_steps'], ['load_model'])
+
+    def test_ai_engine_check_fails_without_engine(self):
+        engine = app_module.ai_engine
+        original = engine.is_available
+        engine.is_available = False
+        try:
+            with self.assertRaises(RuntimeError):
+                app_module.check_ai_engine()
+        finally:
+            engine.is_available = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Deadline-aware choice of report generator for the Student Assessment System
+A report can come from the LLM, from the rule-based enhanced template or
+from the basic template. Each request carries a latency budget; the router
+keeps a rolling estimate of how long each tier is currently taking and
+picks the best tier expected to finish within the budget.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+LLM = 'llm'
+ENHANCED = 'enhanced'
+BASIC = 'basic'
+
+# Best first
+TIERS = (LLM, ENHANCED, BASIC)
+
+# Assumed latency (seconds) of a tier without recent samples
+DEFAULT_ESTIMATES = {LLM: 20.0, ENHANCED: 1.0, BASIC: 0.1}
+
+
+class TierRouter:
+    """Rolling latency estimates per tier and the choice of tier for a budget
+
+    The estimate of a tier is the given quantile of its recent generation
+    times; samples older than max_age seconds are dropped, so a tier that
+    was slow for a while (and therefore stopped being chosen) falls back to
+    its default estimate and gets tried again. Counts of reports served per
+    tier are kept for snapshot().
+    """
+
+    def __init__(self, window=50, min_samples=5, quantile=0.9, max_age=None, defaults=None):
+        self.window = window
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self.max_age = max_age if max_age is not None else float(os.getenv('TIER_SAMPLE_MAX_AGE', '600'))
+        self.defaults = dict(DEFAULT_ESTIMATES, **(defaults or {}))
+        self._samples = {tier: deque(maxlen=window) for tier in TIERS}
+        self._served = {tier: 0 for tier in TIERS}
+        self._lock = threading.Lock()
+
+    def record(self, tier, seconds):
+        """Record how long one generation with this tier took"""
+        with self._lock:
+            self._samples[tier].append((time.monotonic(), seconds))
+
+    def served(self, tier):
+        """Count a report as served by this tier"""
+        with self._lock:
+            self._served[tier] += 1
+
+    def estimate(self, tier):
+        """Expected generation time of a tier in seconds"""
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            samples = self._samples[tier]
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            seconds = sorted(s for _, s in samples)
+        if len(seconds) < self.min_samples:
+            return self.defaults[tier]
+        return seconds[min(len(seconds) - 1, int(self.quantile * len(seconds)))]
+
+    def choose(self, budget, tiers=TIERS):
+        """The best of the given tiers expected to finish within budget seconds
+
+        When none is expected to fit, the fastest of them.
+        """
+        tiers = [tier for tier in TIERS if tier in tiers]
+        estimates = {tier: self.estimate(tier) for tier in tiers}
+        for tier in tiers:
+            if budget is None or estimates[tier] <= budget:
+                return tier
+        return min(tiers, key=estimates.get)
+
+    def snapshot(self):
+        """{tier: {'estimate_seconds', 'samples', 'served'}}"""
+        estimates = {tier: self.estimate(tier) for tier in TIERS}
+        with self._lock:
+            return {tier: {'estimate_seconds': round(estimates[tier], 3), 'samples': len(self._samples[tier]),
+                           'served': self._served[tier]} for tier in TIERS}
@@ -0,0 +1,66 @@
+"""
+Pre-fork warmup and readiness probe for the Student Assessment System
+With gunicorn's preload_app the warmup runs once in the master process:
+templates are compiled and every cache the app registers is filled before
+the workers fork, then the resulting objects are moved out of the garbage
+collector's reach (gc.freeze) so collections in the workers do not touch,
+and therefore do not copy, the shared pages.
+"""
+
+import gc
+import time
+import logging
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+
+def run(app, *steps):
+    """Compile all templates, run each warmup step, then freeze the heap and mark the app ready
+
+    Steps are called without arguments inside a request context, so they
+    may render templates and build URLs. A failing step is logged and the
+    remaining steps still run, but the app is not marked ready, so /ready
+    keeps the instance out of rotation instead of serving without it.
+    """
+    state = app.extensions.setdefault('warmup', {'ready': False})
+    started = time.monotonic()
+    failed = []
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+    for step in steps:
+        try:
+            with app.test_request_context():
+                step()
+        except Exception as e:
+            name = getattr(step, '__name__', repr(step))
+            failed.append(name)
+            logger.error("Warmup step %s failed: %s", name, e)
+
+    gc.collect()
+    gc.freeze()
+
+    state.update(ready=not failed, failed=failed, seconds=time.monotonic() - started,
+                 frozen_objects=gc.get_freeze_count())
+    if failed:
+        logger.error("Warmup failed in %.2fs (%s), not marking the app ready",
+                     state['seconds'], ", ".join(failed))
+    else:
+        logger.info("Warmup finished in %.2fs, %s objects frozen", state['seconds'], state['frozen_objects'])
+
+
+def init_app(app):
+    """Register the /ready endpoint, which reports 503 until run() has finished without a failed step"""
+    app.extensions.setdefault('warmup', {'ready': False})
+
+    @app.route('/ready')
+    def ready():
+        state = app.extensions['warmup']
+        if state.get('failed'):
+            return jsonify({"status": "warmup_failed", "failed_steps": state['failed']}), 503
+        if not state['ready']:
+            return jsonify({"status": "warming_up"}), 503
+        return jsonify({"status": "ready", "warmup_seconds": round(state['seconds'], 3),
+                        "frozen_objects": state['frozen_objects']})